@@ -3,6 +3,8 @@ API Flask pour servir les données à l'interface React iOS-like.
 """
 
 import os
+import time
+import threading
 # Fix pour OpenMP sur macOS
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -10,7 +12,7 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"
 import torch
 torch.set_num_threads(1)
 
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, jsonify, request, send_file, Response
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import json
@@ -25,11 +27,18 @@ import shutil
 from datetime import datetime
 
 # Import des modules core
-from core.searcher import load_index_and_metadata, search
+from core.searcher import load_index_and_metadata, search, search_similar, build_index_rows, get_rerank_telemetry, DEFAULT_RERANK_POLICY, RERANK_POLICIES
+from core.thumbnails import open_image_reduced
 from core.clip_utils import get_embedder, CLIPEmbedder
 from core.reranker import get_reranker, CrossEncoderReranker
-from core.indexer import extract_and_index
-from ui_utils import make_thumbnail, get_video_preview
+from core.indexer import extract_and_index, index_write_lock, IMAGE_EXTENSIONS
+from core.lexical import load_lexical_index, get_lexical_index_path
+from core.duplicates import UploadDuplicateChecker, detect_duplicates, load_duplicates_report
+from ui_utils import get_thumbnail_path, get_video_sprite_path, find_cached_thumbnail
+from core.thumbnails import THUMBNAIL_SIZES, DEFAULT_THUMBNAIL_SIZE, ThumbnailBytesCache
+from executors import executor_from_env, ExecutorOverloaded, ExecutorTimeout
+from media_files import MediaFileInfoCache, etag_matches, send_media_file
+from pagination import encode_cursor, decode_cursor, SearchResultCache, paginate_cached
 
 app = Flask(__name__)
 CORS(app)
@@ -37,38 +46,125 @@ CORS(app)
 # Variables globales pour le cache
 _index = None
 _metadata = []
+_lexical_index = None
+_duplicate_checker = None
+_duplicates_future = None
+_unique_media = []
+_unique_media_positions = {}
+# Lignes de l'index FAISS de chaque média (recherche de médias similaires)
+_index_rows = {}
 _embedder = None
 _reranker = None
 _index_loaded = False
+# mtime de index.faiss au chargement : plusieurs workers, un seul réindexe
+_index_mtime = None
+# mtime de metadata.json : les légendes arrivent après l'index (étape de légendage)
+_metadata_mtime = None
+# Chargements concurrents (warm-up + premières requêtes) : un seul chargement à la fois
+_index_lock = threading.RLock()
+_model_lock = threading.Lock()
+# Readiness : modèles chargés et passe à vide effectuée (voir warm_up)
+_ready = False
+_warmup_error = None
+
+# Vignettes JPEG déjà encodées, servies sans passer par PIL
+_thumbnail_cache = ThumbnailBytesCache(max_bytes=int(os.environ.get('THUMBNAIL_CACHE_BYTES', 64 * 1024 * 1024)))
+THUMBNAIL_CACHE_CONTROL = "public, max-age=86400, stale-while-revalidate=604800"
+# Taille / MIME / ETag des fichiers servis, calculés une fois par fichier
+_media_files = MediaFileInfoCache()
+
+# Étapes coûteuses dans des pools bornés : au-delà, 503 immédiat plutôt qu'une file sans fin
+# qui bloquerait aussi les requêtes légères (santé, listing, fichiers)
+_search_executor = executor_from_env("search", max_workers=1, max_pending=2, timeout=30.0)
+_thumbnail_executor = executor_from_env("thumbnail", max_workers=2, max_pending=8, timeout=15.0)
+# Réindexation après upload : une en cours, une en attente (qui couvrira les uploads suivants)
+_indexing_executor = executor_from_env("indexing", max_workers=1, max_pending=1, timeout=300.0)
+# Détection des doublons : pool séparé, pour ne jamais occuper la place d'attente d'une réindexation
+_duplicates_executor = executor_from_env("duplicates", max_workers=1, max_pending=0, timeout=None)
+
+# Listes de résultats classés, pour paginer les recherches par curseur. Sur disque :
+# sous gunicorn, la page suivante peut être demandée à un autre worker
+_search_cache = SearchResultCache(cache_dir=os.environ.get('SEARCH_CACHE_DIR', '.cache/search'))
+
+
+def _search_version() -> str:
+    """Version de l'index et des légendes : une page d'un index remplacé n'est plus servie."""
+    return f"{_index_mtime}:{_metadata_mtime}"
+
+
+def _build_unique_media(metadata: List[Dict]):
+    """Précalcule la liste des médias uniques (une entrée par fichier), leurs positions et leurs lignes FAISS."""
+    global _unique_media, _unique_media_positions, _index_rows
+    
+    unique_media = []
+    positions = {}
+    for meta in metadata:
+        file_path = meta.get("file_path", "")
+        if file_path and file_path not in positions:
+            positions[file_path] = len(unique_media)
+            unique_media.append(meta)
+    
+    _unique_media = unique_media
+    _unique_media_positions = positions
+    _index_rows = build_index_rows(metadata)
 
 
 def load_index_if_needed():
     """Charge l'index et les métadonnées si nécessaire."""
-    global _index, _metadata, _index_loaded
+    global _index, _metadata, _lexical_index, _index_loaded, _index_mtime, _metadata_mtime, _duplicate_checker
     
-    if not _index_loaded:
-        try:
-            if os.path.exists("index.faiss") and os.path.exists("metadata.json"):
-                _index, _metadata = load_index_and_metadata("index.faiss", "metadata.json")
-                _index_loaded = True
-                print(f"✅ Index chargé: {_index.ntotal} embedding(s)")
-            else:
-                print("⚠️  Aucun index trouvé")
-        except Exception as e:
-            print(f"❌ Erreur lors du chargement de l'index: {e}")
-            _index_loaded = False
+    with _index_lock:
+        if _index_loaded and _index_mtime is not None:
+            # Recharger si un autre worker a réécrit l'index (upload)
+            try:
+                if os.path.getmtime("index.faiss") != _index_mtime:
+                    _index_loaded = False
+                elif os.path.getmtime("metadata.json") != _metadata_mtime:
+                    # Seules les légendes ont changé : métadonnées et index lexical uniquement
+                    _metadata_mtime = os.path.getmtime("metadata.json")
+                    with open("metadata.json", 'r', encoding='utf-8') as f:
+                        metadata = json.load(f)
+                    if len(metadata) == _index.ntotal:
+                        _metadata = metadata
+                        _lexical_index = load_lexical_index(get_lexical_index_path("metadata.json"))
+                        _build_unique_media(_metadata)
+                        print("✅ Légendes rechargées")
+                    else:
+                        _index_loaded = False
+            except (OSError, ValueError):
+                pass
+    
+        if not _index_loaded:
+            try:
+                if os.path.exists("index.faiss") and os.path.exists("metadata.json"):
+                    _index_mtime = os.path.getmtime("index.faiss")
+                    _metadata_mtime = os.path.getmtime("metadata.json")
+                    _index, _metadata = load_index_and_metadata("index.faiss", "metadata.json")
+                    _lexical_index = load_lexical_index(get_lexical_index_path("metadata.json"))
+                    _build_unique_media(_metadata)
+                    _duplicate_checker = None
+                    _media_files.clear()
+                    _media_files.prime(meta.get("file_path", "") for meta in _unique_media)
+                    _index_loaded = True
+                    print(f"✅ Index chargé: {_index.ntotal} embedding(s)")
+                else:
+                    print("⚠️  Aucun index trouvé")
+            except Exception as e:
+                print(f"❌ Erreur lors du chargement de l'index: {e}")
+                _index_loaded = False
 
 
 def get_embedder_if_needed():
     """Charge l'embedder si nécessaire."""
     global _embedder
     
-    if _embedder is None:
-        try:
-            _embedder = get_embedder(model_name="openai/clip-vit-large-patch14")
-            print("✅ Embedder chargé")
-        except Exception as e:
-            print(f"❌ Erreur lors du chargement de l'embedder: {e}")
+    with _model_lock:
+        if _embedder is None:
+            try:
+                _embedder = get_embedder(model_name="openai/clip-vit-large-patch14")
+                print("✅ Embedder chargé")
+            except Exception as e:
+                print(f"❌ Erreur lors du chargement de l'embedder: {e}")
     
     return _embedder
 
@@ -77,16 +173,69 @@ def get_reranker_if_needed():
     """Charge le reranker si nécessaire."""
     global _reranker
     
-    if _reranker is None:
-        try:
-            _reranker = get_reranker()
-            print("✅ Reranker chargé")
-        except Exception as e:
-            print(f"⚠️  Erreur lors du chargement du reranker: {e}")
+    with _model_lock:
+        if _reranker is None:
+            try:
+                _reranker = get_reranker()
+                print("✅ Reranker chargé")
+            except Exception as e:
+                print(f"⚠️  Erreur lors du chargement du reranker: {e}")
     
     return _reranker
 
 
+def _busy_response(error: Exception):
+    """Réponse pour un pool saturé (503) ou une tâche trop longue (504)."""
+    if isinstance(error, ExecutorOverloaded):
+        return jsonify({"error": str(error)}), 503, {'Retry-After': '2'}
+    return jsonify({"error": str(error)}), 504
+
+
+def preload():
+    """
+    Charge l'index et les modèles dans le processus courant.
+    Appelé par wsgi.py avant le fork des workers gunicorn (preload_app) : les poids
+    CLIP / cross-encoder et l'index FAISS sont alors partagés en copie sur écriture
+    au lieu d'être chargés une fois par worker.
+    """
+    load_index_if_needed()
+    get_embedder_if_needed()
+    if os.environ.get('PRELOAD_RERANKER', '1') != '0':
+        reranker = get_reranker_if_needed()
+        if reranker is not None:
+            # Le cross-encoder charge ses poids au premier re-ranking : forcer le chargement
+            reranker.load()
+
+
+def warm_up():
+    """
+    Phase de démarrage : charge l'index et les modèles (si preload ne l'a pas déjà fait),
+    puis exécute une passe à vide CLIP et cross-encoder pour que la première recherche
+    ne paie ni le chargement ni l'initialisation des noyaux. Marque l'API prête.
+    """
+    global _ready, _warmup_error
+    started = time.time()
+    try:
+        preload()
+        embedder = get_embedder_if_needed()
+        if embedder is None:
+            raise RuntimeError("embedder CLIP indisponible")
+        embedder.warm_up()
+        if _reranker is not None and os.environ.get('PRELOAD_RERANKER', '1') != '0':
+            _reranker.warm_up()
+        _ready = True
+        _warmup_error = None
+        print(f"✅ API prête ({time.time() - started:.1f}s de warm-up)")
+    except Exception as e:
+        _warmup_error = str(e)
+        print(f"❌ Erreur lors du warm-up: {e}")
+
+
+def start_warm_up():
+    """Lance warm_up dans un thread : /api/health répond (liveness) pendant le chargement."""
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
 @app.route('/api/media/initial', methods=['GET'])
 def get_initial_media():
     """Récupère les N premiers médias pour la page d'accueil."""
@@ -94,24 +243,32 @@ def get_initial_media():
         load_index_if_needed()
         
         if not _index_loaded or not _metadata:
-            return jsonify({"media": []}), 200
+            return jsonify({"media": [], "next_cursor": None}), 200
         
         limit = int(request.args.get('limit', 9))
+        cursor = request.args.get('cursor')
         
-        # Prendre les N premiers médias uniques (grouper par fichier)
-        unique_media = {}
-        for meta in _metadata:
-            file_path = meta.get("file_path", "")
-            if file_path and file_path not in unique_media:
-                unique_media[file_path] = meta
-                if len(unique_media) >= limit:
-                    break
+        # Keyset sur le dernier fichier renvoyé : position en O(1), pas de parcours depuis le début
+        start = 0
+        if cursor:
+            try:
+                after = decode_cursor(cursor).get("after")
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            if after not in _unique_media_positions:
+                return jsonify({"error": "Curseur expiré, rechargez la galerie"}), 410
+            start = _unique_media_positions[after] + 1
+        
+        media_list = _unique_media[start:start + limit]
         
-        media_list = list(unique_media.values())
+        next_cursor = None
+        if media_list and start + len(media_list) < len(_unique_media):
+            next_cursor = encode_cursor({"after": media_list[-1].get("file_path", "")})
         
         return jsonify({
             "media": media_list,
-            "count": len(media_list)
+            "count": len(media_list),
+            "next_cursor": next_cursor
         }), 200
         
     except Exception as e:
@@ -131,29 +288,55 @@ def search_media():
         data = request.get_json()
         query = data.get('query', '')
         
+        # Options de recherche
+        top_k = data.get('top_k', 12)
+        cursor = data.get('cursor')
+        
+        # Page suivante d'une recherche déjà classée : servie depuis le cache
+        if cursor:
+            try:
+                position = decode_cursor(cursor)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            cached_results = _search_cache.get(str(position.get("search_id", "")), version=_search_version())
+            if cached_results is None:
+                return jsonify({"error": "Curseur expiré, relancez la recherche"}), 410
+            page, next_cursor = paginate_cached(cached_results, position["search_id"], int(position.get("offset", 0)), top_k)
+            return jsonify({
+                "results": page,
+                "count": len(page),
+                "total": len(cached_results),
+                "next_cursor": next_cursor
+            }), 200
+        
         if not query:
             return jsonify({"results": []}), 200
         
-        # Options de recherche
-        top_k = data.get('top_k', 12)
+        # Nombre de candidats classés gardés pour les pages suivantes
+        max_results = data.get('max_results', max(top_k, 100))
         use_query_expansion = data.get('use_query_expansion', True)
         auto_translate = data.get('auto_translate', False)
         use_dynamic_threshold = data.get('use_dynamic_threshold', False)
         fixed_threshold = data.get('fixed_threshold', 0.3)
         always_rerank = data.get('always_rerank', False)
         rerank_if_below = data.get('rerank_if_below', None)
+        rerank_policy = data.get('rerank_policy', DEFAULT_RERANK_POLICY)
+        if rerank_policy not in RERANK_POLICIES:
+            return jsonify({"error": f"rerank_policy inconnue (attendu: {', '.join(RERANK_POLICIES)})"}), 400
+        use_hybrid = data.get('use_hybrid', False)
         
         # Charger les modèles si nécessaire
         embedder = get_embedder_if_needed()
         reranker = get_reranker_if_needed() if (always_rerank or rerank_if_below) else None
         
-        # Effectuer la recherche
-        results = search(
+        # Effectuer la recherche (pool borné : encodage CLIP, FAISS, rerank)
+        results = _search_executor.run(
+            search,
             query_text=query,
             index=_index,
             metadata=_metadata,
             embedder=embedder,
-            top_k=top_k,
+            top_k=max_results,
             use_query_expansion=use_query_expansion,
             auto_translate=auto_translate,
             use_dynamic_threshold=use_dynamic_threshold,
@@ -161,28 +344,152 @@ def search_media():
             always_rerank=always_rerank,
             rerank_if_below=rerank_if_below,
             reranker=reranker,
-            use_captions=True
+            rerank_policy=rerank_policy,
+            use_captions=True,
+            use_hybrid=use_hybrid,
+            lexical_index=_lexical_index
         )
         
         # Grouper les résultats par fichier (éviter les doublons)
+        # Classement : "rrf_score" en hybride sans rerank ("score" reste le cosinus), sinon "score"
+        def rank_score(result):
+            return result.get("rrf_score", result.get("score", 0.0))
+        
         unique_results = {}
         for result in results:
             file_path = result.get("path", "")
-            score = result.get("score", 0.0)
             
-            if file_path not in unique_results or score > unique_results[file_path].get("score", 0.0):
+            if file_path not in unique_results or rank_score(result) > rank_score(unique_results[file_path]):
                 unique_results[file_path] = result
         
+        # Convertir en liste et trier par score de classement
+        results_list = sorted(unique_results.values(), key=rank_score, reverse=True)
+        
+        # Mettre en cache la liste classée et renvoyer la première page
+        search_id = _search_cache.put(results_list, version=_search_version())
+        page, next_cursor = paginate_cached(results_list, search_id, 0, top_k)
+        
+        return jsonify({
+            "results": page,
+            "count": len(page),
+            "total": len(results_list),
+            "next_cursor": next_cursor
+        }), 200
+        
+    except (ExecutorOverloaded, ExecutorTimeout) as e:
+        return _busy_response(e)
+    except Exception as e:
+        print(f"❌ Erreur search_media: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/similar', methods=['GET', 'POST'])
+def similar_media():
+    """
+    Recherche des médias similaires à un exemple.
+    GET ?path=... : média indexé (vecteur relu dans l'index, sans ré-encodage).
+    POST multipart (champ 'file') : image envoyée, encodée avec CLIP.
+    Paramètres communs : top_k, max_results, media_type, include_dirs (séparés par des virgules), cursor.
+    """
+    try:
+        load_index_if_needed()
+        
+        if not _index_loaded or not _metadata:
+            return jsonify({"results": []}), 200
+        
+        params = request.values
+        top_k = int(params.get('top_k', 12))
+        cursor = params.get('cursor')
+        
+        # Page suivante : servie depuis le cache, comme /api/search
+        if cursor:
+            try:
+                position = decode_cursor(cursor)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            cached_results = _search_cache.get(str(position.get("search_id", "")), version=_search_version())
+            if cached_results is None:
+                return jsonify({"error": "Curseur expiré, relancez la recherche"}), 410
+            page, next_cursor = paginate_cached(cached_results, position["search_id"], int(position.get("offset", 0)), top_k)
+            return jsonify({
+                "results": page,
+                "count": len(page),
+                "total": len(cached_results),
+                "next_cursor": next_cursor
+            }), 200
+        
+        file_path = params.get('path', '')
+        uploaded = request.files.get('file')
+        if not file_path and uploaded is None:
+            return jsonify({"error": "Paramètre 'path' ou fichier 'file' requis"}), 400
+        
+        max_results = int(params.get('max_results', max(top_k, 100)))
+        media_type = params.get('media_type') or None
+        include_dirs = [d for d in params.get('include_dirs', '').split(',') if d] or None
+        
+        query_image = None
+        embedder = None
+        if uploaded is not None:
+            try:
+                # Copie décodée en mémoire : après un ExecutorTimeout, le worker peut encore
+                # lire l'image alors que la requête est terminée (pas de décodage paresseux)
+                opened_image = open_image_reduced(uploaded.stream, 1024)
+                try:
+                    query_image = opened_image.copy()
+                finally:
+                    opened_image.close()
+            except Exception:
+                return jsonify({"error": "Image illisible"}), 400
+            embedder = get_embedder_if_needed()
+            if embedder is None:
+                return jsonify({"error": "Modèle CLIP indisponible"}), 500
+        
+        try:
+            results = _search_executor.run(
+                search_similar,
+                index=_index,
+                metadata=_metadata,
+                file_path=file_path or None,
+                query_image=query_image,
+                embedder=embedder,
+                top_k=max_results,
+                media_type=media_type,
+                include_dirs=include_dirs,
+                index_rows=_index_rows
+            )
+        except LookupError as e:
+            return jsonify({"error": str(e)}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Grouper les résultats par fichier (éviter les doublons)
+        unique_results = {}
+        for result in results:
+            result_path = result.get("path", "")
+            score = result.get("score", 0.0)
+            
+            if result_path not in unique_results or score > unique_results[result_path].get("score", 0.0):
+                unique_results[result_path] = result
+        
         # Convertir en liste et trier par score
         results_list = sorted(unique_results.values(), key=lambda x: x.get("score", 0.0), reverse=True)
         
+        search_id = _search_cache.put(results_list, version=_search_version())
+        page, next_cursor = paginate_cached(results_list, search_id, 0, top_k)
+        
         return jsonify({
-            "results": results_list,
-            "count": len(results_list)
+            "results": page,
+            "count": len(page),
+            "total": len(results_list),
+            "next_cursor": next_cursor
         }), 200
         
+    except (ExecutorOverloaded, ExecutorTimeout) as e:
+        return _busy_response(e)
     except Exception as e:
-        print(f"❌ Erreur search_media: {e}")
+        print(f"❌ Erreur similar_media: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
@@ -194,27 +501,41 @@ def get_thumbnail():
     try:
         file_path = request.args.get('path', '')
         media_type = request.args.get('type', 'image')
+        size = int(request.args.get('size', DEFAULT_THUMBNAIL_SIZE))
+        if size not in THUMBNAIL_SIZES:
+            size = DEFAULT_THUMBNAIL_SIZE
         
         if not file_path or not os.path.exists(file_path):
             return jsonify({"error": "Fichier introuvable"}), 404
         
-        # Générer la miniature
-        if media_type == 'video':
-            thumbnail = get_video_preview(file_path)
-        else:
-            thumbnail = make_thumbnail(file_path)
-        
-        if thumbnail is None:
+        # Vignette sur disque (pré-générée à l'indexation, sinon générée maintenant)
+        # variant=sprite : planche de survol d'une vidéo (nombre de frames = largeur / hauteur)
+        variant = request.args.get('variant') if media_type == 'video' else None
+        cache_path = find_cached_thumbnail(file_path, media_type=media_type, max_size=size, variant=variant)
+        if cache_path is None:
+            # Décodage + redimensionnement dans le pool borné
+            if variant == 'sprite':
+                cache_path = _thumbnail_executor.run(get_video_sprite_path, file_path)
+            else:
+                cache_path = _thumbnail_executor.run(get_thumbnail_path, file_path, media_type=media_type, max_size=size)
+        if cache_path is None:
             return jsonify({"error": "Impossible de générer la miniature"}), 500
         
-        # Convertir en base64
-        buffer = io.BytesIO()
-        thumbnail.save(buffer, format='JPEG', quality=85)
-        buffer.seek(0)
-        
-        # Retourner l'image
-        return send_file(buffer, mimetype='image/jpeg')
-        
+        # Octets JPEG depuis le cache mémoire (ou lus une fois depuis le disque)
+        entry = _thumbnail_cache.get(cache_path) or _thumbnail_cache.load(cache_path)
+        if entry is None:
+            response = send_file(cache_path, mimetype='image/jpeg', conditional=True)
+            response.headers['Cache-Control'] = THUMBNAIL_CACHE_CONTROL
+            return response
+        
+        data, etag = entry
+        headers = {'ETag': etag, 'Cache-Control': THUMBNAIL_CACHE_CONTROL}
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=304, headers=headers)
+        return Response(data, mimetype='image/jpeg', headers=headers)
+        
+    except (ExecutorOverloaded, ExecutorTimeout) as e:
+        return _busy_response(e)
     except Exception as e:
         print(f"❌ Erreur get_thumbnail: {e}")
         return jsonify({"error": str(e)}), 500
@@ -226,33 +547,12 @@ def get_media_file():
     try:
         file_path = request.args.get('path', '')
         
-        if not file_path or not os.path.exists(file_path):
+        info = _media_files.get(file_path) if file_path else None
+        if info is None:
             return jsonify({"error": "Fichier introuvable"}), 404
         
-        # Déterminer le type MIME
-        ext = os.path.splitext(file_path)[1].lower()
-        mime_types = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp',
-            '.mp4': 'video/mp4',
-            '.mov': 'video/quicktime',
-            '.avi': 'video/x-msvideo',
-            '.mkv': 'video/x-matroska',
-            '.webm': 'video/webm',
-        }
-        
-        mime_type = mime_types.get(ext, 'application/octet-stream')
-        
-        # Servir le fichier avec les en-têtes appropriés
-        return send_file(
-            file_path,
-            mimetype=mime_type,
-            as_attachment=False,
-            conditional=True
-        )
+        # Requêtes Range (lecture/scrubbing vidéo) et envoi sans copie quand le serveur le permet
+        return send_media_file(info)
         
     except Exception as e:
         print(f"❌ Erreur get_media_file: {e}")
@@ -277,6 +577,38 @@ def analyse_media():
         return jsonify({"error": str(e)}), 500
 
 
+def get_duplicate_checker() -> Optional[UploadDuplicateChecker]:
+    """Vérificateur de doublons à l'upload, construit une fois par chargement de l'index."""
+    global _duplicate_checker
+    load_index_if_needed()
+    with _index_lock:
+        if not _index_loaded or not _metadata:
+            return None
+        if _duplicate_checker is None:
+            _duplicate_checker = UploadDuplicateChecker(_metadata)
+        return _duplicate_checker
+
+
+def _reindex_uploads():
+    """Réindexe le dossier data/ et recharge l'index (exécuté dans _indexing_executor)."""
+    global _index_loaded
+    # Verrou partagé entre workers gunicorn : une seule réindexation à la fois sur index.faiss,
+    # et celle qui attend rescanne data/ après la précédente (aucun upload perdu)
+    with index_write_lock("metadata.json"):
+        extract_and_index(
+            data_dir="data/",
+            output_index="index.faiss",
+            output_metadata="metadata.json",
+            generate_captions=True,
+            # Légendes BLIP en arrière-plan : les nouveaux fichiers sont cherchables dès l'indexation CLIP
+            async_captions=True
+        )
+    
+    # Recharger l'index et les métadonnées
+    _index_loaded = False
+    load_index_if_needed()
+
+
 @app.route('/api/upload', methods=['POST'])
 def upload_media():
     """Upload des fichiers média depuis la galerie du téléphone."""
@@ -301,6 +633,10 @@ def upload_media():
         
         uploaded_files = []
         errors = []
+        # Copies de médias déjà indexés (empreinte de contenu / perceptuelle, sans CLIP)
+        duplicates = []
+        skip_duplicates = request.form.get('skip_duplicates', 'false').lower() in ('1', 'true', 'yes')
+        checker = get_duplicate_checker()
         
         for file in files:
             try:
@@ -319,6 +655,19 @@ def upload_media():
                 
                 # Sauvegarder le fichier
                 file.save(str(file_path))
+                
+                if checker is not None and ext in IMAGE_EXTENSIONS:
+                    match = checker.check(str(file_path))
+                    if match is not None:
+                        match["file"] = filename
+                        # Doublon exact : ni embedding, ni légende, ni entrée d'index
+                        match["skipped"] = skip_duplicates and match["kind"] == "exact"
+                        duplicates.append(match)
+                        if match["skipped"]:
+                            file_path.unlink()
+                            print(f"⏭️  Doublon exact ignoré: {filename} ({match['duplicate_of']})")
+                            continue
+                
                 uploaded_files.append(str(file_path))
                 
                 print(f"✅ Fichier uploadé: {file_path}")
@@ -327,31 +676,37 @@ def upload_media():
                 errors.append(f"{file.filename}: {str(e)}")
                 print(f"❌ Erreur lors de l'upload de {file.filename}: {e}")
         
+        if not uploaded_files and duplicates:
+            # Tous les fichiers étaient déjà indexés : rien à réindexer
+            return jsonify({
+                "status": "success",
+                "uploaded": 0,
+                "files": [],
+                "indexing": "skipped",
+                "duplicates": duplicates,
+                "errors": errors if errors else None
+            }), 200
+        
         if not uploaded_files:
             return jsonify({
                 "error": "Aucun fichier n'a pu être uploadé",
                 "details": errors
             }), 400
         
-        # Indexer automatiquement les nouveaux fichiers
+        # Indexer automatiquement les nouveaux fichiers (pool borné, une réindexation à la fois)
+        indexing = "done"
         try:
             print(f"🔄 Indexation de {len(uploaded_files)} nouveau(x) fichier(s)...")
-            # Recharger l'index pour inclure les nouveaux fichiers
-            extract_and_index(
-                data_dir="data/",
-                output_index="index.faiss",
-                output_metadata="metadata.json",
-                generate_captions=True
-            )
-            
-            # Recharger l'index et les métadonnées
-            global _index, _metadata, _index_loaded
-            _index_loaded = False
-            load_index_if_needed()
-            
+            _indexing_executor.run(_reindex_uploads)
             print(f"✅ Indexation terminée")
-            
+        except ExecutorOverloaded:
+            # Une réindexation attend déjà : elle inclura ces fichiers
+            indexing = "queued"
+        except ExecutorTimeout:
+            # La réindexation continue en arrière-plan
+            indexing = "in_progress"
         except Exception as e:
+            indexing = "failed"
             print(f"⚠️  Erreur lors de l'indexation: {e}")
             # On retourne quand même les fichiers uploadés même si l'indexation a échoué
         
@@ -359,6 +714,8 @@ def upload_media():
             "status": "success",
             "uploaded": len(uploaded_files),
             "files": uploaded_files,
+            "indexing": indexing,
+            "duplicates": duplicates if duplicates else None,
             "errors": errors if errors else None
         }), 200
         
@@ -369,18 +726,75 @@ def upload_media():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/duplicates', methods=['GET'])
+def get_duplicates():
+    """
+    Groupes de quasi-doublons (rafales, ré-uploads) de toute la bibliothèque.
+    Le rapport est recalculé en arrière-plan quand l'index a changé (ou avec ?refresh=1) :
+    la réponse est alors 202 avec le dernier rapport disponible.
+    """
+    global _duplicates_future
+    try:
+        load_index_if_needed()
+        if not _index_loaded:
+            return jsonify({"groups": []}), 200
+        
+        report = load_duplicates_report("metadata.json")
+        stale = report is None or report.get("index_mtime") != _index_mtime or request.args.get('refresh') == '1'
+        
+        if stale and (_duplicates_future is None or _duplicates_future.done()):
+            try:
+                _duplicates_future = _duplicates_executor.submit(detect_duplicates, "index.faiss", "metadata.json")
+            except ExecutorOverloaded:
+                # Une détection est déjà en cours : la suivante sera lancée au prochain appel
+                pass
+        
+        running = _duplicates_future is not None and not _duplicates_future.done()
+        if report is None:
+            return jsonify({"status": "running" if running else "pending", "groups": []}), 202
+        return jsonify({**report, "status": "running" if running else "ready"}), 202 if running else 200
+        
+    except Exception as e:
+        print(f"❌ Erreur get_duplicates: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/health', methods=['GET'])
 def health():
-    """Endpoint de santé."""
-    load_index_if_needed()
-    
+    """
+    Endpoint de santé.
+    Liveness : répond toujours 200 tant que le processus sert des requêtes (même pendant
+    le warm-up). Readiness : champ "ready", ou /api/health/ready qui renvoie 503 tant que
+    les modèles ne sont pas prêts.
+    """
     return jsonify({
         "status": "ok",
+        "live": True,
+        "ready": _ready,
+        "warmup_error": _warmup_error,
         "index_loaded": _index_loaded,
-        "media_count": len(_metadata) if _index_loaded else 0
+        "media_count": len(_metadata) if _index_loaded else 0,
+        "executors": {
+            "search": _search_executor.stats(),
+            "thumbnail": _thumbnail_executor.stats(),
+            "indexing": _indexing_executor.stats(),
+            "duplicates": _duplicates_executor.stats()
+        },
+        "reranker_cache": _reranker.cache_stats() if _reranker is not None else None,
+        "rerank": get_rerank_telemetry().stats()
     }), 200
 
 
+@app.route('/api/health/ready', methods=['GET'])
+def readiness():
+    """Readiness : 200 quand l'index et les modèles sont chargés et préchauffés, 503 sinon."""
+    return jsonify({
+        "ready": _ready,
+        "warmup_error": _warmup_error,
+        "index_loaded": _index_loaded
+    }), 200 if _ready else 503
+
+
 if __name__ == '__main__':
     import sys
     
@@ -391,6 +805,10 @@ if __name__ == '__main__':
     print(f"📡 API disponible sur http://localhost:{port}")
     print(f"💡 Pour utiliser un autre port, définissez la variable d'environnement FLASK_PORT")
     
+    # Warm-up en arrière-plan (dans le processus servi, pas dans celui du reloader)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warm_up()
+    
     try:
         app.run(host='0.0.0.0', port=port, debug=True)
     except OSError as e:
@@ -4,6 +4,8 @@ Version cloud avec base de données et stockage dynamique.
 """
 
 import os
+import time
+import threading
 # Fix pour OpenMP sur macOS
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
@@ -11,7 +13,7 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"
 import torch
 torch.set_num_threads(1)
 
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, jsonify, request, send_file, Response
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import json
@@ -27,10 +29,12 @@ from datetime import datetime
 
 # Import des modules core
 from core.searcher import load_index_and_metadata, search
-from core.clip_utils import get_embedder, CLIPEmbedder
-from core.reranker import get_reranker, CrossEncoderReranker
 from core.indexer import extract_and_index
-from ui_utils import make_thumbnail, get_video_preview
+from ui_utils import get_thumbnail_path, get_video_sprite_path, find_cached_thumbnail
+from core.thumbnails import THUMBNAIL_SIZES, DEFAULT_THUMBNAIL_SIZE, ThumbnailBytesCache
+from executors import executor_from_env, ExecutorOverloaded, ExecutorTimeout
+from media_files import MediaFileInfoCache, etag_matches, send_media_file
+from pagination import encode_cursor, decode_cursor
 
 # Import des nouveaux modules
 from database import get_db
@@ -45,9 +49,25 @@ CORS(app, origins=cors_origins)
 # Variables globales pour le cache
 _index = None
 _metadata = []
-_embedder = None
-_reranker = None
 _index_loaded = False
+# mtime de index.faiss au chargement : plusieurs workers, un seul réindexe
+_index_mtime = None
+# Chargements concurrents (warm-up + premières requêtes) : un seul chargement à la fois
+_index_lock = threading.RLock()
+# Readiness : métadonnées chargées et base de données joignable (voir warm_up)
+_ready = False
+_warmup_error = None
+
+# Vignettes JPEG déjà encodées, servies sans passer par PIL
+_thumbnail_cache = ThumbnailBytesCache(max_bytes=int(os.environ.get('THUMBNAIL_CACHE_BYTES', 64 * 1024 * 1024)))
+THUMBNAIL_CACHE_CONTROL = "public, max-age=86400, stale-while-revalidate=604800"
+# Taille / MIME / ETag des fichiers servis, calculés une fois par fichier
+_media_files = MediaFileInfoCache()
+
+# Génération des vignettes dans un pool borné : au-delà, 503 immédiat plutôt qu'une file
+# sans fin qui bloquerait aussi les requêtes légères (santé, listing, fichiers).
+# La recherche plein texte est une requête SQL et reste dans le thread de la requête.
+_thumbnail_executor = executor_from_env("thumbnail", max_workers=2, max_pending=8, timeout=15.0)
 
 # Instances de base de données et stockage
 db = get_db()
@@ -56,54 +76,77 @@ storage = get_storage()
 
 def load_index_if_needed():
     """Charge l'index et les métadonnées si nécessaire."""
-    global _index, _metadata, _index_loaded
+    global _index, _metadata, _index_loaded, _index_mtime
     
-    if not _index_loaded:
-        try:
-            # Essayer de charger depuis les fichiers (compatibilité)
-            if os.path.exists("index.faiss") and os.path.exists("metadata.json"):
-                _index, _metadata = load_index_and_metadata("index.faiss", "metadata.json")
-                _index_loaded = True
-                print(f"✅ Index chargé depuis fichiers: {_index.ntotal} embedding(s)")
-            else:
-                # Charger depuis la base de données
-                _metadata = db.list_media(limit=10000)
-                if _metadata:
-                    # Reconstruire l'index FAISS depuis la base de données
-                    # Pour l'instant, on utilise les métadonnées seulement
+    with _index_lock:
+        if _index_loaded and _index_mtime is not None:
+            # Recharger si un autre worker a réécrit l'index
+            try:
+                if os.path.getmtime("index.faiss") != _index_mtime:
+                    _index_loaded = False
+            except OSError:
+                pass
+    
+        if not _index_loaded:
+            try:
+                # Essayer de charger depuis les fichiers (compatibilité)
+                if os.path.exists("index.faiss") and os.path.exists("metadata.json"):
+                    _index_mtime = os.path.getmtime("index.faiss")
+                    _index, _metadata = load_index_and_metadata("index.faiss", "metadata.json")
                     _index_loaded = True
-                    print(f"✅ Métadonnées chargées depuis la base de données: {len(_metadata)} média(s)")
-        except Exception as e:
-            print(f"❌ Erreur lors du chargement de l'index: {e}")
-            _index_loaded = False
+                    print(f"✅ Index chargé depuis fichiers: {_index.ntotal} embedding(s)")
+                else:
+                    # Charger depuis la base de données
+                    _metadata = db.list_media(limit=10000)
+                    if _metadata:
+                        # Reconstruire l'index FAISS depuis la base de données
+                        # Pour l'instant, on utilise les métadonnées seulement
+                        _index_loaded = True
+                        print(f"✅ Métadonnées chargées depuis la base de données: {len(_metadata)} média(s)")
+            except Exception as e:
+                print(f"❌ Erreur lors du chargement de l'index: {e}")
+                _index_loaded = False
 
 
-def get_embedder_if_needed():
-    """Charge l'embedder si nécessaire."""
-    global _embedder
-    
-    if _embedder is None:
-        try:
-            _embedder = get_embedder(model_name="openai/clip-vit-large-patch14")
-            print("✅ Embedder chargé")
-        except Exception as e:
-            print(f"❌ Erreur lors du chargement de l'embedder: {e}")
-    
-    return _embedder
+def _busy_response(error: Exception):
+    """Réponse pour un pool saturé (503) ou une tâche trop longue (504)."""
+    if isinstance(error, ExecutorOverloaded):
+        return jsonify({"error": str(error)}), 503, {'Retry-After': '2'}
+    return jsonify({"error": str(error)}), 504
 
 
-def get_reranker_if_needed():
-    """Charge le reranker si nécessaire."""
-    global _reranker
-    
-    if _reranker is None:
-        try:
-            _reranker = get_reranker()
-            print("✅ Reranker chargé")
-        except Exception as e:
-            print(f"⚠️  Erreur lors du chargement du reranker: {e}")
-    
-    return _reranker
+def preload():
+    """
+    Charge les métadonnées dans le processus courant.
+    Appelé par wsgi.py avant le fork des workers gunicorn (preload_app). La recherche
+    cloud est une requête SQL sur les légendes : aucun modèle (CLIP, cross-encoder)
+    n'est chargé ici.
+    """
+    load_index_if_needed()
+
+
+def warm_up():
+    """
+    Phase de démarrage : charge les métadonnées (si preload ne l'a pas déjà fait) et
+    vérifie que la base de données répond. Marque l'API prête.
+    """
+    global _ready, _warmup_error
+    started = time.time()
+    try:
+        preload()
+        # La base doit répondre (le stockage est initialisé à l'import du module)
+        db.list_media(limit=1)
+        _ready = True
+        _warmup_error = None
+        print(f"✅ API prête ({time.time() - started:.1f}s de warm-up)")
+    except Exception as e:
+        _warmup_error = str(e)
+        print(f"❌ Erreur lors du warm-up: {e}")
+
+
+def start_warm_up():
+    """Lance warm_up dans un thread : /api/health répond (liveness) pendant le chargement."""
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
 
 
 @app.route('/api/media/initial', methods=['GET'])
@@ -113,9 +156,13 @@ def get_initial_media():
         load_index_if_needed()
         
         limit = int(request.args.get('limit', 9))
+        cursor = request.args.get('cursor')
         
-        # Récupérer depuis la base de données
-        media_list = db.list_media(limit=limit, offset=0)
+        # Récupérer depuis la base de données (pagination keyset)
+        try:
+            media_list, next_cursor = db.list_media_page(limit=limit, cursor=cursor)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
         # Formater pour l'API
         formatted_media = []
@@ -130,7 +177,8 @@ def get_initial_media():
         
         return jsonify({
             "media": formatted_media,
-            "count": len(formatted_media)
+            "count": len(formatted_media),
+            "next_cursor": next_cursor
         }), 200
         
     except Exception as e:
@@ -149,46 +197,58 @@ def search_media():
         data = request.get_json()
         query = data.get('query', '')
         
+        # Options de recherche
+        top_k = data.get('top_k', 12)
+        cursor = data.get('cursor')
+        
         if not query:
             return jsonify({"results": []}), 200
         
-        # Options de recherche
-        top_k = data.get('top_k', 12)
-        use_query_expansion = data.get('use_query_expansion', True)
-        auto_translate = data.get('auto_translate', False)
-        use_dynamic_threshold = data.get('use_dynamic_threshold', False)
-        fixed_threshold = data.get('fixed_threshold', 0.3)
-        always_rerank = data.get('always_rerank', False)
-        rerank_if_below = data.get('rerank_if_below', None)
-        
-        # Charger les modèles si nécessaire
-        embedder = get_embedder_if_needed()
-        reranker = get_reranker_if_needed() if (always_rerank or rerank_if_below) else None
-        
-        # Pour l'instant, recherche simple par caption
+        # Curseur sans état (position + total) : la recherche SQL est déterministe, la page
+        # suivante est recalculée par n'importe quel worker, sans cache en mémoire
+        offset = 0
+        total = None
+        if cursor:
+            try:
+                position = decode_cursor(cursor)
+                offset = int(position["offset"])
+                total = int(position["total"])
+            except (ValueError, KeyError, TypeError):
+                return jsonify({"error": "Curseur invalide"}), 400
+        
+        # Nombre de candidats classés gardés pour les pages suivantes
+        max_results = data.get('max_results', max(top_k, 100))
+        
+        # Recherche plein texte indexée sur les légendes (FTS5 / tsvector)
         # TODO: Implémenter la recherche vectorielle avec FAISS
-        all_media = db.list_media(limit=1000)
-        
-        # Filtrer par caption (recherche simple)
-        results = []
-        query_lower = query.lower()
-        for media in all_media:
-            caption = media.get("caption", "").lower()
-            if query_lower in caption:
-                results.append({
-                    "path": media.get("file_path", ""),
-                    "file_path": media.get("file_path", ""),
-                    "score": 0.8,  # Score simple
-                    "caption": media.get("caption", ""),
-                    "media_type": media.get("media_type", "image")
-                })
+        if total is None:
+            # Première page : le total (borné à max_results) est compté une fois
+            matches = db.search_captions(query, limit=max_results)
+            total = len(matches)
+            matches = matches[:top_k]
+        else:
+            matches = db.search_captions(query, limit=max(0, min(top_k, total - offset)), offset=offset)
+        
+        page = []
+        for media in matches:
+            page.append({
+                "path": media.get("file_path", ""),
+                "file_path": media.get("file_path", ""),
+                "score": float(media.get("rank", 0.0)),
+                "caption": media.get("caption", ""),
+                "media_type": media.get("media_type", "image")
+            })
         
-        # Limiter les résultats
-        results = results[:top_k]
+        next_offset = offset + len(page)
+        next_cursor = None
+        if page and next_offset < total:
+            next_cursor = encode_cursor({"offset": next_offset, "total": total})
         
         return jsonify({
-            "results": results,
-            "count": len(results)
+            "results": page,
+            "count": len(page),
+            "total": total,
+            "next_cursor": next_cursor
         }), 200
         
     except Exception as e:
@@ -217,6 +277,7 @@ def upload_media():
         }
         
         uploaded_files = []
+        media_rows = []
         errors = []
         
         for file in files:
@@ -235,30 +296,29 @@ def upload_media():
                 # Déterminer le type média
                 media_type = "video" if ext in ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.webm', '.m4v'] else "image"
                 
-                # Sauvegarder le fichier dans le stockage
-                # Lire le contenu du fichier
-                file.seek(0)  # S'assurer qu'on est au début
-                file_path = storage.save_file(file, filename, mime_type)
-                file.seek(0)  # Remettre au début pour la taille
+                # Sauvegarder le fichier dans le stockage en streaming
+                # (taille et hash calculés pendant l'écriture, sans relire le fichier)
+                file_path, file_size, file_hash = storage.save_upload(file.stream, filename, mime_type)
                 
-                # Ajouter à la base de données
-                media_id = db.add_media(
-                    file_path=file_path,
-                    file_name=filename,
-                    media_type=media_type,
-                    file_size=len(file.read()),
-                    mime_type=mime_type,
-                    caption=""  # Sera généré plus tard
-                )
+                # Préparer la ligne de base de données (insérée en lot après la boucle)
+                media_rows.append({
+                    "file_path": file_path,
+                    "file_name": filename,
+                    "media_type": media_type,
+                    "file_size": file_size,
+                    "mime_type": mime_type,
+                    "caption": ""  # Sera généré plus tard
+                })
                 
                 uploaded_files.append({
-                    "id": media_id,
                     "file_path": file_path,
                     "file_name": filename,
-                    "media_type": media_type
+                    "media_type": media_type,
+                    "file_size": file_size,
+                    "sha256": file_hash
                 })
                 
-                print(f"✅ Fichier uploadé: {file_path} (ID: {media_id})")
+                print(f"✅ Fichier uploadé: {file_path}")
                 
             except Exception as e:
                 errors.append(f"{file.filename}: {str(e)}")
@@ -272,6 +332,29 @@ def upload_media():
                 "details": errors
             }), 400
         
+        # Ajouter tous les médias à la base de données en une seule transaction
+        try:
+            media_ids = db.add_media_many(media_rows)
+        except Exception as e:
+            # Échec de l'insertion : supprimer les fichiers déjà stockés pour ne pas laisser d'orphelins
+            print(f"❌ Erreur lors de l'ajout en base: {e}")
+            for uploaded in uploaded_files:
+                try:
+                    removed = storage.delete_file(uploaded["file_path"])
+                except Exception as delete_error:
+                    removed = False
+                    print(f"⚠️  Impossible de supprimer {uploaded['file_path']}: {delete_error}")
+                if not removed:
+                    print(f"⚠️  Fichier orphelin dans le stockage: {uploaded['file_path']}")
+                errors.append(f"{uploaded['file_name']}: Erreur base de données ({e})")
+            return jsonify({
+                "error": "Aucun fichier n'a pu être enregistré en base",
+                "details": errors
+            }), 500
+        for uploaded, media_id in zip(uploaded_files, media_ids):
+            uploaded["id"] = media_id
+        print(f"✅ {len(media_ids)} média(s) ajouté(s) à la base de données")
+        
         # Indexer automatiquement les nouveaux fichiers (en arrière-plan)
         # TODO: Implémenter l'indexation en arrière-plan
         try:
@@ -307,27 +390,41 @@ def get_thumbnail():
     try:
         file_path = request.args.get('path', '')
         media_type = request.args.get('type', 'image')
+        size = int(request.args.get('size', DEFAULT_THUMBNAIL_SIZE))
+        if size not in THUMBNAIL_SIZES:
+            size = DEFAULT_THUMBNAIL_SIZE
         
         if not file_path:
             return jsonify({"error": "Chemin non fourni"}), 400
         
-        # Générer la miniature
-        if media_type == 'video':
-            thumbnail = get_video_preview(file_path)
-        else:
-            thumbnail = make_thumbnail(file_path)
-        
-        if thumbnail is None:
+        # Vignette sur disque (pré-générée à l'indexation, sinon générée maintenant)
+        # variant=sprite : planche de survol d'une vidéo (nombre de frames = largeur / hauteur)
+        variant = request.args.get('variant') if media_type == 'video' else None
+        cache_path = find_cached_thumbnail(file_path, media_type=media_type, max_size=size, variant=variant)
+        if cache_path is None:
+            # Décodage + redimensionnement dans le pool borné
+            if variant == 'sprite':
+                cache_path = _thumbnail_executor.run(get_video_sprite_path, file_path)
+            else:
+                cache_path = _thumbnail_executor.run(get_thumbnail_path, file_path, media_type=media_type, max_size=size)
+        if cache_path is None:
             return jsonify({"error": "Impossible de générer la miniature"}), 500
         
-        # Convertir en base64
-        buffer = io.BytesIO()
-        thumbnail.save(buffer, format='JPEG', quality=85)
-        buffer.seek(0)
-        
-        # Retourner l'image
-        return send_file(buffer, mimetype='image/jpeg')
-        
+        # Octets JPEG depuis le cache mémoire (ou lus une fois depuis le disque)
+        entry = _thumbnail_cache.get(cache_path) or _thumbnail_cache.load(cache_path)
+        if entry is None:
+            response = send_file(cache_path, mimetype='image/jpeg', conditional=True)
+            response.headers['Cache-Control'] = THUMBNAIL_CACHE_CONTROL
+            return response
+        
+        data, etag = entry
+        headers = {'ETag': etag, 'Cache-Control': THUMBNAIL_CACHE_CONTROL}
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=304, headers=headers)
+        return Response(data, mimetype='image/jpeg', headers=headers)
+        
+    except (ExecutorOverloaded, ExecutorTimeout) as e:
+        return _busy_response(e)
     except Exception as e:
         print(f"❌ Erreur get_thumbnail: {e}")
         return jsonify({"error": str(e)}), 500
@@ -351,33 +448,12 @@ def get_media_file():
             return redirect(file_url)
         
         # Sinon, servir le fichier localement
-        if not os.path.exists(file_path):
+        info = _media_files.get(file_path)
+        if info is None:
             return jsonify({"error": "Fichier introuvable"}), 404
         
-        # Déterminer le type MIME
-        ext = os.path.splitext(file_path)[1].lower()
-        mime_types = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp',
-            '.mp4': 'video/mp4',
-            '.mov': 'video/quicktime',
-            '.avi': 'video/x-msvideo',
-            '.mkv': 'video/x-matroska',
-            '.webm': 'video/webm',
-        }
-        
-        mime_type = mime_types.get(ext, 'application/octet-stream')
-        
-        # Servir le fichier avec les en-têtes appropriés
-        return send_file(
-            file_path,
-            mimetype=mime_type,
-            as_attachment=False,
-            conditional=True
-        )
+        # Requêtes Range (lecture/scrubbing vidéo) et envoi sans copie quand le serveur le permet
+        return send_media_file(info)
         
     except Exception as e:
         print(f"❌ Erreur get_media_file: {e}")
@@ -386,10 +462,13 @@ def get_media_file():
 
 @app.route('/api/health', methods=['GET'])
 def health():
-    """Endpoint de santé."""
+    """
+    Endpoint de santé.
+    Liveness : répond 200 tant que le processus sert des requêtes (même pendant le warm-up).
+    Readiness : champ "ready", ou /api/health/ready qui renvoie 503 tant que les
+    métadonnées ne sont pas chargées ou que la base ne répond pas.
+    """
     try:
-        load_index_if_needed()
-        
         if _index_loaded:
             media_count = len(_metadata)
         else:
@@ -398,9 +477,15 @@ def health():
         
         return jsonify({
             "status": "ok",
+            "live": True,
+            "ready": _ready,
+            "warmup_error": _warmup_error,
             "index_loaded": _index_loaded,
             "media_count": media_count,
-            "storage_type": storage.storage_type
+            "storage_type": storage.storage_type,
+            "executors": {
+                "thumbnail": _thumbnail_executor.stats()
+            }
         }), 200
     except Exception as e:
         return jsonify({
@@ -409,6 +494,16 @@ def health():
         }), 500
 
 
+@app.route('/api/health/ready', methods=['GET'])
+def readiness():
+    """Readiness : 200 quand les métadonnées sont chargées et la base joignable, 503 sinon."""
+    return jsonify({
+        "ready": _ready,
+        "warmup_error": _warmup_error,
+        "index_loaded": _index_loaded
+    }), 200 if _ready else 503
+
+
 if __name__ == '__main__':
     import sys
     
@@ -420,6 +515,9 @@ if __name__ == '__main__':
     print(f"💾 Stockage: {storage.storage_type}")
     print(f"🗄️  Base de données: {'PostgreSQL' if db.use_postgres else 'SQLite'}")
     
+    # Warm-up en arrière-plan : /api/health répond pendant le chargement
+    start_warm_up()
+    
     try:
         app.run(host='0.0.0.0', port=port, debug=False)
     except OSError as e:
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+"""
+Benchmark des profils de légendes BLIP (fast, balanced, quality).
+Mesure le débit de chaque profil (légendes par seconde) et, avec --evaluate,
+l'effet des légendes sur les métriques de evaluate_search.py (Hit@k, MRR) :
+les légendes de l'index sont régénérées avec chaque profil dans une copie
+des métadonnées (metadata.<profil>.json), évaluée sur le même index FAISS.
+"""
+
+import os
+# Fix pour OpenMP sur macOS - DOIT être au tout début
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from typing import List, Dict, Optional
+
+from core.captioner import get_captioner, load_caption_image, BLIPCaptioner, CAPTION_PROFILES
+from core.indexer import save_metadata
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+EVALUATION_METRICS = {
+    "hit_at_1": re.compile(r"Hit@1: ([\d.]+)%"),
+    "hit_at_5": re.compile(r"Hit@5: ([\d.]+)%"),
+    "hit_at_10": re.compile(r"Hit@10: ([\d.]+)%"),
+    "mrr": re.compile(r"MRR \(Mean Reciprocal Rank\): ([\d.]+)"),
+}
+
+
+def benchmark_profile(captioner: BLIPCaptioner, image_paths: List[str], profile: str,
+                      batch_size: int) -> Dict:
+    """
+    Mesure le débit d'un profil de légendes.
+    Le décodage des images n'est pas compté (voir benchmark_decode.py).
+
+    Args:
+        captioner: Instance de BLIPCaptioner
+        image_paths: Images à légender
+        profile: Nom du profil
+        batch_size: Nombre d'images par passe BLIP
+
+    Returns:
+        Dictionnaire avec le débit, la longueur moyenne et les légendes
+    """
+    images = [load_caption_image(image_path) for image_path in image_paths]
+    start = time.perf_counter()
+    captions = captioner.generate_captions_batch(images, batch_size=batch_size,
+                                                 timeout=60.0 * batch_size, profile=profile)
+    elapsed = time.perf_counter() - start
+    for image in images:
+        image.close()
+
+    valid = [caption for caption in captions if caption != "unknown"]
+    return {
+        "profile": profile,
+        "captions_per_sec": len(captions) / elapsed if elapsed > 0 else 0.0,
+        "avg_words": sum(len(caption.split()) for caption in valid) / len(valid) if valid else 0.0,
+        "unknown": len(captions) - len(valid),
+        "captions": dict(zip(image_paths, captions)),
+    }
+
+
+def write_profile_metadata(metadata_path: str, profile: str, captioner: BLIPCaptioner,
+                           batch_size: int) -> str:
+    """
+    Copie les métadonnées en régénérant les légendes des images avec un profil.
+
+    Args:
+        metadata_path: Métadonnées de référence
+        profile: Nom du profil
+        captioner: Instance de BLIPCaptioner
+        batch_size: Nombre d'images par passe BLIP
+
+    Returns:
+        Chemin des métadonnées écrites (metadata.<profil>.json)
+    """
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    image_paths = sorted({meta["file_path"] for meta in metadata
+                          if meta.get("media_type") == "image" and os.path.exists(meta.get("file_path", ""))})
+    captions = benchmark_profile(captioner, image_paths, profile, batch_size)["captions"]
+    for meta in metadata:
+        caption = captions.get(meta.get("file_path"))
+        if caption and caption != "unknown":
+            meta["caption"] = caption
+            meta.pop("caption_pending", None)
+
+    output_path = f"{os.path.splitext(metadata_path)[0]}.{profile}.json"
+    save_metadata(metadata, output_path)
+    return output_path
+
+
+def run_evaluation(index_path: str, metadata_path: str, test_queries_path: str) -> Optional[Dict]:
+    """
+    Lance evaluate_search.py dans un processus séparé et relève ses métriques.
+    Sans rerank, le classement ne dépend que du cosinus CLIP et ignore les légendes :
+    l'évaluation force donc le rerank Cross-Encoder (qui lit les légendes), à profondeur
+    fixe pour que tous les profils soient comparés sur les mêmes candidats.
+
+    Returns:
+        Dictionnaire des métriques, ou None si l'évaluation a échoué
+    """
+    result = subprocess.run(
+        [sys.executable, "evaluate_search.py", "--index", index_path, "--metadata", metadata_path,
+         "--test-queries", test_queries_path, "--always-rerank"],
+        capture_output=True, text=True,
+        env={**os.environ, "RERANK_POLICY": "fixed"}
+    )
+    metrics = {}
+    for name, pattern in EVALUATION_METRICS.items():
+        match = pattern.search(result.stdout)
+        if match:
+            metrics[name] = float(match.group(1))
+    if not metrics:
+        print(f"⚠️  Évaluation impossible pour {metadata_path}:")
+        print((result.stdout + result.stderr)[-2000:])
+        return None
+    return metrics
+
+
+def main():
+    """Fonction principale."""
+    parser = argparse.ArgumentParser(
+        description="Comparer le débit et la qualité des profils de légendes BLIP"
+    )
+    parser.add_argument(
+        "--data-dir",
+        type=str,
+        default="data/",
+        help="Dossier contenant les images (défaut: data/)"
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=32,
+        help="Nombre maximum d'images pour la mesure de débit (défaut: 32)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=8,
+        help="Nombre d'images par passe BLIP (défaut: 8)"
+    )
+    parser.add_argument(
+        "--profiles",
+        type=str,
+        default=",".join(CAPTION_PROFILES),
+        help=f"Profils à comparer, séparés par des virgules (défaut: {','.join(CAPTION_PROFILES)})"
+    )
+    parser.add_argument(
+        "--evaluate",
+        action="store_true",
+        help="Mesurer aussi l'effet de chaque profil sur evaluate_search.py (légende tout l'index)"
+    )
+    parser.add_argument(
+        "--index",
+        type=str,
+        default="index.faiss",
+        help="Chemin vers l'index FAISS (défaut: index.faiss)"
+    )
+    parser.add_argument(
+        "--metadata",
+        type=str,
+        default="metadata.json",
+        help="Chemin vers les métadonnées (défaut: metadata.json)"
+    )
+    parser.add_argument(
+        "--test-queries",
+        type=str,
+        default="test_queries.json",
+        help="Chemin vers le fichier de requêtes de test (défaut: test_queries.json)"
+    )
+    args = parser.parse_args()
+
+    profiles = [profile.strip() for profile in args.profiles.split(",") if profile.strip()]
+    unknown_profiles = [profile for profile in profiles if profile not in CAPTION_PROFILES]
+    if unknown_profiles:
+        print(f"❌ Profil(s) inconnu(s): {', '.join(unknown_profiles)}")
+        return
+
+    image_paths = sorted(
+        str(p) for p in Path(args.data_dir).rglob("*")
+        if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS
+    )[:args.limit]
+    if not image_paths:
+        print(f"❌ Aucune image trouvée dans {args.data_dir}")
+        return
+
+    captioner = get_captioner()
+    # Passe à vide : chargement du modèle hors mesure
+    benchmark_profile(captioner, image_paths[:1], profiles[0], 1)
+
+    print(f"📷 {len(image_paths)} image(s), lots de {args.batch_size}")
+    results = {}
+    for profile in profiles:
+        result = benchmark_profile(captioner, image_paths, profile, args.batch_size)
+        results[profile] = result
+        print(f"   {profile}: {result['captions_per_sec']:.2f} légende(s)/s, "
+              f"{result['avg_words']:.1f} mot(s) en moyenne, {result['unknown']} unknown")
+
+    # Exemples côte à côte
+    print("\n📝 Exemples:")
+    for image_path in image_paths[:3]:
+        print(f"   {os.path.basename(image_path)}")
+        for profile in profiles:
+            print(f"      {profile}: {results[profile]['captions'][image_path]}")
+
+    if not args.evaluate:
+        return
+    if not os.path.exists(args.metadata) or not os.path.exists(args.test_queries):
+        print(f"❌ {args.metadata} ou {args.test_queries} introuvable, évaluation ignorée")
+        return
+
+    print("\n📊 Effet sur la recherche (evaluate_search.py --always-rerank : rerank Cross-Encoder "
+          "des 10 premiers candidats CLIP, sur les légendes):")
+    for profile in profiles:
+        print(f"   🔄 Légendes '{profile}' pour tout l'index...")
+        metadata_path = write_profile_metadata(args.metadata, profile, captioner, args.batch_size)
+        metrics = run_evaluation(args.index, metadata_path, args.test_queries)
+        if metrics:
+            print(f"   {profile}: Hit@1 {metrics.get('hit_at_1', 0.0):.1f}% | Hit@5 {metrics.get('hit_at_5', 0.0):.1f}% | "
+                  f"Hit@10 {metrics.get('hit_at_10', 0.0):.1f}% | MRR {metrics.get('mrr', 0.0):.4f} ({metadata_path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Benchmark du décodage des images pour les vignettes et les légendes BLIP.
+Compare le chemin historique (décodage pleine résolution puis redimensionnement)
+au décodage JPEG réduit (draft) suivi d'une réduction rapide.
+"""
+
+import time
+import argparse
+from pathlib import Path
+from typing import List, Callable
+
+from PIL import Image
+
+from core.thumbnails import open_image_reduced, fit_image, DEFAULT_THUMBNAIL_SIZE
+from core.captioner import load_caption_image, BLIP_INPUT_SIZE
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+BLIP_MAX_SIDE = 768
+
+
+def legacy_thumbnail(image_path: str, size: int) -> Image.Image:
+    """Ancien chemin des vignettes : décodage complet puis thumbnail()."""
+    with Image.open(image_path) as image:
+        image = image.convert('RGB')
+        thumb = image.copy()
+        thumb.thumbnail((size, size), Image.Resampling.LANCZOS)
+        return thumb
+
+
+def fast_thumbnail(image_path: str, size: int) -> Image.Image:
+    """Nouveau chemin des vignettes : décodage réduit puis fit_image()."""
+    with open_image_reduced(image_path, size) as image:
+        return fit_image(image, size)
+
+
+def legacy_caption_input(image_path: str, size: int) -> Image.Image:
+    """Ancien pré-redimensionnement BLIP : décodage complet puis resize()."""
+    image = Image.open(image_path)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if max(image.size) > size:
+        ratio = size / float(max(image.size))
+        image = image.resize((int(image.size[0] * ratio), int(image.size[1] * ratio)))
+    return image
+
+
+def fast_caption_input(image_path: str, size: int) -> Image.Image:
+    """Nouveau chemin BLIP : décodage réduit directement à la résolution native (384)."""
+    return load_caption_image(image_path, BLIP_INPUT_SIZE)
+
+
+def time_function(func: Callable, image_paths: List[str], size: int, repeat: int) -> float:
+    """
+    Mesure le temps moyen (ms par image) d'une fonction de décodage.
+
+    Args:
+        func: Fonction (image_path, size) -> Image
+        image_paths: Images à traiter
+        size: Côté maximal demandé
+        repeat: Nombre de passes
+
+    Returns:
+        Temps moyen en millisecondes par image
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for image_path in image_paths:
+            func(image_path, size).load()
+    elapsed = time.perf_counter() - start
+    return 1000.0 * elapsed / (repeat * len(image_paths))
+
+
+def main():
+    """Fonction principale."""
+    parser = argparse.ArgumentParser(
+        description="Comparer le décodage pleine résolution et le décodage JPEG réduit"
+    )
+    parser.add_argument(
+        "--data-dir",
+        type=str,
+        default="data/",
+        help="Dossier contenant les images (défaut: data/)"
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=50,
+        help="Nombre maximum d'images (défaut: 50)"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Nombre de passes (défaut: 3)"
+    )
+    args = parser.parse_args()
+
+    image_paths = sorted(
+        str(p) for p in Path(args.data_dir).rglob("*")
+        if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS
+    )[:args.limit]
+    if not image_paths:
+        print(f"❌ Aucune image trouvée dans {args.data_dir}")
+        return
+
+    print(f"📷 {len(image_paths)} image(s), {args.repeat} passe(s)")
+    # Passe à vide pour remplir le cache disque de l'OS
+    time_function(fast_thumbnail, image_paths, DEFAULT_THUMBNAIL_SIZE, 1)
+
+    for label, legacy, fast, size in [
+        ("Vignette", legacy_thumbnail, fast_thumbnail, DEFAULT_THUMBNAIL_SIZE),
+        ("Entrée BLIP", legacy_caption_input, fast_caption_input, BLIP_MAX_SIDE),
+    ]:
+        legacy_ms = time_function(legacy, image_paths, size, args.repeat)
+        fast_ms = time_function(fast, image_paths, size, args.repeat)
+        speedup = legacy_ms / fast_ms if fast_ms > 0 else 0.0
+        print(f"   {label} ({size}px): {legacy_ms:.1f} ms → {fast_ms:.1f} ms par image (x{speedup:.1f})")
+
+
+if __name__ == "__main__":
+    main()
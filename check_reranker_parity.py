@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""
+Vérification de parité entre les backends du Cross-Encoder (torch float32 / ONNX int8).
+Score les mêmes paires (requête, contexte) avec les deux backends, compare les scores,
+l'ordre des résultats (Spearman, top-1) et la latence. Code de sortie 1 si l'écart
+dépasse les seuils (utilisable avant de passer RERANKER_BACKEND=onnx en production).
+Outil complémentaire de test_reranker_parity.py : mêmes critères, mais sur les légendes
+de l'index et avec les latences.
+"""
+
+import os
+# Fix pour OpenMP sur macOS - DOIT être au tout début
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+import sys
+import json
+import time
+import argparse
+from typing import List
+
+import numpy as np
+
+from core.reranker import create_reranker, caption_context, ONNX_AVAILABLE
+
+DEFAULT_QUERIES = [
+    "a dog on the beach",
+    "people at a birthday party",
+    "sunset over the mountains",
+    "une voiture rouge",
+    "a plate of food",
+    "city street at night",
+]
+DEFAULT_CONTEXTS = [
+    "a dog running on the beach",
+    "a group of people around a birthday cake",
+    "the sun setting behind snowy mountains",
+    "a red car parked in the street",
+    "a plate of pasta with tomato sauce",
+    "a busy city street with lights at night",
+    "a cat sleeping on a sofa",
+    "IMG 0412",
+]
+
+
+def spearman(a: np.ndarray, b: np.ndarray) -> float:
+    """Corrélation de rang de Spearman (sans ex aequo)."""
+    if len(a) < 2:
+        return 1.0
+    rank_a = np.argsort(np.argsort(a)).astype(np.float64)
+    rank_b = np.argsort(np.argsort(b)).astype(np.float64)
+    if rank_a.std() == 0 or rank_b.std() == 0:
+        return 1.0
+    return float(np.corrcoef(rank_a, rank_b)[0, 1])
+
+
+def load_queries(test_queries_path: str) -> List[str]:
+    """Requêtes de test_queries.json, ou une liste par défaut."""
+    if os.path.exists(test_queries_path):
+        with open(test_queries_path, 'r', encoding='utf-8') as f:
+            queries = [item.get("query", "") for item in json.load(f)]
+        queries = [query for query in queries if query]
+        if queries:
+            return queries
+    return DEFAULT_QUERIES
+
+
+def load_contexts(metadata_path: str, limit: int) -> List[str]:
+    """Contextes de re-ranking des médias de l'index, ou une liste par défaut."""
+    if os.path.exists(metadata_path):
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        contexts = list(dict.fromkeys(
+            meta.get("rerank_context") or caption_context(meta) for meta in metadata
+        ))
+        contexts = [context for context in contexts if context][:limit]
+        if contexts:
+            return contexts
+    return DEFAULT_CONTEXTS
+
+
+def main():
+    """Fonction principale."""
+    parser = argparse.ArgumentParser(
+        description="Comparer les scores du Cross-Encoder torch et ONNX int8"
+    )
+    parser.add_argument(
+        "--metadata",
+        type=str,
+        default="metadata.json",
+        help="Métadonnées dont les légendes servent de contextes (défaut: metadata.json)"
+    )
+    parser.add_argument(
+        "--test-queries",
+        type=str,
+        default="test_queries.json",
+        help="Requêtes de test (défaut: test_queries.json, sinon une liste intégrée)"
+    )
+    parser.add_argument(
+        "--contexts",
+        type=int,
+        default=50,
+        help="Nombre maximum de contextes par requête (défaut: 50)"
+    )
+    parser.add_argument(
+        "--min-spearman",
+        type=float,
+        default=0.95,
+        help="Corrélation de rang moyenne minimale (défaut: 0.95)"
+    )
+    parser.add_argument(
+        "--min-top1",
+        type=float,
+        default=0.9,
+        help="Part minimale de requêtes avec le même premier résultat (défaut: 0.9)"
+    )
+    args = parser.parse_args()
+
+    if not ONNX_AVAILABLE:
+        print("❌ onnxruntime n'est pas installé (pip install onnxruntime onnx)")
+        sys.exit(1)
+
+    queries = load_queries(args.test_queries)
+    contexts = load_contexts(args.metadata, args.contexts)
+    print(f"🔍 {len(queries)} requête(s) x {len(contexts)} contexte(s)")
+
+    backends = {"torch": create_reranker(backend="torch"), "onnx": create_reranker(backend="onnx")}
+    scores = {}
+    timings = {}
+    for name, reranker in backends.items():
+        reranker.warm_up()
+        start = time.perf_counter()
+        scores[name] = [np.array(reranker.score_pairs([[query, context] for context in contexts]))
+                        for query in queries]
+        timings[name] = 1000.0 * (time.perf_counter() - start) / len(queries)
+
+    correlations = [spearman(t, o) for t, o in zip(scores["torch"], scores["onnx"])]
+    top1 = [int(np.argmax(t) == np.argmax(o)) for t, o in zip(scores["torch"], scores["onnx"])]
+    all_torch = np.concatenate(scores["torch"])
+    all_onnx = np.concatenate(scores["onnx"])
+    score_range = float(all_torch.max() - all_torch.min()) or 1.0
+    max_diff = float(np.abs(all_torch - all_onnx).max())
+
+    mean_spearman = float(np.mean(correlations))
+    top1_rate = float(np.mean(top1))
+    print(f"   - Écart max des scores: {max_diff:.4f} ({100.0 * max_diff / score_range:.1f}% de l'étendue)")
+    print(f"   - Spearman moyen: {mean_spearman:.4f} (min {min(correlations):.4f})")
+    print(f"   - Même premier résultat: {top1_rate:.0%}")
+    speedup = timings["torch"] / timings["onnx"] if timings["onnx"] > 0 else 0.0
+    print(f"   - Latence par requête: torch {timings['torch']:.1f} ms, onnx {timings['onnx']:.1f} ms (x{speedup:.1f})")
+
+    if mean_spearman < args.min_spearman or top1_rate < args.min_top1:
+        print("❌ Parité insuffisante entre les backends")
+        sys.exit(1)
+    print("✅ Parité vérifiée")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ Module de génération de légendes automatiques pour les images avec BLIP.
 """
 
 import os
+import time
+import threading
 # Fix pour OpenMP sur macOS - DOIT être au tout début
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
@@ -10,7 +12,7 @@ import torch
 # Fix pour éviter les problèmes de threading avec FAISS/OpenMP
 torch.set_num_threads(1)
 
-from typing import Optional
+from typing import Optional, List
 from PIL import Image
 import warnings
 
@@ -18,69 +20,157 @@ import warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
 # Import transformers APRÈS torch
-from transformers import BlipProcessor, BlipForConditionalGeneration
+from transformers import BlipProcessor, BlipForConditionalGeneration, StoppingCriteria, StoppingCriteriaList
+
+from .thumbnails import open_image_reduced
 
 
 # Singleton global pour le captioner
 _captioner_instance = None
 
+# Résolution native de BLIP : le processor redimensionne toute image en 384x384
+BLIP_INPUT_SIZE = 384
+
+# Profils de génération (vitesse / qualité des légendes), choisis par CAPTION_PROFILE
+CAPTION_PROFILES = {
+    # Décodage glouton, légendes courtes : plusieurs fois plus rapide sur CPU
+    "fast": {"num_beams": 1, "max_length": 30, "min_length": 5, "no_repeat_ngram_size": 2},
+    "balanced": {"num_beams": 2, "max_length": 40, "min_length": 5, "no_repeat_ngram_size": 2},
+    # Paramètres historiques (beam search à 4 faisceaux)
+    "quality": {"num_beams": 4, "max_length": 60, "min_length": 5, "no_repeat_ngram_size": 2},
+}
+DEFAULT_CAPTION_PROFILE = os.environ.get("CAPTION_PROFILE", "quality")
+
+
+def load_caption_image(image_path: str, size: int = BLIP_INPUT_SIZE) -> Image.Image:
+    """
+    Charge une image directement à la résolution d'entrée de BLIP.
+    Décodage JPEG réduit, puis redimensionnement en size x size comme le fait le
+    processor : son propre redimensionnement ne coûte alors plus rien.
+    
+    Args:
+        image_path: Chemin vers l'image
+        size: Côté de l'entrée du modèle (défaut: 384)
+        
+    Returns:
+        Image PIL RGB de taille size x size
+    """
+    with open_image_reduced(image_path, size) as image:
+        if image.size == (size, size):
+            return image.copy()
+        return image.resize((size, size), Image.Resampling.BICUBIC, reducing_gap=2.0)
+
+
+class CaptionDeadline(StoppingCriteria):
+    """
+    Critère d'arrêt de generate() : délai dépassé ou annulation demandée.
+    Vérifié à chaque token généré, il fonctionne depuis n'importe quel thread ou
+    processus (contrairement à signal.alarm, limité au thread principal et à la seconde).
+    """
+    
+    def __init__(self, timeout: Optional[float] = None, cancel_event: Optional[threading.Event] = None):
+        """
+        Args:
+            timeout: Délai en secondes (None pour illimité)
+            cancel_event: Événement d'annulation (optionnel, positionné depuis un autre thread)
+        """
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.cancel_event = cancel_event
+        self.stopped = False
+    
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        if not self.stopped:
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                self.stopped = True
+            elif self.deadline is not None and time.monotonic() >= self.deadline:
+                self.stopped = True
+        return torch.full((input_ids.shape[0],), self.stopped, dtype=torch.bool, device=input_ids.device)
+
 
 class BLIPCaptioner:
     """Classe pour générer des légendes automatiques avec BLIP."""
     
-    def __init__(self, model_name: str = "Salesforce/blip-image-captioning-base", device: str = None):
+    def __init__(self, model_name: str = "Salesforce/blip-image-captioning-base", device: str = None,
+                 profile: str = None):
         """
         Initialise le modèle BLIP pour la génération de légendes.
         
         Args:
             model_name: Nom du modèle BLIP à utiliser
             device: Device à utiliser ('cuda', 'cpu', ou None pour auto-détection)
+            profile: Profil de génération ('fast', 'balanced', 'quality' ; défaut: CAPTION_PROFILE)
         """
         if device is None:
             device = "cuda" if torch.cuda.is_available() else "cpu"
         
         self.device = device
         self.model_name = model_name
+        self.profile = profile or DEFAULT_CAPTION_PROFILE
+        if self.profile not in CAPTION_PROFILES:
+            raise ValueError(f"Profil de légendes inconnu: {self.profile} (choix: {', '.join(CAPTION_PROFILES)})")
         self._processor = None
         self._model = None
+        # Chargement unique même si plusieurs threads légendent en parallèle
+        self._load_lock = threading.Lock()
         
     def _load_model(self):
         """Charge le modèle BLIP de manière lazy (seulement quand nécessaire)."""
+        if self._model is not None:
+            return
+        with self._load_lock:
+            self._load_model_locked()
+    
+    def _load_model_locked(self):
         if self._model is None:
             print(f"📦 Chargement du modèle BLIP: {self.model_name}")
             print(f"🔧 Device: {self.device}")
             
             try:
                 self._processor = BlipProcessor.from_pretrained(self.model_name)
-                self._model = BlipForConditionalGeneration.from_pretrained(
+                model = BlipForConditionalGeneration.from_pretrained(
                     self.model_name,
                     dtype=torch.float32,
                     low_cpu_mem_usage=True
                 ).to(self.device)
-                self._model.eval()
+                model.eval()
                 
                 # Désactiver le gradient pour éviter les problèmes
-                for param in self._model.parameters():
+                for param in model.parameters():
                     param.requires_grad = False
+                # Publié en dernier : les autres threads ne voient qu'un modèle prêt
+                self._model = model
                     
                 print(f"✅ Modèle BLIP chargé avec succès")
                     
             except Exception as e:
                 raise RuntimeError(f"❌ Erreur lors du chargement du modèle BLIP: {e}")
     
-    def generate_caption(self, image: Image.Image, timeout: float = 15.0) -> str:
+    def _generation_kwargs(self, profile: Optional[str]) -> dict:
+        """Paramètres de generate() pour un profil (défaut: celui du captioner)."""
+        profile = profile or self.profile
+        if profile not in CAPTION_PROFILES:
+            raise ValueError(f"Profil de légendes inconnu: {profile} (choix: {', '.join(CAPTION_PROFILES)})")
+        return CAPTION_PROFILES[profile]
+    
+    def generate_caption(self, image: Image.Image, timeout: float = 15.0,
+                         cancel_event: Optional[threading.Event] = None,
+                         profile: Optional[str] = None) -> str:
         """
         Génère une légende automatique pour une image.
+        Utilisable depuis n'importe quel thread (workers Flask, pools).
         
         Args:
             image: Image PIL à décrire
-            timeout: Timeout en secondes (défaut: 5.0)
+            timeout: Timeout en secondes (défaut: 15.0)
+            cancel_event: Événement d'annulation (optionnel)
+            profile: Profil de génération (défaut: celui du captioner)
             
         Returns:
-            Légende générée (texte) ou "unknown" si erreur/timeout
+            Légende générée (texte) ou "unknown" si erreur/timeout/annulation
         """
         # Charger le modèle si nécessaire
         self._load_model()
+        generation_kwargs = self._generation_kwargs(profile)
         
         try:
             # S'assurer que l'image est valide
@@ -91,61 +181,113 @@ class BLIPCaptioner:
             if image.mode != 'RGB':
                 image = image.convert('RGB')
             
-            # Générer la légende avec gestion de timeout
-            import signal
+            # Générer la légende avec gestion de timeout (critère d'arrêt vérifié à chaque token)
+            deadline = CaptionDeadline(timeout, cancel_event)
+            with torch.inference_mode():
+                inputs = self._processor(image, return_tensors="pt").to(self.device)
+                out = self._model.generate(**inputs, **generation_kwargs,
+                                           stopping_criteria=StoppingCriteriaList([deadline]))
             
-            def timeout_handler(signum, frame):
-                raise TimeoutError("Timeout lors de la génération de la légende")
-            
-            # Sur macOS/Linux, utiliser signal pour timeout
-            old_handler = None
-            try:
-                if hasattr(signal, 'SIGALRM'):
-                    signal.signal(signal.SIGALRM, timeout_handler)
-                    signal.alarm(int(timeout))
-                
-                with torch.inference_mode():
-                    inputs = self._processor(image, return_tensors="pt").to(self.device)
-                    # Augmenter légèrement les paramètres pour de meilleures légendes sur CPU
-                    out = self._model.generate(**inputs, max_length=60, min_length=5, num_beams=4, no_repeat_ngram_size=2)
-                    caption = self._processor.decode(out[0], skip_special_tokens=True)
-                    
-                    result = caption.strip()
-                    
-                    # Annuler l'alarme si succès
-                    if hasattr(signal, 'SIGALRM'):
-                        signal.alarm(0)
-                    
-                    # Si BLIP renvoie quelque chose de non vide et valide, on le garde
-                    if result and result.strip() and len(result.strip()) >= 3:
-                        # Vérifier que ce n'est pas juste "unknown" ou des mots vides
-                        result_lower = result.strip().lower()
-                        if result_lower not in ['unknown', 'error', '']:
-                            return result.strip()
-                    return "unknown"
-            except (TimeoutError, Exception) as e:
-                if hasattr(signal, 'SIGALRM'):
-                    signal.alarm(0)
+            # Légende tronquée par le délai : inutilisable
+            if deadline.stopped:
                 return "unknown"
+            
+            caption = self._processor.decode(out[0], skip_special_tokens=True)
+            return self._clean_caption(caption)
                 
         except Exception as e:
             # En cas d'erreur, retourner "unknown"
             return "unknown"
 
 
-def get_captioner(model_name: str = "Salesforce/blip-image-captioning-base", device: str = None) -> BLIPCaptioner:
+    def generate_captions_batch(self, images: List[Image.Image], batch_size: int = 8,
+                                timeout: float = 60.0,
+                                cancel_event: Optional[threading.Event] = None,
+                                profile: Optional[str] = None) -> List[str]:
+        """
+        Génère les légendes de plusieurs images, batch_size images par appel à generate().
+        Sur CPU, le coût du beam search est largement amorti par image.
+        
+        Args:
+            images: Liste d'images PIL à décrire
+            batch_size: Nombre d'images par passe du modèle
+            timeout: Timeout en secondes par batch
+            cancel_event: Événement d'annulation (optionnel) : les batchs restants sont ignorés
+            profile: Profil de génération (défaut: celui du captioner)
+            
+        Returns:
+            Liste de légendes (même ordre que images), "unknown" si erreur/timeout/annulation
+        """
+        if not images:
+            return []
+        
+        # Charger le modèle si nécessaire
+        self._load_model()
+        generation_kwargs = self._generation_kwargs(profile)
+        
+        captions = []
+        for start in range(0, len(images), batch_size):
+            batch = images[start:start + batch_size]
+            valid = [i for i, image in enumerate(batch)
+                     if image is not None and image.size[0] > 0 and image.size[1] > 0]
+            batch_captions = ["unknown"] * len(batch)
+            if not valid or (cancel_event is not None and cancel_event.is_set()):
+                captions.extend(batch_captions)
+                continue
+            
+            deadline = CaptionDeadline(timeout, cancel_event)
+            try:
+                rgb_images = [batch[i] if batch[i].mode == 'RGB' else batch[i].convert('RGB') for i in valid]
+                with torch.inference_mode():
+                    inputs = self._processor(images=rgb_images, return_tensors="pt").to(self.device)
+                    out = self._model.generate(**inputs, **generation_kwargs,
+                                               stopping_criteria=StoppingCriteriaList([deadline]))
+                
+                if deadline.stopped:
+                    # Légendes tronquées par le délai ou l'annulation : inutilisables
+                    print(f"⚠️  Délai dépassé ou annulation lors du captioning par batch ({len(valid)} image(s))")
+                else:
+                    decoded = self._processor.batch_decode(out, skip_special_tokens=True)
+                    for i, caption in zip(valid, decoded):
+                        batch_captions[i] = self._clean_caption(caption)
+            except Exception as e:
+                # Batch en échec : image par image, pour ne perdre que les images fautives
+                print(f"⚠️  Erreur lors du captioning par batch ({e}), repli image par image")
+                for i in valid:
+                    batch_captions[i] = self.generate_caption(batch[i], timeout=timeout / len(valid),
+                                                              cancel_event=cancel_event, profile=profile)
+            
+            captions.extend(batch_captions)
+        
+        return captions
+    
+    @staticmethod
+    def _clean_caption(caption: str) -> str:
+        """Nettoie une légende BLIP ; "unknown" si vide ou non exploitable."""
+        result = (caption or "").strip()
+        # Si BLIP renvoie quelque chose de non vide et valide, on le garde
+        if result and len(result) >= 3:
+            # Vérifier que ce n'est pas juste "unknown" ou des mots vides
+            if result.lower() not in ['unknown', 'error', '']:
+                return result
+        return "unknown"
+
+
+def get_captioner(model_name: str = "Salesforce/blip-image-captioning-base", device: str = None,
+                  profile: str = None) -> BLIPCaptioner:
     """
     Factory function pour obtenir un BLIPCaptioner (singleton).
     
     Args:
         model_name: Nom du modèle BLIP
         device: Device à utiliser
+        profile: Profil de génération par défaut (défaut: CAPTION_PROFILE)
     
     Returns:
         Instance de BLIPCaptioner (singleton)
     """
     global _captioner_instance
     if _captioner_instance is None:
-        _captioner_instance = BLIPCaptioner(model_name=model_name, device=device)
+        _captioner_instance = BLIPCaptioner(model_name=model_name, device=device, profile=profile)
     return _captioner_instance
 
@@ -106,6 +106,14 @@ class CLIPEmbedder:
             except Exception as e2:
                 raise RuntimeError(f"Erreur lors de l'encodage de l'image: {e2}")
     
+    def warm_up(self):
+        """
+        Exécute une passe à vide texte + image pour allouer les buffers et initialiser
+        les noyaux avant la première vraie requête.
+        """
+        self.encode_text("a photo")
+        self.encode_image(Image.new('RGB', (224, 224)))
+    
     def encode_text(self, text: str) -> np.ndarray:
         """
         Encode un texte en embedding.
@@ -0,0 +1,332 @@
+"""
+Détection des quasi-doublons (rafales, photos ré-uploadées) dans la bibliothèque.
+Deux niveaux :
+- à l'upload, une empreinte perceptuelle (dHash 64 bits) et l'empreinte de contenu
+  repèrent en quelques millisecondes une copie d'un média déjà indexé ;
+- sur toute la bibliothèque, un graphe des k plus proches voisins sur les vecteurs CLIP
+  déjà stockés dans l'index FAISS regroupe les médias quasi identiques.
+"""
+
+import os
+import json
+import filecmp
+import time
+import threading
+from typing import List, Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+from PIL import Image
+
+from .thumbnails import open_image_reduced, get_thumbnail_store
+
+# Similarité cosinus minimale entre deux médias d'un même groupe
+DEFAULT_DUPLICATE_THRESHOLD = float(os.environ.get('DUPLICATE_THRESHOLD', 0.95))
+# Nombre de voisins examinés par média (graphe k-NN)
+DEFAULT_DUPLICATE_NEIGHBOURS = int(os.environ.get('DUPLICATE_NEIGHBOURS', 10))
+# Distance de Hamming maximale entre deux dHash pour un quasi-doublon à l'upload
+DEFAULT_PHASH_DISTANCE = int(os.environ.get('PHASH_MAX_DISTANCE', 6))
+# Taille des lots de requêtes FAISS
+DUPLICATE_SEARCH_BATCH = 1024
+
+
+def dhash(image: Image.Image, hash_size: int = 8) -> str:
+    """
+    Empreinte perceptuelle (difference hash) : signe du gradient horizontal sur une
+    miniature en niveaux de gris. Stable au recadrage léger, à la recompression et au
+    redimensionnement.
+
+    Args:
+        image: Image PIL
+        hash_size: Côté de la grille (64 bits pour 8)
+
+    Returns:
+        Empreinte hexadécimale (16 caractères pour 8)
+    """
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+
+def image_phash(image_path: str) -> Optional[str]:
+    """
+    Empreinte perceptuelle d'un fichier image (décodage réduit, quelques ms par JPEG).
+
+    Args:
+        image_path: Chemin vers l'image
+
+    Returns:
+        Empreinte hexadécimale, ou None si l'image est illisible
+    """
+    try:
+        with open_image_reduced(image_path, 64) as image:
+            return dhash(image)
+    except Exception as e:
+        print(f"⚠️  Empreinte perceptuelle impossible pour {image_path}: {e}")
+        return None
+
+
+def hamming_distance(hash_a: str, hash_b: str) -> int:
+    """Nombre de bits différents entre deux empreintes hexadécimales."""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+
+def get_duplicates_path(metadata_path: str) -> str:
+    """Chemin du rapport de doublons associé à un fichier de métadonnées."""
+    return os.path.splitext(metadata_path)[0] + "_duplicates.json"
+
+
+def media_vectors(index: faiss.Index, metadata: List[Dict]) -> Tuple[List[str], List[str], np.ndarray]:
+    """
+    Un vecteur par média, relu dans l'index FAISS (moyenne des frames pour une vidéo).
+
+    Args:
+        index: Index FAISS
+        metadata: Liste des métadonnées (alignée sur l'index)
+
+    Returns:
+        Tuple (chemins, types de média, vecteurs normalisés de shape (n_médias, dim))
+    """
+    rows_by_path = {}
+    media_types = {}
+    for idx, meta in enumerate(metadata[:index.ntotal]):
+        path = meta.get("file_path", "")
+        rows_by_path.setdefault(path, []).append(idx)
+        media_types.setdefault(path, meta.get("media_type", "image"))
+
+    paths = list(rows_by_path)
+    vectors = np.zeros((len(paths), index.d), dtype='float32')
+    for i, path in enumerate(paths):
+        rows = rows_by_path[path]
+        if len(rows) == 1:
+            vectors[i] = index.reconstruct(rows[0])
+        else:
+            vectors[i] = np.mean([index.reconstruct(row) for row in rows], axis=0)
+    faiss.normalize_L2(vectors)
+    return paths, [media_types[path] for path in paths], vectors
+
+
+def find_duplicate_groups(index: faiss.Index, metadata: List[Dict],
+                          threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+                          neighbours: int = DEFAULT_DUPLICATE_NEIGHBOURS) -> List[Dict]:
+    """
+    Regroupe les médias quasi identiques à partir des vecteurs CLIP de l'index.
+    Graphe des k plus proches voisins au-dessus du seuil, puis composantes connexes
+    (union-find) : une rafale de 30 photos forme un seul groupe même si chaque photo
+    n'a que quelques voisins proches.
+
+    Args:
+        index: Index FAISS
+        metadata: Liste des métadonnées
+        threshold: Similarité cosinus minimale d'une arête
+        neighbours: Nombre de voisins examinés par média
+
+    Returns:
+        Liste de groupes {"files", "media_type", "size", "min_similarity", "max_similarity"},
+        du plus grand au plus petit
+    """
+    paths, media_types, vectors = media_vectors(index, metadata)
+    if len(paths) < 2:
+        return []
+
+    media_index = faiss.IndexFlatIP(vectors.shape[1])
+    media_index.add(vectors)
+    k = min(neighbours + 1, len(paths))
+
+    parent = list(range(len(paths)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    edges = []
+    for start in range(0, len(paths), DUPLICATE_SEARCH_BATCH):
+        distances, indices = media_index.search(vectors[start:start + DUPLICATE_SEARCH_BATCH], k)
+        for offset, (row_distances, row_indices) in enumerate(zip(distances, indices)):
+            i = start + offset
+            for similarity, j in zip(row_distances, row_indices):
+                # Voisins triés par similarité : la suite est sous le seuil
+                if similarity < threshold:
+                    break
+                # Chaque arête une seule fois ; pas de groupe mêlant images et vidéos
+                if j <= i or media_types[i] != media_types[j]:
+                    continue
+                edges.append((i, int(j), float(similarity)))
+                root_i, root_j = find(i), find(int(j))
+                if root_i != root_j:
+                    parent[root_j] = root_i
+
+    members = {}
+    for i in range(len(paths)):
+        members.setdefault(find(i), []).append(i)
+    similarities = {}
+    for i, _, similarity in edges:
+        similarities.setdefault(find(i), []).append(similarity)
+
+    groups = []
+    for root, group in members.items():
+        if len(group) < 2:
+            continue
+        group_similarities = similarities.get(root, [threshold])
+        groups.append({
+            "files": sorted(paths[i] for i in group),
+            "media_type": media_types[root],
+            "size": len(group),
+            "min_similarity": min(group_similarities),
+            "max_similarity": max(group_similarities)
+        })
+    groups.sort(key=lambda g: (g["size"], g["max_similarity"]), reverse=True)
+    return groups
+
+
+def detect_duplicates(index_path: str = "index.faiss",
+                      metadata_path: str = "metadata.json",
+                      threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+                      neighbours: int = DEFAULT_DUPLICATE_NEIGHBOURS) -> Dict:
+    """
+    Détecte les quasi-doublons de toute la bibliothèque et écrit le rapport
+    (<metadata>_duplicates.json, écriture atomique).
+
+    Args:
+        index_path: Chemin vers l'index FAISS
+        metadata_path: Chemin vers les métadonnées
+        threshold: Similarité cosinus minimale
+        neighbours: Nombre de voisins examinés par média
+
+    Returns:
+        Rapport {"index_mtime", "threshold", "neighbours", "media_count", "groups", ...}
+    """
+    start = time.perf_counter()
+    index_mtime = os.path.getmtime(index_path)
+    index = faiss.read_index(index_path)
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    print(f"🔎 Recherche des quasi-doublons (seuil {threshold:.2f}, {neighbours} voisins)...")
+    groups = find_duplicate_groups(index, metadata, threshold=threshold, neighbours=neighbours)
+    report = {
+        "index_mtime": index_mtime,
+        "threshold": threshold,
+        "neighbours": neighbours,
+        "media_count": len({meta.get("file_path", "") for meta in metadata}),
+        "duplicate_media": sum(group["size"] for group in groups),
+        "groups": groups,
+        "elapsed": time.perf_counter() - start
+    }
+
+    output_path = get_duplicates_path(metadata_path)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False)
+    os.replace(tmp_path, output_path)
+    print(f"✅ {len(groups)} groupe(s) de quasi-doublons ({report['duplicate_media']} média(s)) en {report['elapsed']:.1f}s")
+    return report
+
+
+def load_duplicates_report(metadata_path: str = "metadata.json") -> Optional[Dict]:
+    """Rapport de doublons de la dernière détection, ou None s'il n'existe pas."""
+    report_path = get_duplicates_path(metadata_path)
+    if not os.path.exists(report_path):
+        return None
+    try:
+        with open(report_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class UploadDuplicateChecker:
+    """
+    Repère à l'upload les copies de médias déjà indexés, sans passer par CLIP :
+    - doublon exact : même empreinte de contenu (celle du cache de vignettes),
+      confirmée par une comparaison complète des fichiers ;
+    - quasi-doublon : dHash à moins de max_distance bits (image recompressée, redimensionnée,
+      photo suivante d'une rafale).
+    Construit une fois par chargement de l'index ; les fichiers vérifiés y sont ajoutés,
+    ce qui détecte aussi les doublons à l'intérieur d'un même envoi.
+    """
+
+    def __init__(self, metadata: List[Dict], max_distance: int = DEFAULT_PHASH_DISTANCE):
+        """
+        Initialise le vérificateur.
+
+        Args:
+            metadata: Métadonnées de l'index (les images portent "phash" depuis l'indexation)
+            max_distance: Distance de Hamming maximale d'un quasi-doublon
+        """
+        self.max_distance = max_distance
+        self._metadata = metadata
+        self._store = get_thumbnail_store()
+        self._lock = threading.Lock()
+        self._by_key = None
+        self._paths = []
+        self._hashes = []
+
+    def _build(self):
+        self._by_key = {}
+        seen = set()
+        for meta in self._metadata:
+            path = meta.get("file_path", "")
+            if meta.get("media_type") != "image" or path in seen:
+                continue
+            seen.add(path)
+            if os.path.exists(path):
+                self._by_key.setdefault(self._store.content_key(path), path)
+            if meta.get("phash"):
+                self._paths.append(path)
+                self._hashes.append(int(meta["phash"], 16))
+
+    def check(self, file_path: str) -> Optional[Dict]:
+        """
+        Cherche un média indexé identique ou quasi identique à un fichier uploadé.
+
+        Args:
+            file_path: Chemin du fichier uploadé (image)
+
+        Returns:
+            {"kind": "exact" | "near", "duplicate_of", "distance"} ou None
+        """
+        abs_path = os.path.abspath(file_path)
+        key = self._store.content_key(file_path)
+        phash = image_phash(file_path)
+        with self._lock:
+            if self._by_key is None:
+                self._build()
+            exact_path = self._by_key.get(key)
+
+        # L'empreinte de contenu ne lit que le début et la fin des gros fichiers :
+        # un doublon exact (que l'appelant peut supprimer) est confirmé octet par octet
+        if exact_path is not None and exact_path != abs_path:
+            try:
+                if not filecmp.cmp(exact_path, abs_path, shallow=False):
+                    exact_path = None
+            except OSError:
+                exact_path = None
+        else:
+            exact_path = None
+
+        with self._lock:
+            match = None
+            if exact_path is not None:
+                match = {"kind": "exact", "duplicate_of": exact_path, "distance": 0}
+            elif phash is not None and self._hashes:
+                value = int(phash, 16)
+                distances = [bin(value ^ other).count("1") for other in self._hashes]
+                best = int(np.argmin(distances))
+                if distances[best] <= self.max_distance:
+                    match = {"kind": "near", "duplicate_of": self._paths[best], "distance": distances[best]}
+
+            # Un doublon exact n'est pas ajouté : il peut être supprimé au lieu d'être indexé
+            if match is not None and match["kind"] == "exact":
+                return match
+            self._by_key.setdefault(key, abs_path)
+            if phash is not None:
+                self._paths.append(abs_path)
+                self._hashes.append(int(phash, 16))
+        return match
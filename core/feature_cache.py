@@ -0,0 +1,217 @@
+"""
+Cache disque des features (embeddings CLIP, légendes BLIP, empreintes perceptuelles)
+adressé par contenu.
+Un média déplacé, restauré depuis un backup ou présent en double dans la bibliothèque
+retrouve ses embeddings et sa légende sans repasser par les modèles.
+Les clés de contenu sont celles du cache de vignettes (ThumbnailStore.content_key) :
+un fichier inchangé (taille, mtime) n'est pas relu.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .thumbnails import get_thumbnail_store, DEFAULT_CACHE_DIR
+
+DEFAULT_FEATURE_CACHE_PATH = os.environ.get('FEATURE_CACHE_PATH', '.cache/features.db')
+# À incrémenter si le calcul des embeddings change (crops, sélection des frames) :
+# les anciennes entrées sont alors ignorées
+FEATURE_CACHE_VERSION = 1
+# Numéro de frame des images fixes (une seule entrée par image)
+IMAGE_FRAME_NUMBER = -1
+
+
+class FeatureCache:
+    """
+    Cache SQLite des embeddings et légendes, par (empreinte de contenu, modèle).
+    Le nom du modèle inclut ses paramètres (ex: profil BLIP, méthode d'encodage),
+    pour ne jamais mélanger des features calculées différemment.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_FEATURE_CACHE_PATH, thumbnail_cache_dir: str = DEFAULT_CACHE_DIR):
+        """
+        Initialise le cache.
+
+        Args:
+            db_path: Chemin du fichier SQLite
+            thumbnail_cache_dir: Dossier du cache de vignettes (empreintes de contenu partagées)
+        """
+        self.db_path = db_path
+        self._store = get_thumbnail_store(thumbnail_cache_dir)
+        self._lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    content_key TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    frame_number INTEGER NOT NULL,
+                    embedding BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (content_key, model, frame_number)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS captions (
+                    content_key TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    caption TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (content_key, model)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS perceptual_hashes (
+                    content_key TEXT PRIMARY KEY,
+                    phash TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _model_key(model: str) -> str:
+        return f"v{FEATURE_CACHE_VERSION}|{model}"
+
+    def content_key(self, file_path: str) -> str:
+        """Empreinte de contenu d'un média (partagée avec le cache de vignettes)."""
+        return self._store.content_key(file_path)
+
+    def get_embeddings(self, file_path: str, model: str) -> List[Tuple[int, np.ndarray]]:
+        """
+        Retourne les embeddings en cache d'un média.
+
+        Args:
+            file_path: Chemin du média
+            model: Identifiant du modèle et de ses paramètres
+
+        Returns:
+            Liste de tuples (numéro de frame, embedding float32), vide si absent
+            (un seul tuple, frame IMAGE_FRAME_NUMBER, pour une image)
+        """
+        key = self.content_key(file_path)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT frame_number, embedding FROM embeddings WHERE content_key = ? AND model = ? ORDER BY frame_number",
+                (key, self._model_key(model))
+            ).fetchall()
+            if rows:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return [(frame_number, np.frombuffer(blob, dtype=np.float32).copy()) for frame_number, blob in rows]
+
+    def put_embeddings(self, file_path: str, model: str, embeddings: List[Tuple[int, np.ndarray]]):
+        """
+        Enregistre les embeddings d'un média (remplace les précédents pour ce modèle).
+
+        Args:
+            file_path: Chemin du média
+            model: Identifiant du modèle et de ses paramètres
+            embeddings: Liste de tuples (numéro de frame, embedding)
+        """
+        if not embeddings:
+            return
+        key = self.content_key(file_path)
+        model_key = self._model_key(model)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings WHERE content_key = ? AND model = ?", (key, model_key))
+            self._conn.executemany(
+                "INSERT INTO embeddings (content_key, model, frame_number, embedding, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(key, model_key, int(frame_number), np.asarray(embedding, dtype=np.float32).tobytes(), now)
+                 for frame_number, embedding in embeddings]
+            )
+            self._conn.commit()
+
+    def get_caption(self, file_path: str, model: str) -> Optional[str]:
+        """
+        Retourne la légende en cache d'un média, ou None.
+
+        Args:
+            file_path: Chemin du média
+            model: Identifiant du modèle de légendes et de son profil
+        """
+        key = self.content_key(file_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT caption FROM captions WHERE content_key = ? AND model = ?",
+                (key, self._model_key(model))
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_caption(self, file_path: str, model: str, caption: str):
+        """
+        Enregistre la légende d'un média.
+
+        Args:
+            file_path: Chemin du média
+            model: Identifiant du modèle de légendes et de son profil
+            caption: Légende générée
+        """
+        key = self.content_key(file_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO captions (content_key, model, caption, created_at) VALUES (?, ?, ?, ?)",
+                (key, self._model_key(model), caption, time.time())
+            )
+            self._conn.commit()
+
+    def get_phash(self, file_path: str) -> Optional[str]:
+        """Empreinte perceptuelle en cache d'une image, ou None."""
+        key = self.content_key(file_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT phash FROM perceptual_hashes WHERE content_key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_phash(self, file_path: str, phash: str):
+        """Enregistre l'empreinte perceptuelle d'une image."""
+        key = self.content_key(file_path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO perceptual_hashes (content_key, phash, created_at) VALUES (?, ?, ?)",
+                (key, phash, time.time())
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict:
+        """Nombre d'entrées et taux de succès depuis le démarrage."""
+        with self._lock:
+            media = self._conn.execute("SELECT COUNT(DISTINCT content_key) FROM embeddings").fetchone()[0]
+            captions = self._conn.execute("SELECT COUNT(*) FROM captions").fetchone()[0]
+        return {"media": media, "captions": captions, "hits": self.hits, "misses": self.misses}
+
+
+_feature_caches = {}
+_feature_caches_lock = threading.Lock()
+
+
+def get_feature_cache(db_path: str = DEFAULT_FEATURE_CACHE_PATH) -> FeatureCache:
+    """
+    Retourne le cache de features d'un fichier (singleton par fichier).
+
+    Args:
+        db_path: Chemin du fichier SQLite
+
+    Returns:
+        Instance de FeatureCache
+    """
+    key = os.path.abspath(db_path)
+    with _feature_caches_lock:
+        cache = _feature_caches.get(key)
+        if cache is None:
+            cache = FeatureCache(db_path)
+            _feature_caches[key] = cache
+        return cache
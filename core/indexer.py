@@ -12,18 +12,31 @@ torch.set_num_threads(1)
 
 import json
 import glob
+import threading
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Tuple, Dict
 import numpy as np
 import faiss
 from PIL import Image
 import heapq
 
+# Verrou inter-processus des écritures d'index (workers gunicorn) : absent sous Windows
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
 # Import cv2 EN DERNIER pour éviter les conflits
 import cv2
 
 from .clip_utils import CLIPEmbedder
-from .captioner import BLIPCaptioner, get_captioner
+from .captioner import BLIPCaptioner, get_captioner, load_caption_image, BLIP_INPUT_SIZE
+from .lexical import build_lexical_index, save_lexical_index, get_lexical_index_path
+from .thumbnails import ThumbnailPipeline
+from .feature_cache import FeatureCache, get_feature_cache, IMAGE_FRAME_NUMBER
+from .reranker import caption_context
+from .duplicates import image_phash
 
 # Formats supportés
 IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp', '.tiff', '.tif'}
@@ -114,7 +127,8 @@ def detect_scene_changes(video_path: str, stride: int = 1, diff_threshold: float
         return []
 
 
-def select_quality_frames(video_path: str, n_frames: int = 10, use_scene_diversity: bool = True) -> List[Image.Image]:
+def select_quality_frames(video_path: str, n_frames: int = 10, use_scene_diversity: bool = True,
+                          with_positions: bool = False) -> List[Image.Image]:
     """
     Sélectionne les N meilleures frames d'une vidéo basées sur la qualité (Laplacian variance)
     et la diversité de scènes (changements de scène détectés).
@@ -126,9 +140,11 @@ def select_quality_frames(video_path: str, n_frames: int = 10, use_scene_diversi
         video_path: Chemin vers la vidéo
         n_frames: Nombre de frames à sélectionner (les meilleures)
         use_scene_diversity: Si True, favorise la diversité de scènes (défaut: True)
+        with_positions: Si True, retourne des tuples (numéro de frame, image)
         
     Returns:
-        Liste d'images PIL (les meilleures frames, diversifiées par scène)
+        Liste d'images PIL (les meilleures frames, diversifiées par scène), de la meilleure
+        à la moins bonne
     """
     # Utiliser un heap min pour garder seulement les N meilleures frames
     heap = []
@@ -204,7 +220,10 @@ def select_quality_frames(video_path: str, n_frames: int = 10, use_scene_diversi
         
         # Extraire les frames du heap et les trier par score décroissant
         frames_with_scores = sorted(heap, key=lambda x: -x[0], reverse=True)
-        selected_frames = [f[2] for f in frames_with_scores]
+        if with_positions:
+            selected_frames = [(f[1], f[2]) for f in frames_with_scores]
+        else:
+            selected_frames = [f[2] for f in frames_with_scores]
         
         print(f"    ✅ Sélectionné {len(selected_frames)} frame(s) sur {frame_count} analysée(s)")
         return selected_frames
@@ -214,7 +233,8 @@ def select_quality_frames(video_path: str, n_frames: int = 10, use_scene_diversi
         return []
 
 
-def extract_frames_from_video(video_path: str, frame_interval: float = 2.0, use_quality_selection: bool = True) -> List[Image.Image]:
+def extract_frames_from_video(video_path: str, frame_interval: float = 2.0, use_quality_selection: bool = True,
+                              with_positions: bool = False) -> List[Image.Image]:
     """
     Extrait des frames d'une vidéo.
     Utilise la sélection intelligente par qualité si use_quality_selection=True,
@@ -224,6 +244,7 @@ def extract_frames_from_video(video_path: str, frame_interval: float = 2.0, use_
         video_path: Chemin vers la vidéo
         frame_interval: Intervalle en secondes entre chaque frame (si use_quality_selection=False)
         use_quality_selection: Si True, utilise la sélection par qualité (recommandé)
+        with_positions: Si True, retourne des tuples (numéro de frame, image)
         
     Returns:
         Liste d'images PIL
@@ -239,7 +260,7 @@ def extract_frames_from_video(video_path: str, frame_interval: float = 2.0, use_
         
         # Sélectionner environ 1 frame toutes les 2 secondes
         n_frames = max(5, min(int(duration / frame_interval), 20))  # Entre 5 et 20 frames
-        return select_quality_frames(video_path, n_frames=n_frames)
+        return select_quality_frames(video_path, n_frames=n_frames, with_positions=with_positions)
     else:
         # Méthode classique : échantillonnage régulier
         frames = []
@@ -267,7 +288,7 @@ def extract_frames_from_video(video_path: str, frame_interval: float = 2.0, use_
                     try:
                         frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                         pil_image = Image.fromarray(frame_rgb)
-                        frames.append(pil_image)
+                        frames.append((frame_count, pil_image) if with_positions else pil_image)
                     except Exception as e:
                         print(f"⚠️  Erreur lors de l'extraction d'une frame: {e}")
                         continue
@@ -406,7 +427,26 @@ def encode_image_multi_scale(image: Image.Image, embedder: CLIPEmbedder) -> np.n
     return encode_image_adaptive(image, embedder, n_crops=5)
 
 
-def process_image(image_path: str, embedder: CLIPEmbedder, use_multi_scale: bool = True) -> np.ndarray:
+def image_feature_model(embedder: CLIPEmbedder, use_multi_scale: bool = True) -> str:
+    """Identifiant des embeddings d'image dans le cache de features (modèle + méthode d'encodage)."""
+    return f"{embedder.model_name}|image|{'adaptive5' if use_multi_scale else 'single'}"
+
+
+def video_feature_model(embedder: CLIPEmbedder, frame_interval: float, use_quality_selection: bool,
+                        max_frames: int = None) -> str:
+    """Identifiant des embeddings de frames dans le cache de features (modèle + sélection des frames)."""
+    return (f"{embedder.model_name}|video|interval={frame_interval}|quality={use_quality_selection}"
+            f"|max_frames={max_frames}")
+
+
+def caption_feature_model(captioner: BLIPCaptioner) -> str:
+    """Identifiant des légendes dans le cache de features (modèle BLIP + profil)."""
+    return f"{captioner.model_name}|{captioner.profile}"
+
+
+def process_image(image_path: str, embedder: CLIPEmbedder, use_multi_scale: bool = True,
+                  thumbnail_pipeline: ThumbnailPipeline = None,
+                  feature_cache: FeatureCache = None) -> np.ndarray:
     """
     Traite une image et retourne son embedding.
     Utilise l'augmentation multi-échelle si use_multi_scale=True (recommandé).
@@ -415,6 +455,9 @@ def process_image(image_path: str, embedder: CLIPEmbedder, use_multi_scale: bool
         image_path: Chemin vers l'image
         embedder: Instance de CLIPEmbedder
         use_multi_scale: Si True, utilise l'augmentation multi-échelle
+        thumbnail_pipeline: Si fourni, génère les vignettes à partir de l'image déjà décodée
+        feature_cache: Si fourni, réutilise l'embedding d'un fichier au contenu identique
+            (les vignettes sont alors générées à la demande)
         
     Returns:
         Embedding numpy (ou None en cas d'erreur)
@@ -424,6 +467,11 @@ def process_image(image_path: str, embedder: CLIPEmbedder, use_multi_scale: bool
             print(f"⚠️  Fichier introuvable: {image_path}")
             return None
         
+        if feature_cache is not None:
+            cached = feature_cache.get_embeddings(image_path, image_feature_model(embedder, use_multi_scale))
+            if cached:
+                return cached[0][1]
+        
         # Ouvrir l'image
         image = Image.open(image_path)
         if image.mode != 'RGB':
@@ -441,6 +489,9 @@ def process_image(image_path: str, embedder: CLIPEmbedder, use_multi_scale: bool
         else:
             embedding = embedder.encode_image(image)
         
+        if thumbnail_pipeline is not None:
+            thumbnail_pipeline.submit(image, os.path.abspath(image_path))
+        
         image.close()
         
         # Nettoyage : s'assurer que c'est bien float32 et valide
@@ -450,6 +501,9 @@ def process_image(image_path: str, embedder: CLIPEmbedder, use_multi_scale: bool
             if not np.all(np.isfinite(embedding)):
                 print(f"⚠️  Embedding contient des valeurs invalides pour {image_path}")
                 return None
+            if feature_cache is not None:
+                feature_cache.put_embeddings(image_path, image_feature_model(embedder, use_multi_scale),
+                                             [(IMAGE_FRAME_NUMBER, embedding)])
         
         return embedding
         
@@ -458,7 +512,53 @@ def process_image(image_path: str, embedder: CLIPEmbedder, use_multi_scale: bool
         return None
 
 
-def process_video(video_path: str, embedder: CLIPEmbedder, frame_interval: float = 2.0, use_quality_selection: bool = True) -> List[np.ndarray]:
+def get_video_fps(video_path: str) -> float:
+    """
+    Retourne le nombre d'images par seconde d'une vidéo (0.0 si inconnu).
+    
+    Args:
+        video_path: Chemin vers la vidéo
+        
+    Returns:
+        FPS de la vidéo
+    """
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) if cap.isOpened() else 0.0
+    finally:
+        cap.release()
+    return fps if fps and fps > 0 else 0.0
+
+
+def video_frame_metadata(video_path: str, frame_idx: int, frame_number: int, fps: float) -> Dict:
+    """
+    Construit l'entrée de métadonnées d'une frame vidéo indexée.
+    
+    Args:
+        video_path: Chemin vers la vidéo
+        frame_idx: Position de la frame parmi les frames sélectionnées
+        frame_number: Numéro de la frame dans la vidéo source
+        fps: FPS de la vidéo (0.0 si inconnu)
+        
+    Returns:
+        Dictionnaire de métadonnées (avec frame_number et timestamp en secondes)
+    """
+    # Pas de légende par frame pour les vidéos (trop long) : nom de fichier nettoyé
+    video_name = filename_caption(video_path)
+    return {
+        "file_path": os.path.abspath(video_path),
+        "media_type": "video",
+        "frame_index": frame_idx,
+        "frame_number": frame_number,
+        "timestamp": round(frame_number / fps, 3) if fps > 0 else None,
+        "caption": f"video: {video_name}"
+    }
+
+
+def process_video(video_path: str, embedder: CLIPEmbedder, frame_interval: float = 2.0, use_quality_selection: bool = True,
+                  thumbnail_pipeline: ThumbnailPipeline = None,
+                  with_positions: bool = False,
+                  feature_cache: FeatureCache = None) -> List[np.ndarray]:
     """
     Traite une vidéo et retourne les embeddings de ses frames.
     Utilise la sélection intelligente par qualité si use_quality_selection=True.
@@ -468,37 +568,411 @@ def process_video(video_path: str, embedder: CLIPEmbedder, frame_interval: float
         embedder: Instance de CLIPEmbedder
         frame_interval: Intervalle en secondes entre chaque frame (si use_quality_selection=False)
         use_quality_selection: Si True, utilise la sélection par qualité
+        thumbnail_pipeline: Si fourni, génère la preview (meilleure frame + planche) à partir des frames sélectionnées
+        with_positions: Si True, retourne des tuples (numéro de frame, embedding)
+        feature_cache: Si fourni, réutilise les embeddings d'un fichier au contenu identique
         
     Returns:
         Liste d'embeddings numpy
     """
     try:
-        frames = extract_frames_from_video(video_path, frame_interval, use_quality_selection=use_quality_selection)
-        if not frames:
+        model = video_feature_model(embedder, frame_interval, use_quality_selection)
+        if feature_cache is not None:
+            cached = feature_cache.get_embeddings(video_path, model)
+            if cached:
+                return cached if with_positions else [embedding for _, embedding in cached]
+        
+        positioned_frames = extract_frames_from_video(video_path, frame_interval,
+                                                      use_quality_selection=use_quality_selection,
+                                                      with_positions=True)
+        if not positioned_frames:
             return []
         
+        if thumbnail_pipeline is not None:
+            thumbnail_pipeline.submit_video(positioned_frames, os.path.abspath(video_path))
+        
         embeddings = []
-        for frame in frames:
+        for frame_number, frame in positioned_frames:
             try:
                 embedding = embedder.encode_image(frame)
                 if embedding is not None:
                     # Nettoyage : s'assurer que c'est bien float32 et valide
                     embedding = embedding.astype('float32')
                     if np.all(np.isfinite(embedding)):
-                        embeddings.append(embedding)
+                        embeddings.append((frame_number, embedding))
                     else:
                         print(f"⚠️  Embedding invalide pour une frame de {video_path}")
             except Exception as e:
                 print(f"⚠️  Erreur lors de l'encodage d'une frame: {e}")
                 continue
         
-        return embeddings
+        if feature_cache is not None and embeddings:
+            feature_cache.put_embeddings(video_path, model, embeddings)
+        
+        return embeddings if with_positions else [embedding for _, embedding in embeddings]
         
     except Exception as e:
         print(f"⚠️  Erreur lors du traitement de {video_path}: {e}")
         return []
 
 
+def filename_caption(file_path: str) -> str:
+    """Légende de repli : nom de fichier sans extension, séparateurs remplacés par des espaces."""
+    return os.path.splitext(os.path.basename(file_path))[0].replace('_',' ').replace('-',' ')
+
+
+def caption_images(captioner: BLIPCaptioner, entries: List[Tuple[Dict, str]],
+                   caption_batch_size: int = 8, input_size: int = BLIP_INPUT_SIZE,
+                   feature_cache: FeatureCache = None):
+    """
+    Génère les légendes BLIP par lots et les écrit dans les métadonnées.
+    Les entrées légendées perdent leur marque "caption_pending" ; si BLIP échoue
+    (erreur, délai dépassé), elles gardent leur légende de repli (nom de fichier)
+    et restent en attente, pour être reprises au prochain passage.
+    
+    Args:
+        captioner: Instance de BLIPCaptioner
+        entries: Liste de tuples (entrée de métadonnées, chemin de l'image)
+        caption_batch_size: Nombre d'images par passe BLIP
+        input_size: Résolution d'entrée de BLIP (les images sont préparées à cette taille)
+        feature_cache: Si fourni, réutilise les légendes des fichiers au contenu identique
+    """
+    if feature_cache is not None:
+        model = caption_feature_model(captioner)
+        remaining = []
+        for meta, image_path in entries:
+            caption = feature_cache.get_caption(image_path, model)
+            if caption:
+                meta["caption"] = caption
+                meta.pop("caption_pending", None)
+            else:
+                remaining.append((meta, image_path))
+        if len(remaining) < len(entries):
+            print(f"\n📝 {len(entries) - len(remaining)} légende(s) reprise(s) du cache")
+        entries = remaining
+    if not entries:
+        return
+    
+    print(f"\n📝 Génération des légendes ({len(entries)} image(s), lots de {caption_batch_size})...")
+    for start in range(0, len(entries), caption_batch_size):
+        batch = entries[start:start + caption_batch_size]
+        images = []
+        loaded = []
+        for meta, image_path in batch:
+            try:
+                # Décodage JPEG réduit, directement à la résolution native du modèle
+                images.append(load_caption_image(image_path, input_size))
+                loaded.append((meta, image_path))
+            except Exception as e:
+                print(f"      ⚠️  Erreur lors du chargement de {image_path} pour la légende: {e}")
+        
+        # Timeout plus long (30 secondes par image) pour éviter les "unknown"
+        captions = captioner.generate_captions_batch(images, batch_size=caption_batch_size,
+                                                     timeout=30.0 * max(1, len(images)))
+        for image in images:
+            image.close()
+        
+        for (meta, image_path), caption in zip(loaded, captions):
+            if caption and caption.strip().lower() != "unknown":
+                meta["caption"] = caption
+                meta.pop("caption_pending", None)
+                if feature_cache is not None:
+                    feature_cache.put_caption(image_path, caption_feature_model(captioner), caption)
+                print(f"      📝 {os.path.basename(image_path)}: {caption}")
+            else:
+                # Si BLIP retourne "unknown" ou vide, garder le nom de fichier
+                print(f"      📝 {os.path.basename(image_path)} (fallback): {meta['caption']}")
+
+
+def cached_image_phash(image_path: str, feature_cache: FeatureCache = None) -> str:
+    """
+    Empreinte perceptuelle d'une image (détection des doublons à l'upload),
+    relue dans le cache de features si le contenu a déjà été vu.
+    
+    Args:
+        image_path: Chemin vers l'image
+        feature_cache: Cache de features (optionnel)
+        
+    Returns:
+        Empreinte hexadécimale, ou None si l'image est illisible
+    """
+    if feature_cache is not None:
+        phash = feature_cache.get_phash(image_path)
+        if phash:
+            return phash
+    phash = image_phash(image_path)
+    if phash and feature_cache is not None:
+        feature_cache.put_phash(image_path, phash)
+    return phash
+
+
+def _open_feature_cache() -> FeatureCache:
+    """Cache de features partagé, ou None s'il est inutilisable (l'indexation continue sans)."""
+    try:
+        return get_feature_cache()
+    except Exception as e:
+        print(f"⚠️  Cache de features indisponible: {e}")
+        return None
+
+
+# Registre des étapes de légendage et des verrous d'écriture
+_metadata_write_lock = threading.Lock()
+
+
+class IndexWriteLock:
+    """
+    Verrou des écritures d'un index (index.faiss, metadata.json, index lexical),
+    partagé entre threads et entre processus (fcntl.flock sur un fichier .lock) :
+    avec plusieurs workers gunicorn, une réindexation ou l'écriture des légendes
+    d'un worker attend celles des autres. Réentrant dans un même thread
+    (la réindexation écrit ensuite les métadonnées et les légendes).
+    """
+    
+    def __init__(self, lock_path: str):
+        self.lock_path = lock_path
+        self._rlock = threading.RLock()
+        self._depth = 0
+        self._file = None
+    
+    def __enter__(self):
+        self._rlock.acquire()
+        if self._depth == 0 and FCNTL_AVAILABLE:
+            try:
+                self._file = open(self.lock_path, 'a')
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            except Exception:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._rlock.release()
+                raise
+        self._depth += 1
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._rlock.release()
+        return False
+
+
+_index_write_locks = {}
+
+
+def index_write_lock(metadata_path: str = "metadata.json") -> IndexWriteLock:
+    """
+    Retourne le verrou d'écriture associé à un fichier de métadonnées
+    (singleton par fichier, fichier de verrou <metadata>.lock).
+    """
+    key = os.path.abspath(metadata_path)
+    with _metadata_write_lock:
+        lock = _index_write_locks.get(key)
+        if lock is None:
+            lock = IndexWriteLock(os.path.splitext(key)[0] + ".lock")
+            _index_write_locks[key] = lock
+        return lock
+
+
+def write_faiss_index(index: faiss.Index, output_index: str):
+    """Écrit l'index FAISS dans un fichier temporaire puis os.replace (jamais lu à moitié écrit)."""
+    tmp_path = output_index + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, output_index)
+
+
+def save_metadata(metadata: List[Dict], output_metadata: str):
+    """
+    Sauvegarde les métadonnées et l'index lexical correspondant.
+    Écriture dans un fichier temporaire puis os.replace : un serveur qui recharge
+    ne lit jamais un fichier à moitié écrit. L'index lexical est écrit en premier,
+    le serveur rechargeant les deux quand metadata.json change.
+    Le contexte du re-ranking (légende ou nom de fichier nettoyé) est précalculé
+    dans chaque entrée ("rerank_context").
+    
+    Args:
+        metadata: Liste des métadonnées
+        output_metadata: Chemin du fichier de métadonnées JSON
+    """
+    for meta in metadata:
+        meta["rerank_context"] = caption_context(meta)
+    
+    lexical_path = get_lexical_index_path(output_metadata)
+    tmp_path = lexical_path + ".tmp"
+    save_lexical_index(build_lexical_index(metadata), tmp_path)
+    os.replace(tmp_path, lexical_path)
+    
+    tmp_path = output_metadata + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, output_metadata)
+
+
+def _merge_captions(metadata_path: str, captions: Dict[str, str]) -> int:
+    """
+    Écrit des légendes dans metadata.json relu sur disque (une réindexation a pu
+    le réécrire entre-temps) : seules les entrées encore en attente sont modifiées.
+    
+    Returns:
+        Nombre d'entrées mises à jour
+    """
+    with index_write_lock(metadata_path):
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        updated = 0
+        for meta in metadata:
+            file_path = meta.get("file_path", "")
+            if meta.get("caption_pending") and file_path in captions:
+                meta["caption"] = captions[file_path]
+                meta.pop("caption_pending", None)
+                updated += 1
+        if updated:
+            save_metadata(metadata, metadata_path)
+        return updated
+
+
+def fill_pending_captions(metadata_path: str = "metadata.json",
+                          captioner: BLIPCaptioner = None,
+                          caption_batch_size: int = 8,
+                          save_every: int = 64,
+                          use_feature_cache: bool = True) -> int:
+    """
+    Étape de légendage découplée de l'indexation : génère les légendes BLIP des
+    entrées marquées "caption_pending" et les écrit dans les métadonnées par tranches.
+    En attendant, la légende est le nom de fichier (recherche CLIP et reranker
+    fonctionnent déjà).
+    
+    Args:
+        metadata_path: Chemin du fichier de métadonnées JSON
+        captioner: Instance de BLIPCaptioner (optionnel, sera créé si None)
+        caption_batch_size: Nombre d'images légendées par passe BLIP
+        save_every: Nombre d'images légendées entre deux écritures des métadonnées
+        use_feature_cache: Si True, réutilise et enregistre les légendes dans le cache de features
+        
+    Returns:
+        Nombre de légendes écrites
+    """
+    if not os.path.exists(metadata_path):
+        return 0
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    
+    pending = []
+    seen = set()
+    for meta in metadata:
+        file_path = meta.get("file_path", "")
+        if meta.get("caption_pending") and file_path and file_path not in seen:
+            seen.add(file_path)
+            # Copie de travail : le fichier est relu au moment d'écrire (_merge_captions)
+            pending.append(({"caption": meta.get("caption", ""), "caption_pending": True}, file_path))
+    if not pending:
+        return 0
+    
+    if captioner is None:
+        try:
+            captioner = get_captioner()
+        except Exception as e:
+            print(f"⚠️  Erreur lors du chargement du captioner: {e}")
+            return 0
+    
+    feature_cache = _open_feature_cache() if use_feature_cache else None
+    written = 0
+    for start in range(0, len(pending), save_every):
+        chunk = pending[start:start + save_every]
+        caption_images(captioner, chunk, caption_batch_size=caption_batch_size, feature_cache=feature_cache)
+        # Seules les légendes réellement produites par BLIP sont écrites : un échec
+        # (ex: délai dépassé sous charge) laisse l'entrée en attente
+        written += _merge_captions(metadata_path, {file_path: meta["caption"] for meta, file_path in chunk
+                                                   if not meta.get("caption_pending")})
+        print(f"💾 Légendes écrites: {min(start + save_every, len(pending))}/{len(pending)}")
+    return written
+
+
+class CaptionStage:
+    """
+    Étape de légendage en arrière-plan (un thread par fichier de métadonnées).
+    Un démarrage pendant un passage en programme un nouveau, qui reprendra
+    les images ajoutées entre-temps.
+    """
+    
+    def __init__(self, metadata_path: str = "metadata.json", captioner: BLIPCaptioner = None,
+                 caption_batch_size: int = 8, use_feature_cache: bool = True):
+        """
+        Initialise l'étape.
+        
+        Args:
+            metadata_path: Chemin du fichier de métadonnées JSON
+            captioner: Instance de BLIPCaptioner (optionnel, sera créé au premier passage)
+            caption_batch_size: Nombre d'images légendées par passe BLIP
+            use_feature_cache: Si True, réutilise et enregistre les légendes dans le cache de features
+        """
+        self.metadata_path = metadata_path
+        self.captioner = captioner
+        self.caption_batch_size = caption_batch_size
+        self.use_feature_cache = use_feature_cache
+        self._lock = threading.Lock()
+        self._thread = None
+        self._rerun = False
+    
+    def start(self):
+        """Lance un passage (ou en programme un autre si un passage est en cours)."""
+        with self._lock:
+            if self._thread is not None:
+                self._rerun = True
+                return
+            self._thread = threading.Thread(target=self._run, name="caption-stage", daemon=True)
+            self._thread.start()
+    
+    def is_running(self) -> bool:
+        """True si un passage est en cours."""
+        with self._lock:
+            return self._thread is not None
+    
+    def _run(self):
+        while True:
+            try:
+                written = fill_pending_captions(self.metadata_path, self.captioner, self.caption_batch_size,
+                                                use_feature_cache=self.use_feature_cache)
+                if written:
+                    print(f"✅ {written} légende(s) ajoutée(s) à {self.metadata_path}")
+            except Exception as e:
+                print(f"⚠️  Erreur lors du légendage en arrière-plan: {e}")
+            with self._lock:
+                if not self._rerun:
+                    self._thread = None
+                    return
+                self._rerun = False
+
+
+_caption_stages = {}
+
+
+def get_caption_stage(metadata_path: str = "metadata.json", captioner: BLIPCaptioner = None,
+                      caption_batch_size: int = 8) -> CaptionStage:
+    """
+    Retourne l'étape de légendage associée à un fichier de métadonnées (singleton par fichier).
+    
+    Args:
+        metadata_path: Chemin du fichier de métadonnées JSON
+        captioner: Instance de BLIPCaptioner (optionnel)
+        caption_batch_size: Nombre d'images légendées par passe BLIP
+        
+    Returns:
+        Instance de CaptionStage
+    """
+    key = os.path.abspath(metadata_path)
+    with _metadata_write_lock:
+        stage = _caption_stages.get(key)
+        if stage is None:
+            stage = CaptionStage(metadata_path, captioner, caption_batch_size)
+            _caption_stages[key] = stage
+        elif captioner is not None and stage.captioner is None:
+            stage.captioner = captioner
+        return stage
+
+
 def extract_and_index(data_dir: str = "data/", 
                       output_index: str = "index.faiss",
                       output_metadata: str = "metadata.json",
@@ -506,7 +980,12 @@ def extract_and_index(data_dir: str = "data/",
                       model_name: str = "openai/clip-vit-large-patch14",
                       embedder: CLIPEmbedder = None,
                       generate_captions: bool = True,
-                      captioner: BLIPCaptioner = None):
+                      captioner: BLIPCaptioner = None,
+                      generate_thumbnails: bool = True,
+                      thumbnail_workers: int = 4,
+                      caption_batch_size: int = 8,
+                      async_captions: bool = False,
+                      use_feature_cache: bool = True):
     """
     Extrait les embeddings de tous les médias et crée l'index FAISS.
     
@@ -519,6 +998,13 @@ def extract_and_index(data_dir: str = "data/",
         embedder: Instance de CLIPEmbedder (optionnel, sera créé si None)
         generate_captions: Si True, génère des légendes automatiques avec BLIP
         captioner: Instance de BLIPCaptioner (optionnel, sera créé si None et generate_captions=True)
+        generate_thumbnails: Si True, pré-génère les vignettes pendant l'indexation
+        thumbnail_workers: Nombre de threads pour la génération des vignettes
+        caption_batch_size: Nombre d'images légendées par passe BLIP
+        async_captions: Si True, les légendes sont générées dans un thread en arrière-plan
+            (get_caption_stage) ; sinon après la sauvegarde de l'index, avant de rendre la main
+        use_feature_cache: Si True, réutilise les embeddings et légendes des fichiers au contenu
+            identique déjà calculés (cache de features, .cache/features.db)
     """
     print("🚀 Démarrage de l'extraction des embeddings...")
     
@@ -560,6 +1046,8 @@ def extract_and_index(data_dir: str = "data/",
     
     all_embeddings = []
     metadata = []
+    thumbnail_pipeline = ThumbnailPipeline(max_workers=thumbnail_workers) if generate_thumbnails else None
+    feature_cache = _open_feature_cache() if use_feature_cache else None
     
     # Traiter les images
     if images:
@@ -568,51 +1056,29 @@ def extract_and_index(data_dir: str = "data/",
         for idx, image_path in enumerate(images, 1):
             print(f"  [{idx}/{len(images)}] {os.path.basename(image_path)}")
             try:
-                embedding = process_image(image_path, embedder, use_multi_scale=True)
+                embedding = process_image(image_path, embedder, use_multi_scale=True,
+                                          thumbnail_pipeline=thumbnail_pipeline, feature_cache=feature_cache)
                 if embedding is not None and embedding.size > 0:
                     all_embeddings.append(embedding)
                     
-                    # Générer la légende si demandé
-                    caption = ""
-                    if generate_captions:
-                        try:
-                            image = Image.open(image_path)
-                            if image.mode != 'RGB':
-                                image = image.convert('RGB')
-                            # Redimensionner pour accélérer BLIP et stabiliser sur CPU
-                            max_side = 768
-                            if max(image.size) > max_side:
-                                ratio = max_side / float(max(image.size))
-                                new_size = (int(image.size[0]*ratio), int(image.size[1]*ratio))
-                                image = image.resize(new_size)
-                            # Timeout plus long (30 secondes) pour éviter les "unknown"
-                            caption = captioner.generate_caption(image, timeout=30.0)
-                            image.close()
-                            
-                            # Si BLIP retourne "unknown" ou vide, utiliser le nom de fichier
-                            if not caption or caption.strip().lower() == "unknown":
-                                cleaned_name = os.path.splitext(os.path.basename(image_path))[0].replace('_',' ').replace('-',' ')
-                                caption = cleaned_name
-                                print(f"      📝 Caption (fallback): {caption}")
-                            else:
-                                print(f"      📝 Caption: {caption}")
-                        except Exception as e:
-                            print(f"      ⚠️  Erreur lors de la génération de la légende: {e}")
-                            # Fallback: nom de fichier nettoyé
-                            cleaned_name = os.path.splitext(os.path.basename(image_path))[0].replace('_',' ').replace('-',' ')
-                            caption = cleaned_name
-                            print(f"      📝 Caption (fallback après erreur): {caption}")
-                    else:
-                        # Même sans generate_captions, utiliser le nom de fichier
-                        cleaned_name = os.path.splitext(os.path.basename(image_path))[0].replace('_',' ').replace('-',' ')
-                        caption = cleaned_name
-                    
-                    metadata.append({
+                    # Légende de repli (nom de fichier) : l'image est cherchable tout de suite,
+                    # la légende BLIP est écrite plus tard par l'étape de légendage
+                    meta = {
                         "file_path": os.path.abspath(image_path),
                         "media_type": "image",
                         "frame_index": None,
-                        "caption": caption
-                    })
+                        "caption": filename_caption(image_path),
+                        "phash": cached_image_phash(image_path, feature_cache)
+                    }
+                    if generate_captions:
+                        # Légende déjà calculée pour un fichier au contenu identique : pas d'attente
+                        cached_caption = feature_cache.get_caption(image_path, caption_feature_model(captioner)) \
+                            if feature_cache is not None else None
+                        if cached_caption:
+                            meta["caption"] = cached_caption
+                        else:
+                            meta["caption_pending"] = True
+                    metadata.append(meta)
                 else:
                     print(f"⚠️  Embedding vide pour {image_path}, ignoré")
             except Exception as e:
@@ -626,26 +1092,23 @@ def extract_and_index(data_dir: str = "data/",
         for idx, video_path in enumerate(videos, 1):
             print(f"  [{idx}/{len(videos)}] {os.path.basename(video_path)}")
             try:
-                embeddings = process_video(video_path, embedder, frame_interval, use_quality_selection=True)
-                for frame_idx, embedding in enumerate(embeddings):
+                embeddings = process_video(video_path, embedder, frame_interval, use_quality_selection=True,
+                                           thumbnail_pipeline=thumbnail_pipeline, with_positions=True,
+                                           feature_cache=feature_cache)
+                fps = get_video_fps(video_path)
+                for frame_idx, (frame_number, embedding) in enumerate(embeddings):
                     if embedding is not None and embedding.size > 0:
                         all_embeddings.append(embedding)
-                        
-                        # Pour les vidéos, on ne génère pas de légende par frame (trop long)
-                        # On peut ajouter une légende générale pour la vidéo si nécessaire
-                        # Caption par défaut pour les vidéos: nom de fichier nettoyé
-                        video_name = os.path.splitext(os.path.basename(video_path))[0].replace('_',' ').replace('-',' ')
-                        default_video_caption = f"video: {video_name}"
-                        metadata.append({
-                            "file_path": os.path.abspath(video_path),
-                            "media_type": "video",
-                            "frame_index": frame_idx,
-                            "caption": default_video_caption
-                        })
+                        # Numéro de frame source et timestamp : lien direct vers le moment trouvé
+                        metadata.append(video_frame_metadata(video_path, frame_idx, frame_number, fps))
             except Exception as e:
                 print(f"⚠️  Exception lors du traitement de {video_path}: {e}")
                 continue
     
+    # Attendre la fin de la génération des vignettes
+    if thumbnail_pipeline is not None:
+        thumbnail_pipeline.close()
+    
     # Vérifier qu'on a des embeddings
     if not all_embeddings:
         print("❌ Aucun embedding extrait. Arrêt.")
@@ -666,12 +1129,14 @@ def extract_and_index(data_dir: str = "data/",
         index = faiss.IndexFlatIP(embedding_dim)
         index.add(embeddings_array)
         
-        print(f"💾 Sauvegarde de l'index dans {output_index}...")
-        faiss.write_index(index, output_index)
-        
-        print(f"💾 Sauvegarde des métadonnées dans {output_metadata}...")
-        with open(output_metadata, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        # Index et métadonnées écrits ensemble, sous le verrou partagé avec les autres workers
+        with index_write_lock(output_metadata):
+            print(f"💾 Sauvegarde de l'index dans {output_index}...")
+            write_faiss_index(index, output_index)
+            
+            # Métadonnées + index inversé (légendes + noms de fichiers) pour la recherche hybride
+            print(f"💾 Sauvegarde des métadonnées dans {output_metadata}...")
+            save_metadata(metadata, output_metadata)
         
         print(f"\n✅ Indexation terminée!")
         print(f"   - {len(all_embeddings)} embedding(s) indexé(s)")
@@ -683,6 +1148,16 @@ def extract_and_index(data_dir: str = "data/",
         print(f"❌ Erreur lors de la création de l'index: {e}")
         import traceback
         traceback.print_exc()
+        return
+    
+    # Légendes BLIP après coup : l'index est déjà interrogeable (légende = nom de fichier)
+    if generate_captions:
+        if async_captions:
+            print("📝 Génération des légendes en arrière-plan...")
+            get_caption_stage(output_metadata, captioner, caption_batch_size).start()
+        else:
+            fill_pending_captions(output_metadata, captioner, caption_batch_size,
+                                  use_feature_cache=use_feature_cache)
 
 
 def save_index_backup(index_path: str = "index.faiss",
@@ -783,7 +1258,12 @@ def extract_and_index_multiple_dirs(data_dirs: List[str],
                                      batch_size: int = 32,
                                      model_name: str = "openai/clip-vit-large-patch14",
                                      embedder: CLIPEmbedder = None,
-                                     captioner: BLIPCaptioner = None):
+                                     captioner: BLIPCaptioner = None,
+                                     generate_thumbnails: bool = True,
+                                     thumbnail_workers: int = 4,
+                                     caption_batch_size: int = 8,
+                                     async_captions: bool = False,
+                                     use_feature_cache: bool = True):
     """
     Extrait les embeddings de plusieurs dossiers et crée l'index FAISS.
     
@@ -800,6 +1280,13 @@ def extract_and_index_multiple_dirs(data_dirs: List[str],
         model_name: Nom du modèle CLIP à utiliser
         embedder: Instance de CLIPEmbedder (optionnel, sera créé si None)
         captioner: Instance de BLIPCaptioner (optionnel, sera créé si None et generate_captions=True)
+        generate_thumbnails: Si True, pré-génère les vignettes pendant l'indexation
+        thumbnail_workers: Nombre de threads pour la génération des vignettes
+        caption_batch_size: Nombre d'images légendées par passe BLIP
+        async_captions: Si True, les légendes sont générées dans un thread en arrière-plan
+            (get_caption_stage) ; sinon après la sauvegarde de l'index, avant de rendre la main
+        use_feature_cache: Si True, réutilise les embeddings et légendes des fichiers au contenu
+            identique déjà calculés (cache de features, .cache/features.db)
     """
     print("🚀 Démarrage de l'extraction des embeddings depuis plusieurs dossiers...")
     
@@ -848,6 +1335,8 @@ def extract_and_index_multiple_dirs(data_dirs: List[str],
     
     all_embeddings = []
     metadata = []
+    thumbnail_pipeline = ThumbnailPipeline(max_workers=thumbnail_workers) if generate_thumbnails else None
+    feature_cache = _open_feature_cache() if use_feature_cache else None
     
     # Traiter les images par batch
     if all_images:
@@ -861,51 +1350,29 @@ def extract_and_index_multiple_dirs(data_dirs: List[str],
             for idx, image_path in enumerate(batch_images, batch_start + 1):
                 print(f"  [{idx}/{len(all_images)}] {os.path.basename(image_path)}")
                 try:
-                    embedding = process_image(image_path, embedder, use_multi_scale=use_multi_scale)
+                    embedding = process_image(image_path, embedder, use_multi_scale=use_multi_scale,
+                                              thumbnail_pipeline=thumbnail_pipeline, feature_cache=feature_cache)
                     if embedding is not None and embedding.size > 0:
                         batch_embeddings.append(embedding)
                         
-                        # Générer la légende si demandé
-                        caption = ""
-                        if generate_captions:
-                            try:
-                                image = Image.open(image_path)
-                                if image.mode != 'RGB':
-                                    image = image.convert('RGB')
-                                # Redimensionner pour accélérer BLIP et stabiliser sur CPU
-                                max_side = 768
-                                if max(image.size) > max_side:
-                                    ratio = max_side / float(max(image.size))
-                                    new_size = (int(image.size[0]*ratio), int(image.size[1]*ratio))
-                                    image = image.resize(new_size)
-                                # Timeout plus long (30 secondes) pour éviter les "unknown"
-                                caption = captioner.generate_caption(image, timeout=30.0)
-                                image.close()
-                                
-                                # Si BLIP retourne "unknown" ou vide, utiliser le nom de fichier
-                                if not caption or caption.strip().lower() == "unknown":
-                                    cleaned_name = os.path.splitext(os.path.basename(image_path))[0].replace('_',' ').replace('-',' ')
-                                    caption = cleaned_name
-                                    print(f"      📝 Caption (fallback): {caption}")
-                                else:
-                                    print(f"      📝 Caption: {caption}")
-                            except Exception as e:
-                                print(f"      ⚠️  Erreur lors de la génération de la légende: {e}")
-                                # Fallback: nom de fichier nettoyé
-                                cleaned_name = os.path.splitext(os.path.basename(image_path))[0].replace('_',' ').replace('-',' ')
-                                caption = cleaned_name
-                                print(f"      📝 Caption (fallback après erreur): {caption}")
-                        else:
-                            # Même sans generate_captions, utiliser le nom de fichier
-                            cleaned_name = os.path.splitext(os.path.basename(image_path))[0].replace('_',' ').replace('-',' ')
-                            caption = cleaned_name
-                        
-                        batch_metadata.append({
+                        # Légende de repli (nom de fichier) : l'image est cherchable tout de suite,
+                        # la légende BLIP est écrite plus tard par l'étape de légendage
+                        meta = {
                             "file_path": os.path.abspath(image_path),
                             "media_type": "image",
                             "frame_index": None,
-                            "caption": caption
-                        })
+                            "caption": filename_caption(image_path),
+                            "phash": cached_image_phash(image_path, feature_cache)
+                        }
+                        if generate_captions:
+                            # Légende déjà calculée pour un fichier au contenu identique : pas d'attente
+                            cached_caption = feature_cache.get_caption(image_path, caption_feature_model(captioner)) \
+                                if feature_cache is not None else None
+                            if cached_caption:
+                                meta["caption"] = cached_caption
+                            else:
+                                meta["caption_pending"] = True
+                        batch_metadata.append(meta)
                     else:
                         print(f"⚠️  Embedding vide pour {image_path}, ignoré")
                 except Exception as e:
@@ -922,41 +1389,60 @@ def extract_and_index_multiple_dirs(data_dirs: List[str],
         for idx, video_path in enumerate(all_videos, 1):
             print(f"  [{idx}/{len(all_videos)}] {os.path.basename(video_path)}")
             try:
+                # Frames déjà encodées pour un fichier au contenu identique : pas de décodage
+                video_model = video_feature_model(embedder, frame_interval, use_quality_selection, max_frames_per_video)
+                cached = feature_cache.get_embeddings(video_path, video_model) if feature_cache is not None else []
+                if cached:
+                    fps = get_video_fps(video_path)
+                    for frame_idx, (frame_number, embedding) in enumerate(cached):
+                        all_embeddings.append(embedding)
+                        metadata.append(video_frame_metadata(video_path, frame_idx, frame_number, fps))
+                    continue
+                
                 # Extraire les frames
                 if use_quality_selection:
                     # Utiliser la sélection intelligente avec max_frames_per_video
-                    frames = select_quality_frames(video_path, n_frames=max_frames_per_video)
+                    positioned_frames = select_quality_frames(video_path, n_frames=max_frames_per_video,
+                                                              with_positions=True)
                 else:
                     # Méthode classique : échantillonnage régulier
-                    frames = extract_frames_from_video(video_path, frame_interval, use_quality_selection=False)
+                    positioned_frames = extract_frames_from_video(video_path, frame_interval,
+                                                                  use_quality_selection=False,
+                                                                  with_positions=True)
                     # Limiter à max_frames_per_video
-                    if len(frames) > max_frames_per_video:
-                        frames = frames[:max_frames_per_video]
+                    if len(positioned_frames) > max_frames_per_video:
+                        positioned_frames = positioned_frames[:max_frames_per_video]
+                
+                # Preview (affiche + planche) à partir des frames déjà décodées
+                if thumbnail_pipeline is not None and positioned_frames:
+                    thumbnail_pipeline.submit_video(positioned_frames, os.path.abspath(video_path))
+                fps = get_video_fps(video_path)
                 
                 # Encoder les frames
-                for frame_idx, frame in enumerate(frames):
+                encoded_frames = []
+                for frame_idx, (frame_number, frame) in enumerate(positioned_frames):
                     try:
                         embedding = embedder.encode_image(frame)
                         if embedding is not None:
                             embedding = embedding.astype('float32')
                             if np.all(np.isfinite(embedding)):
                                 all_embeddings.append(embedding)
-                                # Caption par défaut pour les vidéos: nom de fichier nettoyé
-                                video_name = os.path.splitext(os.path.basename(video_path))[0].replace('_',' ').replace('-',' ')
-                                default_video_caption = f"video: {video_name}"
-                                metadata.append({
-                                    "file_path": os.path.abspath(video_path),
-                                    "media_type": "video",
-                                    "frame_index": frame_idx,
-                                    "caption": default_video_caption
-                                })
+                                encoded_frames.append((frame_number, embedding))
+                                # Numéro de frame source et timestamp : lien direct vers le moment trouvé
+                                metadata.append(video_frame_metadata(video_path, frame_idx, frame_number, fps))
                     except Exception as e:
                         print(f"      ⚠️  Erreur lors de l'encodage d'une frame: {e}")
                         continue
+                if feature_cache is not None:
+                    feature_cache.put_embeddings(video_path, video_model, encoded_frames)
             except Exception as e:
                 print(f"⚠️  Exception lors du traitement de {video_path}: {e}")
                 continue
     
+    # Attendre la fin de la génération des vignettes
+    if thumbnail_pipeline is not None:
+        thumbnail_pipeline.close()
+    
     # Vérifier qu'on a des embeddings
     if not all_embeddings:
         print("❌ Aucun embedding extrait. Arrêt.")
@@ -976,12 +1462,14 @@ def extract_and_index_multiple_dirs(data_dirs: List[str],
         index = faiss.IndexFlatIP(embedding_dim)
         index.add(embeddings_array)
         
-        print(f"💾 Sauvegarde de l'index dans {output_index}...")
-        faiss.write_index(index, output_index)
-        
-        print(f"💾 Sauvegarde des métadonnées dans {output_metadata}...")
-        with open(output_metadata, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        # Index et métadonnées écrits ensemble, sous le verrou partagé avec les autres workers
+        with index_write_lock(output_metadata):
+            print(f"💾 Sauvegarde de l'index dans {output_index}...")
+            write_faiss_index(index, output_index)
+            
+            # Métadonnées + index inversé (légendes + noms de fichiers) pour la recherche hybride
+            print(f"💾 Sauvegarde des métadonnées dans {output_metadata}...")
+            save_metadata(metadata, output_metadata)
         
         print(f"\n✅ Indexation terminée!")
         print(f"   - {len(all_embeddings)} embedding(s) indexé(s)")
@@ -993,4 +1481,14 @@ def extract_and_index_multiple_dirs(data_dirs: List[str],
         print(f"❌ Erreur lors de la création de l'index: {e}")
         import traceback
         traceback.print_exc()
+        return
+    
+    # Légendes BLIP après coup : l'index est déjà interrogeable (légende = nom de fichier)
+    if generate_captions:
+        if async_captions:
+            print("📝 Génération des légendes en arrière-plan...")
+            get_caption_stage(output_metadata, captioner, caption_batch_size).start()
+        else:
+            fill_pending_captions(output_metadata, captioner, caption_batch_size,
+                                  use_feature_cache=use_feature_cache)
 
@@ -0,0 +1,212 @@
+"""
+Module de recherche lexicale (index inversé BM25 sur les légendes et noms de fichiers)
+et de fusion avec la recherche vectorielle.
+"""
+
+import os
+import re
+import json
+import math
+import unicodedata
+from typing import List, Dict, Tuple, Optional, Iterable
+
+# Mots vides FR/EN ignorés (trop fréquents pour être discriminants)
+STOPWORDS = {
+    'le', 'la', 'les', 'un', 'une', 'des', 'de', 'du', 'et', 'ou', 'en', 'au', 'aux',
+    'sur', 'sous', 'dans', 'avec', 'pour', 'par', 'photo', 'image', 'video',
+    'the', 'an', 'of', 'on', 'in', 'at', 'with', 'and', 'or', 'to', 'is', 'are',
+    'img', 'jpg', 'jpeg', 'png', 'mp4', 'mov'
+}
+
+LEXICAL_INDEX_VERSION = 1
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Découpe un texte en termes normalisés (minuscules, sans accents, sans mots vides).
+
+    Args:
+        text: Texte à découper
+
+    Returns:
+        Liste de termes
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    # Les noms de fichiers utilisent _ et - comme séparateurs
+    terms = re.findall(r"[a-z0-9]+", text)
+    return [t for t in terms if len(t) >= 2 and t not in STOPWORDS]
+
+
+def document_text(meta: Dict) -> str:
+    """
+    Construit le texte indexé pour une entrée de métadonnées (légende + nom de fichier).
+
+    Args:
+        meta: Dictionnaire de métadonnées
+
+    Returns:
+        Texte à indexer
+    """
+    caption = meta.get("caption", "") or ""
+    if caption.strip().lower() == "unknown":
+        caption = ""
+    filename = os.path.splitext(os.path.basename(meta.get("file_path", "")))[0]
+    return f"{caption} {filename}"
+
+
+def query_coverage(query_terms: Iterable[str], meta: Dict) -> float:
+    """
+    Part des termes de la requête présents dans la légende ou le nom de fichier d'un média.
+
+    Args:
+        query_terms: Termes de la requête (tokenize)
+        meta: Dictionnaire de métadonnées
+
+    Returns:
+        Fraction entre 0 et 1 (0 pour une requête sans terme)
+    """
+    terms = set(query_terms)
+    if not terms:
+        return 0.0
+    return len(terms & set(tokenize(document_text(meta)))) / len(terms)
+
+
+def build_lexical_index(metadata: List[Dict]) -> Dict:
+    """
+    Construit l'index inversé BM25 à partir des métadonnées (une entrée par ligne FAISS).
+
+    Args:
+        metadata: Liste des métadonnées (même ordre que l'index FAISS)
+
+    Returns:
+        Dictionnaire sérialisable en JSON (postings, longueurs de documents)
+    """
+    postings: Dict[str, List[List[int]]] = {}
+    doc_lengths = []
+
+    for idx, meta in enumerate(metadata):
+        terms = tokenize(document_text(meta))
+        doc_lengths.append(len(terms))
+
+        term_freqs: Dict[str, int] = {}
+        for term in terms:
+            term_freqs[term] = term_freqs.get(term, 0) + 1
+        for term, tf in term_freqs.items():
+            postings.setdefault(term, []).append([idx, tf])
+
+    n_docs = len(doc_lengths)
+    return {
+        "version": LEXICAL_INDEX_VERSION,
+        "n_docs": n_docs,
+        "avgdl": (sum(doc_lengths) / n_docs) if n_docs else 0.0,
+        "doc_lengths": doc_lengths,
+        "postings": postings
+    }
+
+
+def get_lexical_index_path(metadata_path: str) -> str:
+    """Chemin de l'index lexical associé à un fichier de métadonnées."""
+    return os.path.splitext(metadata_path)[0] + "_lexical.json"
+
+
+def save_lexical_index(lexical_index: Dict, output_path: str):
+    """
+    Sauvegarde l'index lexical en JSON.
+
+    Args:
+        lexical_index: Index construit par build_lexical_index
+        output_path: Chemin du fichier de sortie
+    """
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(lexical_index, f, ensure_ascii=False)
+
+
+def load_lexical_index(index_path: str) -> Optional[Dict]:
+    """
+    Charge l'index lexical s'il existe.
+
+    Args:
+        index_path: Chemin du fichier JSON
+
+    Returns:
+        Index lexical, ou None si absent/invalide
+    """
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            lexical_index = json.load(f)
+        if lexical_index.get("version") != LEXICAL_INDEX_VERSION:
+            print(f"⚠️  Index lexical obsolète ({index_path}), réindexez pour le régénérer")
+            return None
+        return lexical_index
+    except Exception as e:
+        print(f"⚠️  Erreur lors du chargement de l'index lexical: {e}")
+        return None
+
+
+def lexical_search(query_text: str,
+                   lexical_index: Dict,
+                   top_k: int = 50,
+                   filtered_indices: Optional[Iterable[int]] = None,
+                   k1: float = 1.2,
+                   b: float = 0.75) -> List[Tuple[int, float]]:
+    """
+    Recherche BM25 dans l'index inversé.
+
+    Args:
+        query_text: Requête texte
+        lexical_index: Index construit par build_lexical_index
+        top_k: Nombre de résultats à retourner
+        filtered_indices: Indices admissibles (None pour tous)
+        k1: Paramètre de saturation de la fréquence des termes
+        b: Paramètre de normalisation par la longueur du document
+
+    Returns:
+        Liste de tuples (indice métadonnées, score BM25) triée par score décroissant
+    """
+    terms = set(tokenize(query_text))
+    if not terms or not lexical_index or lexical_index.get("n_docs", 0) == 0:
+        return []
+
+    postings = lexical_index["postings"]
+    doc_lengths = lexical_index["doc_lengths"]
+    n_docs = lexical_index["n_docs"]
+    avgdl = lexical_index["avgdl"] or 1.0
+    allowed = set(filtered_indices) if filtered_indices is not None else None
+
+    scores: Dict[int, float] = {}
+    for term in terms:
+        term_postings = postings.get(term)
+        if not term_postings:
+            continue
+        df = len(term_postings)
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        for idx, tf in term_postings:
+            if allowed is not None and idx not in allowed:
+                continue
+            norm = k1 * (1 - b + b * doc_lengths[idx] / avgdl)
+            scores[idx] = scores.get(idx, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Fusionne plusieurs classements par Reciprocal Rank Fusion (RRF).
+
+    Args:
+        rankings: Liste de classements (listes d'indices, du meilleur au moins bon)
+        k: Constante de lissage RRF (défaut: 60)
+
+    Returns:
+        Liste de tuples (indice, score RRF) triée par score décroissant
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, idx in enumerate(ranking, 1):
+            fused[idx] = fused.get(idx, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)
@@ -10,6 +10,9 @@ import torch
 # Fix pour éviter les problèmes de threading avec FAISS/OpenMP
 torch.set_num_threads(1)
 
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 from typing import List, Tuple, Dict, Optional
 import warnings
 
@@ -19,10 +22,172 @@ warnings.filterwarnings("ignore", category=UserWarning)
 # Import sentence_transformers APRÈS torch
 from sentence_transformers import CrossEncoder
 
+# Backend ONNX Runtime (optionnel) : modèle quantifié en int8 pour le CPU
+try:
+    import onnxruntime
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
 
 # Singleton global pour le reranker
 _reranker_instance = None
 
+# Nombre de paires (requête, contexte) dont le score est gardé en mémoire
+DEFAULT_PAIR_CACHE_SIZE = int(os.environ.get('RERANK_CACHE_SIZE', 20000))
+# Nombre maximum de paires par appel à predict() (toutes requêtes confondues)
+MAX_PREDICT_BATCH = 128
+
+_FILENAME_EXTENSIONS = (".jpg", ".png", ".jpeg", ".mp4", ".mov")
+
+# Backend du Cross-Encoder : "torch" (sentence-transformers, float32) ou "onnx" (ONNX Runtime, int8)
+RERANKER_BACKENDS = ("torch", "onnx")
+DEFAULT_RERANKER_BACKEND = os.environ.get('RERANKER_BACKEND', 'torch')
+# Modèles ONNX exportés et quantifiés (une fois par modèle)
+DEFAULT_ONNX_CACHE_DIR = os.environ.get('RERANKER_ONNX_DIR', '.cache/onnx')
+
+
+def filename_context(file_path: str) -> str:
+    """Contexte de re-ranking tiré du nom de fichier (séparateurs et extension retirés)."""
+    context = os.path.basename(file_path or "").replace("_", " ").replace("-", " ")
+    for extension in _FILENAME_EXTENSIONS:
+        context = context.replace(extension, "")
+    return context
+
+
+def caption_context(meta: Dict, file_path: str = "") -> str:
+    """
+    Contexte de re-ranking d'un média : légende BLIP si elle est exploitable,
+    sinon nom de fichier nettoyé (légende absente, "unknown" ou encore en attente).
+    Précalculé à l'indexation dans meta["rerank_context"].
+    
+    Args:
+        meta: Métadonnées du média
+        file_path: Chemin du média (défaut: meta["file_path"])
+        
+    Returns:
+        Texte comparé à la requête par le Cross-Encoder
+    """
+    caption = meta.get("caption", "")
+    if caption and caption.strip() and caption.strip().lower() != "unknown" and not meta.get("caption_pending"):
+        return caption.strip()
+    return filename_context(file_path or meta.get("file_path", ""))
+
+
+class PairScoreCache:
+    """Cache LRU des scores Cross-Encoder par paire (requête, contexte)."""
+    
+    def __init__(self, max_entries: int = DEFAULT_PAIR_CACHE_SIZE):
+        """
+        Args:
+            max_entries: Nombre maximum de paires gardées
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, pair: Tuple[str, str]) -> Optional[float]:
+        with self._lock:
+            score = self._entries.get(pair)
+            if score is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(pair)
+            self.hits += 1
+            return score
+    
+    def put(self, pair: Tuple[str, str], score: float):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[pair] = score
+            self._entries.move_to_end(pair)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class PredictBatcher:
+    """
+    Regroupe les paires de plusieurs requêtes concurrentes dans un même appel à predict().
+    Un seul thread appelle le modèle : pendant qu'un lot est calculé, les paires des
+    requêtes suivantes s'accumulent et partent ensemble au lot suivant (aucune attente
+    ajoutée quand le serveur est peu chargé).
+    """
+    
+    def __init__(self, predict_fn, max_batch: int = MAX_PREDICT_BATCH):
+        """
+        Args:
+            predict_fn: Fonction liste de paires -> liste de scores
+            max_batch: Nombre maximum de paires par appel
+        """
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self._pending: List[Tuple[List[List[str]], Future]] = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self.batches = 0
+        self.requests = 0
+    
+    def predict(self, pairs: List[List[str]]) -> List[float]:
+        """
+        Calcule les scores d'une liste de paires (bloquant).
+        
+        Args:
+            pairs: Liste de paires [requête, contexte]
+            
+        Returns:
+            Scores dans le même ordre
+        """
+        if not pairs:
+            return []
+        future = Future()
+        with self._condition:
+            self._pending.append((pairs, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rerank-batcher", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return future.result()
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                # Prendre les requêtes en attente jusqu'à max_batch paires (au moins une requête)
+                batch = [self._pending.pop(0)]
+                size = len(batch[0][0])
+                while self._pending and size + len(self._pending[0][0]) <= self.max_batch:
+                    pairs, future = self._pending.pop(0)
+                    batch.append((pairs, future))
+                    size += len(pairs)
+            
+            # Paires identiques entre requêtes : calculées une fois
+            unique_pairs = list(dict.fromkeys(tuple(pair) for pairs, _ in batch for pair in pairs))
+            try:
+                scores = dict(zip(unique_pairs, self.predict_fn([list(pair) for pair in unique_pairs])))
+                with self._condition:
+                    self.batches += 1
+                    self.requests += len(batch)
+                for pairs, future in batch:
+                    future.set_result([scores[tuple(pair)] for pair in pairs])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+    
+    def stats(self) -> Dict:
+        """Nombre d'appels à predict() et de requêtes regroupées."""
+        with self._condition:
+            return {"batches": self.batches, "batched_requests": self.requests}
+
+
 class CrossEncoderReranker:
     """Classe pour re-scorer les résultats avec un Cross-Encoder."""
     
@@ -40,6 +205,9 @@ class CrossEncoderReranker:
         self.device = device
         self.model_name = model_name
         self._model = None
+        # Scores déjà calculés et regroupement des appels au modèle entre requêtes
+        self.pair_cache = PairScoreCache()
+        self._batcher = PredictBatcher(self._predict)
         
     def _load_model(self):
         """Charge le modèle Cross-Encoder de manière lazy (seulement quand nécessaire)."""
@@ -54,6 +222,52 @@ class CrossEncoderReranker:
             except Exception as e:
                 raise RuntimeError(f"❌ Erreur lors du chargement du modèle Cross-Encoder: {e}")
     
+    def load(self):
+        """Charge les poids du modèle sans attendre le premier re-ranking (préchargement)."""
+        self._load_model()
+    
+    def _predict(self, pairs: List[List[str]]) -> List[float]:
+        """Scores bruts du Cross-Encoder (NaN/Inf remplacés par 0.0)."""
+        import numpy as np
+        with torch.inference_mode():
+            scores = self._model.predict(pairs)
+        scores = np.nan_to_num(np.asarray(scores, dtype=np.float64).reshape(-1), nan=0.0, posinf=0.0, neginf=0.0)
+        return [float(score) for score in scores]
+    
+    def score_pairs(self, pairs: List[List[str]]) -> List[float]:
+        """
+        Scores d'une liste de paires [requête, contexte] : cache LRU d'abord,
+        puis un appel groupé au modèle pour les paires manquantes.
+        
+        Args:
+            pairs: Liste de paires [requête, contexte]
+            
+        Returns:
+            Scores dans le même ordre
+        """
+        self._load_model()
+        scores = [self.pair_cache.get((query, context)) for query, context in pairs]
+        missing = [pair for pair, score in zip(pairs, scores) if score is None]
+        if missing:
+            computed = iter(self._batcher.predict(missing))
+            for i, score in enumerate(scores):
+                if score is None:
+                    score = next(computed)
+                    scores[i] = score
+                    self.pair_cache.put((pairs[i][0], pairs[i][1]), score)
+        return scores
+    
+    def cache_stats(self) -> Dict:
+        """Compteurs du cache de scores et du regroupement (pour /api/health)."""
+        stats = self.pair_cache.stats()
+        stats.update(self._batcher.stats())
+        return stats
+    
+    def warm_up(self):
+        """Charge le modèle et exécute une prédiction à vide (allocation des buffers)."""
+        self._load_model()
+        self._predict([["warm up", "a photo"]])
+    
     def rerank_results(self, 
                        query_text: str, 
                        candidates: List[Dict], 
@@ -87,23 +301,13 @@ class CrossEncoderReranker:
             
             for candidate in candidates_to_rerank:
                 # Extraire le contexte (caption ou nom de fichier)
-                context = ""
-                
                 if use_captions:
-                    # Priorité: caption généré > nom de fichier propre
-                    caption = candidate.get("meta", {}).get("caption", "")
-                    if caption and caption.strip() and caption.strip().lower() != "unknown":
-                        context = caption.strip()
-                    else:
-                        # Fallback: nom de fichier nettoyé
-                        import os
-                        filename = os.path.basename(candidate.get("path", ""))
-                        context = filename.replace("_", " ").replace("-", " ").replace(".jpg", "").replace(".png", "").replace(".jpeg", "").replace(".mp4", "").replace(".mov", "")
+                    # Priorité: caption généré > nom de fichier propre (précalculé à l'indexation)
+                    meta = candidate.get("meta", {})
+                    context = meta.get("rerank_context") or caption_context(meta, candidate.get("path", ""))
                 else:
                     # Utiliser uniquement le nom de fichier
-                    import os
-                    filename = os.path.basename(candidate.get("path", ""))
-                    context = filename.replace("_", " ").replace("-", " ").replace(".jpg", "").replace(".png", "").replace(".jpeg", "").replace(".mp4", "").replace(".mov", "")
+                    context = filename_context(candidate.get("path", ""))
                 
                 if not context:
                     context = "image"
@@ -115,16 +319,8 @@ class CrossEncoderReranker:
             if not pairs:
                 return []
             
-            # Calculer les scores avec le Cross-Encoder
-            with torch.inference_mode():
-                scores = self._model.predict(pairs)
-            
-            # Convertir en liste de scores et gérer les NaN/Inf
-            import numpy as np
-            if isinstance(scores, np.ndarray):
-                # Remplacer NaN/Inf par 0.0
-                scores = np.nan_to_num(scores, nan=0.0, posinf=0.0, neginf=0.0)
-            cross_scores = [float(s) if np.isfinite(s) else 0.0 for s in scores]
+            # Calculer les scores avec le Cross-Encoder (cache + appels groupés, NaN/Inf remplacés par 0.0)
+            cross_scores = self.score_pairs(pairs)
             
             # Construire les résultats re-scorés
             # On conserve le score cosinus original pour affichage
@@ -135,7 +331,7 @@ class CrossEncoderReranker:
                 reranked_results.append({
                     "path": candidate.get("path"),
                     "score": cross_score,  # Score cross-encoder (pour tri)
-                    "cosine_score": candidate.get("score", 0.0),  # Score FAISS original (pour affichage)
+                    "cosine_score": candidate.get("cosine_score", candidate.get("score", 0.0)),  # Score FAISS original (pour affichage)
                     "meta": candidate.get("meta", {})
                 })
             
@@ -154,26 +350,164 @@ class CrossEncoderReranker:
                 fallback_results.append({
                     "path": candidate.get("path"),
                     "score": candidate.get("score", 0.0),
-                    "cosine_score": candidate.get("score", 0.0),
+                    "cosine_score": candidate.get("cosine_score", candidate.get("score", 0.0)),
                     "meta": candidate.get("meta", {})
                 })
             return sorted(fallback_results, key=lambda x: x["score"], reverse=True)
 
 
-def get_reranker(model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", device: str = None) -> CrossEncoderReranker:
+class _ScoringHead(torch.nn.Module):
+    """Modèle + activation de sentence-transformers, exportés ensemble (mêmes scores que predict())."""
+    
+    def __init__(self, model, activation):
+        super().__init__()
+        self.model = model
+        self.activation = activation
+    
+    def forward(self, input_ids, attention_mask, token_type_ids=None):
+        if token_type_ids is None:
+            logits = self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+        else:
+            logits = self.model(input_ids=input_ids, attention_mask=attention_mask,
+                                token_type_ids=token_type_ids).logits
+        return self.activation(logits)
+
+
+class ONNXCrossEncoderReranker(CrossEncoderReranker):
+    """
+    Cross-Encoder exécuté par ONNX Runtime, quantifié en int8 (quantification dynamique).
+    Le modèle est exporté depuis sentence-transformers au premier chargement puis gardé
+    sur disque ; les scores restent comparables à ceux du backend torch
+    (voir check_reranker_parity.py).
+    """
+    
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", device: str = None,
+                 cache_dir: str = DEFAULT_ONNX_CACHE_DIR, num_threads: int = None):
+        """
+        Initialise le reranker ONNX.
+        
+        Args:
+            model_name: Nom du modèle Cross-Encoder à utiliser
+            device: Ignoré (ONNX Runtime sur CPU)
+            cache_dir: Dossier des modèles exportés
+            num_threads: Threads ONNX Runtime par prédiction (défaut: RERANKER_ONNX_THREADS ou 1)
+        """
+        if not ONNX_AVAILABLE:
+            raise RuntimeError("onnxruntime n'est pas installé (pip install onnxruntime onnx)")
+        super().__init__(model_name=model_name, device="cpu")
+        self.model_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        self.num_threads = num_threads or int(os.environ.get('RERANKER_ONNX_THREADS', 1))
+        self._tokenizer = None
+        self._max_length = 512
+        self._input_names = []
+    
+    def _export_model(self):
+        """Exporte le modèle sentence-transformers en ONNX puis le quantifie en int8."""
+        import json
+        print(f"📦 Export ONNX du Cross-Encoder: {self.model_name}")
+        os.makedirs(self.model_dir, exist_ok=True)
+        cross_encoder = CrossEncoder(self.model_name, device="cpu")
+        # Activation appliquée par predict() (Sigmoid ou Identity selon le modèle et la version)
+        activation = getattr(cross_encoder, "activation_fn", None) or \
+            getattr(cross_encoder, "default_activation_function", None) or torch.nn.Identity()
+        head = _ScoringHead(cross_encoder.model, activation).eval()
+        tokenizer = cross_encoder.tokenizer
+        max_length = getattr(cross_encoder, "max_length", None) or tokenizer.model_max_length or 512
+        
+        sample = tokenizer(["warm up"], ["a photo"], padding=True, truncation=True, return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["scores"] = {0: "batch"}
+        float_path = os.path.join(self.model_dir, "model.onnx")
+        with torch.no_grad():
+            torch.onnx.export(head, tuple(sample[name] for name in input_names), float_path,
+                              input_names=input_names, output_names=["scores"],
+                              dynamic_axes=dynamic_axes, opset_version=14)
+        
+        quantize_dynamic(float_path, os.path.join(self.model_dir, "model-int8.onnx"), weight_type=QuantType.QInt8)
+        os.remove(float_path)
+        tokenizer.save_pretrained(self.model_dir)
+        with open(os.path.join(self.model_dir, "config.json"), 'w', encoding='utf-8') as f:
+            json.dump({"model_name": self.model_name, "max_length": int(min(max_length, 512)),
+                       "input_names": input_names}, f)
+        print(f"✅ Modèle ONNX int8 enregistré dans {self.model_dir}")
+    
+    def _load_model(self):
+        """Charge (et exporte si nécessaire) le modèle ONNX int8."""
+        if self._model is None:
+            import json
+            from transformers import AutoTokenizer
+            
+            try:
+                model_path = os.path.join(self.model_dir, "model-int8.onnx")
+                if not os.path.exists(model_path):
+                    self._export_model()
+                with open(os.path.join(self.model_dir, "config.json"), 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+                
+                options = onnxruntime.SessionOptions()
+                options.intra_op_num_threads = self.num_threads
+                options.inter_op_num_threads = 1
+                self._tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+                self._max_length = config.get("max_length", 512)
+                self._input_names = config.get("input_names", ["input_ids", "attention_mask"])
+                self._model = onnxruntime.InferenceSession(model_path, sess_options=options,
+                                                           providers=["CPUExecutionProvider"])
+                print(f"✅ Cross-Encoder ONNX int8 chargé ({self.num_threads} thread(s))")
+            except Exception as e:
+                raise RuntimeError(f"❌ Erreur lors du chargement du Cross-Encoder ONNX: {e}")
+    
+    def _predict(self, pairs: List[List[str]]) -> List[float]:
+        """Scores du modèle ONNX (NaN/Inf remplacés par 0.0)."""
+        import numpy as np
+        encoded = self._tokenizer([query for query, _ in pairs], [context for _, context in pairs],
+                                  padding=True, truncation=True, max_length=self._max_length, return_tensors="np")
+        inputs = {name: encoded[name].astype(np.int64) for name in self._input_names}
+        scores = self._model.run(["scores"], inputs)[0]
+        scores = np.nan_to_num(np.asarray(scores, dtype=np.float64).reshape(-1), nan=0.0, posinf=0.0, neginf=0.0)
+        return [float(score) for score in scores]
+
+
+def create_reranker(model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", device: str = None,
+                    backend: str = None) -> CrossEncoderReranker:
+    """
+    Crée un reranker pour un backend donné (sans singleton).
+    Sans onnxruntime, le backend "onnx" retombe sur "torch".
+    
+    Args:
+        model_name: Nom du modèle Cross-Encoder
+        device: Device à utiliser (backend torch)
+        backend: "torch" ou "onnx" (défaut: RERANKER_BACKEND ou "torch")
+    
+    Returns:
+        Instance de CrossEncoderReranker
+    """
+    backend = backend or DEFAULT_RERANKER_BACKEND
+    if backend not in RERANKER_BACKENDS:
+        raise ValueError(f"Backend de reranker inconnu: {backend} (choix: {', '.join(RERANKER_BACKENDS)})")
+    if backend == "onnx":
+        if ONNX_AVAILABLE:
+            return ONNXCrossEncoderReranker(model_name=model_name)
+        print("⚠️  onnxruntime non installé, utilisation du backend torch")
+    return CrossEncoderReranker(model_name=model_name, device=device)
+
+
+def get_reranker(model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", device: str = None,
+                 backend: str = None) -> CrossEncoderReranker:
     """
     Factory function pour obtenir un CrossEncoderReranker (singleton).
     
     Args:
         model_name: Nom du modèle Cross-Encoder
         device: Device à utiliser
+        backend: "torch" ou "onnx" (défaut: RERANKER_BACKEND ou "torch")
     
     Returns:
         Instance de CrossEncoderReranker (singleton)
     """
     global _reranker_instance
     if _reranker_instance is None:
-        _reranker_instance = CrossEncoderReranker(model_name=model_name, device=device)
+        _reranker_instance = create_reranker(model_name=model_name, device=device, backend=backend)
     return _reranker_instance
 
 
@@ -11,13 +11,146 @@ import torch
 torch.set_num_threads(1)
 
 import json
+import threading
 import faiss
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple, Optional
 
 from .clip_utils import CLIPEmbedder
 from .reranker import CrossEncoderReranker, get_reranker, rerank_results
 from .filters import filter_metadata
+from .lexical import (
+    build_lexical_index, load_lexical_index, get_lexical_index_path,
+    lexical_search, reciprocal_rank_fusion, tokenize, query_coverage
+)
+
+# Exécuteur pour la recherche lexicale, lancée pendant l'encodage CLIP de la requête
+_lexical_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="lexical")
+
+# Part minimale des termes de la requête retrouvés dans la légende / le nom de fichier
+# pour qu'un résultat lexical échappe au seuil cosinus (un seul terme commun, ex: "2023", ne suffit pas)
+LEXICAL_MIN_COVERAGE = float(os.environ.get('LEXICAL_MIN_COVERAGE', 0.75))
+
+# Profondeur du rerank : "fixed" (10 premiers candidats) ou "adaptive" (selon les écarts cosinus)
+RERANK_POLICIES = ("fixed", "adaptive")
+DEFAULT_RERANK_POLICY = os.environ.get('RERANK_POLICY', 'adaptive')
+if DEFAULT_RERANK_POLICY not in RERANK_POLICIES:
+    print(f"⚠️  RERANK_POLICY inconnue: {DEFAULT_RERANK_POLICY!r} (attendu: {', '.join(RERANK_POLICIES)}), "
+          f"utilisation de 'adaptive'")
+    DEFAULT_RERANK_POLICY = 'adaptive'
+RERANK_MAX_DEPTH = 10
+RERANK_MIN_DEPTH = 3
+# Écart cosinus entre les deux premiers candidats au-delà duquel CLIP est jugé sûr (rerank ignoré)
+RERANK_CONFIDENT_MARGIN = float(os.environ.get('RERANK_CONFIDENT_MARGIN', 0.03))
+# Candidats à moins de cet écart du meilleur cosinus : zone ambiguë, re-scorée par le Cross-Encoder
+RERANK_AMBIGUITY_BAND = float(os.environ.get('RERANK_AMBIGUITY_BAND', 0.03))
+
+
+class RerankTelemetry:
+    """
+    Compteurs du rerank : recherches re-scorées ou ignorées, profondeur, et effet sur le
+    classement (premier résultat changé, recouvrement des top_k). Sert à régler
+    RERANK_CONFIDENT_MARGIN / RERANK_AMBIGUITY_BAND (voir /api/health).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requested = 0
+        self.skipped = 0
+        self.reranked = 0
+        self.depth_total = 0
+        self.top1_changed = 0
+        self.overlap_total = 0.0
+        self.margin_changed_total = 0.0
+        self.margin_unchanged_total = 0.0
+
+    def record_skip(self):
+        """Rerank demandé mais ignoré (classement CLIP jugé sûr)."""
+        with self._lock:
+            self.requested += 1
+            self.skipped += 1
+
+    def record_rerank(self, depth: int, margin: float, before: List[str], after: List[str]):
+        """
+        Rerank effectué.
+
+        Args:
+            depth: Nombre de candidats re-scorés
+            margin: Écart cosinus entre les deux premiers candidats
+            before: Chemins des top_k avant rerank
+            after: Chemins des top_k après rerank
+        """
+        changed = bool(before and after and before[0] != after[0])
+        overlap = len(set(before) & set(after)) / len(before) if before else 1.0
+        with self._lock:
+            self.requested += 1
+            self.reranked += 1
+            self.depth_total += depth
+            self.overlap_total += overlap
+            if changed:
+                self.top1_changed += 1
+                self.margin_changed_total += margin
+            else:
+                self.margin_unchanged_total += margin
+
+    def stats(self) -> Dict:
+        """Taux et moyennes depuis le démarrage."""
+        with self._lock:
+            unchanged = self.reranked - self.top1_changed
+            return {
+                "requested": self.requested,
+                "skipped": self.skipped,
+                "reranked": self.reranked,
+                "mean_depth": self.depth_total / self.reranked if self.reranked else 0.0,
+                "top1_changed_rate": self.top1_changed / self.reranked if self.reranked else 0.0,
+                "mean_topk_overlap": self.overlap_total / self.reranked if self.reranked else 0.0,
+                "mean_margin_when_changed": self.margin_changed_total / self.top1_changed if self.top1_changed else None,
+                "mean_margin_when_unchanged": self.margin_unchanged_total / unchanged if unchanged else None
+            }
+
+
+_rerank_telemetry = RerankTelemetry()
+
+
+def get_rerank_telemetry() -> RerankTelemetry:
+    """Retourne les compteurs du rerank (singleton du processus)."""
+    return _rerank_telemetry
+
+
+def choose_rerank_depth(cosine_scores: List[float], allow_skip: bool = True,
+                        max_depth: int = RERANK_MAX_DEPTH, min_depth: int = RERANK_MIN_DEPTH,
+                        confident_margin: float = RERANK_CONFIDENT_MARGIN,
+                        ambiguity_band: float = RERANK_AMBIGUITY_BAND) -> int:
+    """
+    Choisit le nombre de candidats à re-scorer d'après la distribution des scores cosinus.
+    Un premier résultat nettement détaché n'a pas besoin du Cross-Encoder ; sinon les
+    premiers candidats jusqu'au dernier proche du meilleur score (zone où CLIP hésite)
+    sont re-scorés. Les scores sont lus dans l'ordre du classement (qui n'est pas celui
+    des cosinus en recherche hybride) : la profondeur retournée couvre toujours, dans
+    cet ordre, les candidats ambigus (dans la limite de max_depth).
+    
+    Args:
+        cosine_scores: Scores cosinus des candidats, dans l'ordre du classement
+        allow_skip: Si False, re-score au moins min_depth candidats (rerank forcé)
+        max_depth: Profondeur maximale
+        min_depth: Profondeur minimale quand le rerank a lieu
+        confident_margin: Écart top1-top2 au-delà duquel le rerank est ignoré
+        ambiguity_band: Écart au meilleur score définissant la zone ambiguë
+        
+    Returns:
+        Nombre de candidats à re-scorer (0 : pas de rerank)
+    """
+    scores = list(cosine_scores)
+    if not scores:
+        return 0
+    if len(scores) == 1:
+        return 0 if allow_skip else 1
+    if allow_skip and scores[0] - max(scores[1:]) >= confident_margin:
+        return 0
+    best = max(scores)
+    last_ambiguous = max(i for i, score in enumerate(scores) if best - score <= ambiguity_band)
+    return min(len(scores), max_depth, max(min_depth, last_ambiguous + 1))
 
 
 def load_index_and_metadata(index_path: str = "index.faiss", 
@@ -207,7 +340,11 @@ def search(query_text: str,
            filtered_indices: Optional[List[int]] = None,
            media_type: Optional[str] = None,
            date_range: Optional[Tuple] = None,
-           include_dirs: Optional[List[str]] = None) -> List[Dict]:
+           include_dirs: Optional[List[str]] = None,
+           use_hybrid: bool = False,
+           lexical_index: Optional[Dict] = None,
+           rrf_k: int = 60,
+           rerank_policy: str = DEFAULT_RERANK_POLICY) -> List[Dict]:
     """
     Recherche les médias les plus pertinents pour une requête texte.
     
@@ -229,11 +366,47 @@ def search(query_text: str,
         media_type: Type de média à filtrer ('image', 'video', ou None)
         date_range: Tuple (date_debut, date_fin) pour filtrer par date
         include_dirs: Liste de dossiers à inclure
+        use_hybrid: Si True, fusionne (RRF) la recherche FAISS et la recherche lexicale
+                    sur les légendes/noms de fichiers
+        lexical_index: Index lexical construit à l'indexation (reconstruit à la volée si None)
+        rrf_k: Constante de lissage de la Reciprocal Rank Fusion
+        rerank_policy: "fixed" (10 premiers candidats re-scorés) ou "adaptive" (profondeur
+                       selon les écarts cosinus, rerank ignoré si le premier résultat est net ;
+                       les candidats non re-scorés suivent alors dans l'ordre FAISS)
         
     Returns:
-        Liste de dictionnaires avec "path", "score", "cosine_score", "meta"
+        Liste de dictionnaires avec "path", "score", "cosine_score", "meta", dans l'ordre de
+        classement ; en mode hybride sans rerank, l'ordre est celui de "rrf_score"
+        ("score" reste le cosinus)
     """
     print(f"🔍 Recherche: \"{query_text}\"")
+    if rerank_policy not in RERANK_POLICIES:
+        raise ValueError(f"rerank_policy inconnue: {rerank_policy!r} (attendu: {', '.join(RERANK_POLICIES)})")
+    
+    # Appliquer les filtres si disponibles
+    if filtered_indices is None:
+        # Si filtered_indices n'est pas fourni, calculer depuis les filtres
+        if media_type is not None or date_range is not None or include_dirs is not None:
+            filtered_indices = filter_metadata(
+                metadata=metadata,
+                media_type=media_type,
+                date_range=date_range,
+                include_dirs=include_dirs
+            )
+            print(f"📊 Filtres appliqués: {len(filtered_indices)}/{len(metadata)} indices valides")
+    
+    # Si rerank activé, chercher plus de candidats
+    search_k = top_k * 3 if (always_rerank or rerank_if_below is not None) else top_k
+    
+    # Lancer la recherche lexicale en parallèle de l'encodage de la requête
+    lexical_future = None
+    if use_hybrid:
+        if lexical_index is None:
+            print("⚠️  Index lexical absent, construction à la volée (réindexez pour l'éviter)")
+            lexical_index = build_lexical_index(metadata)
+        lexical_future = _lexical_executor.submit(
+            lexical_search, query_text, lexical_index, search_k * 2, filtered_indices
+        )
     
     # Encoder la requête texte (avec ou sans expansion)
     print("📝 Encodage de la requête...")
@@ -291,21 +464,7 @@ def search(query_text: str,
     # Normaliser la requête pour cosine similarity (si nécessaire)
     faiss.normalize_L2(query_embedding)
     
-    # Appliquer les filtres si disponibles
-    if filtered_indices is None:
-        # Si filtered_indices n'est pas fourni, calculer depuis les filtres
-        if media_type is not None or date_range is not None or include_dirs is not None:
-            filtered_indices = filter_metadata(
-                metadata=metadata,
-                media_type=media_type,
-                date_range=date_range,
-                include_dirs=include_dirs
-            )
-            print(f"📊 Filtres appliqués: {len(filtered_indices)}/{len(metadata)} indices valides")
-    
     # Rechercher dans l'index
-    # Si rerank activé, chercher plus de candidats
-    search_k = top_k * 3 if (always_rerank or rerank_if_below is not None) else top_k
     print(f"🔎 Recherche des {search_k} résultats les plus pertinents...")
     
     try:
@@ -338,10 +497,24 @@ def search(query_text: str,
         candidates.append({
             "path": file_path,
             "score": cosine_score,
-            "meta": meta
+            "meta": meta,
+            "index_id": int(idx)
         })
         cosine_scores.append(cosine_score)
     
+    # Fusionner avec les résultats lexicaux (RRF)
+    if lexical_future is not None:
+        try:
+            lexical_hits = lexical_future.result()
+            print(f"📝 Recherche lexicale: {len(lexical_hits)} résultat(s)")
+            candidates = fuse_hybrid_candidates(
+                candidates, lexical_hits, metadata, index, query_embedding, rrf_k=rrf_k
+            )
+        except Exception as e:
+            print(f"⚠️  Erreur lors de la recherche lexicale: {e}")
+            print("   Continuation avec les résultats FAISS seuls")
+            use_hybrid = False
+    
     # Calculer le seuil (dynamique ou fixe)
     if use_dynamic_threshold and len(cosine_scores) > 0:
         threshold = compute_dynamic_threshold(np.array(cosine_scores))
@@ -360,12 +533,21 @@ def search(query_text: str,
         print(f"📊 Top 5 scores bruts: {[f'{s:.4f}' for s in top_scores]}")
     
     # Filtrer par seuil
-    filtered_candidates = [c for c in candidates if c["score"] >= threshold]
+    if use_hybrid:
+        # Le seuil cosinus ne s'applique pas aux correspondances lexicales fortes
+        # (la plupart des termes de la requête dans la légende ou le nom de fichier)
+        query_terms = tokenize(query_text)
+        filtered_candidates = [c for c in candidates
+                               if c["cosine_score"] >= threshold
+                               or (c.get("lexical_score") is not None
+                                   and query_coverage(query_terms, c["meta"]) >= LEXICAL_MIN_COVERAGE)]
+    else:
+        filtered_candidates = [c for c in candidates if c["score"] >= threshold]
     
     # Si aucun résultat après filtrage, prendre au moins le top 5 même si sous le seuil
     if not filtered_candidates and len(candidates) > 0:
         print(f"⚠️  Aucun résultat au-dessus du seuil {threshold:.4f}, affichage du top 5 quand même")
-        filtered_candidates = sorted(candidates, key=lambda x: x["score"], reverse=True)[:5]
+        filtered_candidates = sorted(candidates, key=lambda x: x.get("rrf_score", x["score"]), reverse=True)[:5]
     
     # Déterminer si on doit appliquer le rerank
     should_rerank = False
@@ -373,11 +555,27 @@ def search(query_text: str,
         should_rerank = True
         print("🔄 Rerank forcé (always_rerank=True)")
     elif rerank_if_below is not None and len(filtered_candidates) > 0:
-        best_cosine = max(c["score"] for c in filtered_candidates)
+        best_cosine = max(c.get("cosine_score", c["score"]) for c in filtered_candidates)
         if best_cosine < rerank_if_below:
             should_rerank = True
             print(f"🔄 Rerank activé (best_cosine={best_cosine:.4f} < rerank_if_below={rerank_if_below:.4f})")
     
+    # Profondeur du rerank : fixe, ou selon la confiance du classement CLIP
+    top_rerank = min(RERANK_MAX_DEPTH, len(filtered_candidates))
+    cosine_margin = 0.0
+    if should_rerank and len(filtered_candidates) > 0:
+        # Cosinus dans l'ordre du classement (RRF en hybride) : c'est cet ordre qui est tronqué
+        candidate_cosines = [c.get("cosine_score", c["score"]) for c in filtered_candidates]
+        cosine_margin = candidate_cosines[0] - max(candidate_cosines[1:]) if len(candidate_cosines) > 1 else 0.0
+        if rerank_policy == "adaptive":
+            top_rerank = choose_rerank_depth(candidate_cosines, allow_skip=not always_rerank)
+            if top_rerank == 0:
+                should_rerank = False
+                _rerank_telemetry.record_skip()
+                print(f"⏭️  Rerank ignoré (écart top1-top2={cosine_margin:.4f} ≥ {RERANK_CONFIDENT_MARGIN:.4f})")
+            else:
+                print(f"🎯 Profondeur de rerank adaptative: {top_rerank}/{len(filtered_candidates)}")
+    
     # Appliquer le rerank si nécessaire
     if should_rerank and len(filtered_candidates) > 0:
         print("🔄 Re-ranking des résultats avec Cross-Encoder...")
@@ -386,7 +584,6 @@ def search(query_text: str,
                 reranker = get_reranker()
             
             # Re-scorer les top candidats
-            top_rerank = min(10, len(filtered_candidates))
             reranked_results = rerank_results(
                 query_text=query_text,
                 candidates=filtered_candidates[:top_rerank],
@@ -408,9 +605,26 @@ def search(query_text: str,
             # Trier par score cross-encoder décroissant
             results.sort(key=lambda x: x["score"], reverse=True)
             
+            # Profondeur adaptative : les candidats non re-scorés suivent, dans l'ordre FAISS,
+            # avec un score juste sous le dernier score cross-encoder (l'API retrie par score)
+            if rerank_policy == "adaptive" and results:
+                floor = results[-1]["score"]
+                for rank, c in enumerate(filtered_candidates[top_rerank:], start=1):
+                    results.append({
+                        "path": c["path"],
+                        "score": floor - 1e-3 * rank,
+                        "cosine_score": c.get("cosine_score", c["score"]),
+                        "meta": c["meta"]
+                    })
+            
             # Limiter aux top_k
             results = results[:top_k]
             
+            _rerank_telemetry.record_rerank(
+                top_rerank, cosine_margin,
+                [c["path"] for c in filtered_candidates[:top_k]],
+                [r["path"] for r in results]
+            )
             print("✅ Re-ranking terminé")
         except Exception as e:
             print(f"⚠️  Erreur lors du re-ranking: {e}")
@@ -422,7 +636,210 @@ def search(query_text: str,
         results = filtered_candidates[:top_k]
         # Ajouter cosine_score pour compatibilité
         for r in results:
-            r["cosine_score"] = r["score"]
+            r.setdefault("cosine_score", r["score"])
+    
+    return results
+
+
+def fuse_hybrid_candidates(vector_candidates: List[Dict],
+                           lexical_hits: List[Tuple[int, float]],
+                           metadata: List[Dict],
+                           index: faiss.Index,
+                           query_embedding: np.ndarray,
+                           rrf_k: int = 60) -> List[Dict]:
+    """
+    Fusionne les candidats FAISS et les résultats lexicaux par Reciprocal Rank Fusion.
+    
+    Args:
+        vector_candidates: Candidats FAISS (triés par cosinus, avec "index_id")
+        lexical_hits: Résultats lexicaux (indice, score BM25) triés par score
+        metadata: Liste des métadonnées
+        index: Index FAISS (pour calculer le cosinus des résultats lexicaux seuls)
+        query_embedding: Embedding normalisé de la requête, shape (1, dim)
+        rrf_k: Constante de lissage RRF
+        
+    Returns:
+        Candidats triés par score RRF ("rrf_score"), avec "score" (cosinus, même échelle
+        qu'en recherche vectorielle seule), "cosine_score" et "lexical_score"
+    """
+    by_id = {c["index_id"]: c for c in vector_candidates}
+    lexical_scores = dict(lexical_hits)
+    
+    fused = reciprocal_rank_fusion(
+        [[c["index_id"] for c in vector_candidates], [idx for idx, _ in lexical_hits]],
+        k=rrf_k
+    )
+    
+    candidates = []
+    for idx, rrf_score in fused:
+        if idx < 0 or idx >= len(metadata):
+            continue
+        
+        if idx in by_id:
+            cosine_score = by_id[idx]["score"]
+        else:
+            # Résultat lexical seul : cosinus à partir du vecteur stocké (pas de ré-encodage)
+            try:
+                vector = index.reconstruct(int(idx)).reshape(1, -1)
+                cosine_score = float(np.dot(vector, query_embedding.T)[0, 0])
+            except Exception:
+                cosine_score = 0.0
+        
+        candidates.append({
+            "path": metadata[idx].get("file_path", ""),
+            "score": cosine_score,
+            "cosine_score": cosine_score,
+            "rrf_score": float(rrf_score),
+            "lexical_score": lexical_scores.get(idx),
+            "meta": metadata[idx],
+            "index_id": int(idx)
+        })
+    
+    return candidates
+
+
+def find_index_rows(metadata: List[Dict], file_path: str) -> List[int]:
+    """
+    Retourne les lignes de l'index FAISS d'un média (une par image, une par frame de vidéo).
+    
+    Args:
+        metadata: Liste des métadonnées (alignée sur l'index)
+        file_path: Chemin du média
+        
+    Returns:
+        Liste d'indices (vide si le média n'est pas indexé)
+    """
+    return [idx for idx, meta in enumerate(metadata) if meta.get("file_path") == file_path]
+
+
+def build_index_rows(metadata: List[Dict]) -> Dict[str, List[int]]:
+    """
+    Lignes de l'index FAISS de chaque média, calculées une fois par chargement de l'index
+    (évite de parcourir toutes les métadonnées à chaque recherche de médias similaires).
+    
+    Args:
+        metadata: Liste des métadonnées (alignée sur l'index)
+        
+    Returns:
+        Dictionnaire chemin -> liste d'indices
+    """
+    rows: Dict[str, List[int]] = {}
+    for idx, meta in enumerate(metadata):
+        rows.setdefault(meta.get("file_path", ""), []).append(idx)
+    return rows
+
+
+def search_similar(index: faiss.Index,
+                   metadata: List[Dict],
+                   file_path: Optional[str] = None,
+                   query_image=None,
+                   embedder: Optional[CLIPEmbedder] = None,
+                   top_k: int = 20,
+                   fixed_threshold: float = 0.0,
+                   use_multi_scale: bool = True,
+                   filtered_indices: Optional[List[int]] = None,
+                   media_type: Optional[str] = None,
+                   date_range: Optional[Tuple] = None,
+                   include_dirs: Optional[List[str]] = None,
+                   index_rows: Optional[Dict[str, List[int]]] = None) -> List[Dict]:
+    """
+    Recherche les médias visuellement proches d'un média indexé ou d'une image.
+    Pour un média indexé, le vecteur est relu dans l'index FAISS (pas de ré-encodage) ;
+    une vidéo est représentée par la moyenne de ses frames. Le média source est exclu.
+    
+    Args:
+        index: Index FAISS
+        metadata: Liste des métadonnées
+        file_path: Chemin d'un média indexé servant d'exemple
+        query_image: Image PIL servant d'exemple (si file_path absent de l'index)
+        embedder: Instance de CLIPEmbedder (requis pour query_image)
+        top_k: Nombre de médias à retourner
+        fixed_threshold: Score cosinus minimal
+        use_multi_scale: Encoder query_image comme à l'indexation (multi-échelle)
+        filtered_indices: Liste d'indices à considérer (pour filtres pré-FAISS)
+        media_type: Type de média à filtrer ('image', 'video', ou None)
+        date_range: Tuple (date_debut, date_fin) pour filtrer par date
+        include_dirs: Liste de dossiers à inclure
+        index_rows: Lignes de chaque média (build_index_rows), sinon parcours des métadonnées
+        
+    Returns:
+        Liste de dictionnaires avec "path", "score", "cosine_score", "meta"
+        
+    Raises:
+        LookupError: Si file_path est absent de l'index et qu'aucune image n'est fournie
+        ValueError: Si aucun exemple n'est fourni, ou une image sans embedder
+        RuntimeError: Si l'embedding de la requête contient des valeurs invalides
+    """
+    if not file_path:
+        source_rows = []
+    elif index_rows is not None:
+        source_rows = index_rows.get(file_path, [])
+    else:
+        source_rows = find_index_rows(metadata, file_path)
+    
+    if source_rows:
+        print(f"🔍 Médias similaires à {os.path.basename(file_path)} ({len(source_rows)} vecteur(s) de l'index)")
+        vectors = np.vstack([index.reconstruct(int(idx)) for idx in source_rows]).astype('float32')
+        query_embedding = vectors.mean(axis=0).reshape(1, -1)
+    elif query_image is not None:
+        if embedder is None:
+            raise ValueError("Un embedder est requis pour rechercher à partir d'une image")
+        print("🔍 Médias similaires à une image envoyée")
+        if use_multi_scale:
+            from .indexer import encode_image_adaptive
+            query_embedding = encode_image_adaptive(query_image, embedder, n_crops=5)
+        else:
+            query_embedding = embedder.encode_image(query_image)
+        query_embedding = query_embedding.astype('float32').reshape(1, -1)
+    else:
+        if not file_path:
+            raise ValueError("Aucun média ni image fourni")
+        raise LookupError(f"Média absent de l'index: {file_path}")
+    
+    if not np.all(np.isfinite(query_embedding)):
+        raise RuntimeError("L'embedding de la requête contient des valeurs invalides")
+    faiss.normalize_L2(query_embedding)
+    
+    # Appliquer les filtres si disponibles
+    if filtered_indices is None and (media_type is not None or date_range is not None or include_dirs is not None):
+        filtered_indices = filter_metadata(
+            metadata=metadata,
+            media_type=media_type,
+            date_range=date_range,
+            include_dirs=include_dirs
+        )
+        print(f"📊 Filtres appliqués: {len(filtered_indices)}/{len(metadata)} indices valides")
+    allowed = set(filtered_indices) if filtered_indices is not None else None
+    
+    # Marge pour les lignes du média source, les frames d'une même vidéo et les filtres
+    search_k = min(top_k * 3 + len(source_rows), index.ntotal)
+    distances, indices = index.search(query_embedding, search_k)
+    
+    results = []
+    seen_paths = set()
+    for distance, idx in zip(distances[0], indices[0]):
+        if not np.isfinite(distance) or idx < 0 or idx >= len(metadata):
+            continue
+        if allowed is not None and idx not in allowed:
+            continue
+        meta = metadata[idx]
+        path = meta.get("file_path", "")
+        # Média source exclu ; une vidéo n'apparaît qu'une fois (sa meilleure frame)
+        if (file_path and path == file_path) or path in seen_paths:
+            continue
+        seen_paths.add(path)
+        cosine_score = float(distance)
+        if cosine_score < fixed_threshold:
+            continue
+        results.append({
+            "path": path,
+            "score": cosine_score,
+            "cosine_score": cosine_score,
+            "meta": meta,
+            "index_id": int(idx)
+        })
+        if len(results) >= top_k:
+            break
     
     return results
 
@@ -445,24 +862,25 @@ def display_results(results: List[Dict]):
     
     for result in results:
         file_path = result.get("path", "")
-        score = result.get("score", 0.0)  # Score principal (rerank ou cosine)
+        # Score de classement : RRF en hybride sans rerank, sinon rerank ou cosinus
+        score = result.get("rrf_score", result.get("score", 0.0))
         meta = result.get("meta", {})
         
         # Pour les vidéos, on groupe par fichier et on garde le meilleur score
         # Pour les images, on garde chaque résultat unique
         if meta.get('media_type') == 'video':
             # Si cette vidéo n'a pas encore été vue, ou si ce score est meilleur
-            if file_path not in unique_results or score > unique_results[file_path]["score"]:
-                unique_results[file_path] = result
+            if file_path not in unique_results or score > unique_results[file_path]["rank_score"]:
+                unique_results[file_path] = {**result, "rank_score": score}
         else:
             # Pour les images, on peut avoir le même fichier plusieurs fois (avec multi-scale)
             # On garde le meilleur score pour chaque fichier
-            if file_path not in unique_results or score > unique_results[file_path]["score"]:
-                unique_results[file_path] = result
+            if file_path not in unique_results or score > unique_results[file_path]["rank_score"]:
+                unique_results[file_path] = {**result, "rank_score": score}
     
     # Convertir en liste et trier par score décroissant
     unique_results_list = list(unique_results.values())
-    unique_results_list.sort(key=lambda x: x.get("score", 0.0), reverse=True)
+    unique_results_list.sort(key=lambda x: x["rank_score"], reverse=True)
     
     print("\n" + "="*80)
     print("📊 RÉSULTATS DE LA RECHERCHE")
@@ -483,7 +901,10 @@ def display_results(results: List[Dict]):
             print(f"   📊 Score de similarité: {score:.4f} (cosine similarity)")
         print(f"   🎬 Type: {meta.get('media_type', 'unknown')}")
         if meta.get('media_type') == 'video':
-            print(f"   🎞️  Vidéo (meilleure frame sélectionnée)")
+            if meta.get('timestamp') is not None:
+                print(f"   🎞️  Vidéo (meilleure frame à {meta['timestamp']:.1f}s)")
+            else:
+                print(f"   🎞️  Vidéo (meilleure frame sélectionnée)")
     
     print("\n" + "="*80)
 
@@ -501,7 +922,8 @@ def search_by_text(query_text: str,
                    always_rerank: bool = False,
                    rerank_if_below: Optional[float] = None,
                    use_reranking: bool = True,
-                   use_captions: bool = True) -> List[Dict]:
+                   use_captions: bool = True,
+                   use_hybrid: bool = False) -> List[Dict]:
     """
     Fonction principale pour rechercher dans les médias.
     
@@ -520,12 +942,14 @@ def search_by_text(query_text: str,
         rerank_if_below: Si non-None et best_cosine < rerank_if_below, applique rerank
         use_reranking: Si True, active le rerank (déprécié, utiliser always_rerank ou rerank_if_below)
         use_captions: Si True, utilise les captions pour le rerank
+        use_hybrid: Si True, combine recherche vectorielle et lexicale
         
     Returns:
         Liste de dictionnaires avec "path", "score", "cosine_score", "meta"
     """
     # Charger l'index et les métadonnées
     index, metadata = load_index_and_metadata(index_path, metadata_path)
+    lexical_index = load_lexical_index(get_lexical_index_path(metadata_path)) if use_hybrid else None
     
     # Initialiser l'embedder si nécessaire
     if embedder is None:
@@ -553,7 +977,9 @@ def search_by_text(query_text: str,
         fixed_threshold=fixed_threshold,
         always_rerank=always_rerank,
         rerank_if_below=rerank_if_below,
-        use_captions=use_captions
+        use_captions=use_captions,
+        use_hybrid=use_hybrid,
+        lexical_index=lexical_index
     )
     
     # Vérifier si aucun résultat après filtrage
@@ -0,0 +1,714 @@
+"""
+Module de génération des vignettes (images et prévisualisations vidéo).
+Utilisé à la volée par l'API et en amont par l'indexeur, pour que la galerie
+ne décode jamais d'image pleine résolution au premier affichage.
+"""
+
+import os
+import json
+import time
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Iterable, Optional, Tuple, List
+from PIL import Image
+
+# Verrou inter-processus de l'index du cache (fusion des vues des workers) : absent sous Windows
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+# Tailles (côté max, en pixels) générées pour chaque média
+THUMBNAIL_SIZES = (256, 512)
+DEFAULT_THUMBNAIL_SIZE = 512
+DEFAULT_CACHE_DIR = ".cache/thumbnails"
+JPEG_QUALITY = 85
+# Budget disque du cache de vignettes (octets)
+DEFAULT_MAX_CACHE_BYTES = int(os.environ.get('THUMBNAIL_DISK_BYTES', 1024 * 1024 * 1024))
+# Taille lue au début et à la fin du fichier pour l'empreinte de contenu
+CONTENT_SAMPLE_BYTES = 1024 * 1024
+THUMBNAIL_INDEX_VERSION = 1
+# Planche de prévisualisation vidéo : frames indexées, dans l'ordre chronologique
+SPRITE_TILE_SIZE = 256
+SPRITE_MAX_FRAMES = 8
+
+
+def get_file_hash(file_path: str) -> str:
+    """
+    Calcule un hash du fichier basé sur le chemin et le mtime.
+
+    Args:
+        file_path: Chemin vers le fichier
+
+    Returns:
+        Hash du fichier
+    """
+    try:
+        stat = os.stat(file_path)
+        # Combiner chemin et mtime pour le hash
+        content = f"{file_path}:{stat.st_mtime}"
+        return hashlib.md5(content.encode()).hexdigest()
+    except Exception:
+        # Fallback: utiliser juste le chemin
+        return hashlib.md5(file_path.encode()).hexdigest()
+
+
+def open_image_reduced(image_path: str, max_side: int) -> Image.Image:
+    """
+    Ouvre une image en décodage réduit : pour les JPEG, draft() laisse libjpeg décoder
+    directement à l'échelle 1/2, 1/4 ou 1/8 (la plus forte qui garde au moins max_side),
+    au lieu de décoder les 12-48 MP puis de tout redimensionner.
+    Sans effet pour les autres formats.
+    
+    Args:
+        image_path: Chemin vers l'image
+        max_side: Côté minimal à conserver après réduction
+        
+    Returns:
+        Image PIL RGB
+    """
+    image = Image.open(image_path)
+    image.draft('RGB', (max_side, max_side))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+
+def fit_image(image: Image.Image, max_side: int,
+              resample: int = Image.Resampling.LANCZOS) -> Image.Image:
+    """
+    Redimensionne une image pour que son plus grand côté vaille au plus max_side.
+    Pour les grands facteurs, reducing_gap applique d'abord une réduction entière
+    par moyenne de blocs (très peu coûteuse), puis le filtre demandé sur la fin.
+    
+    Args:
+        image: Image PIL
+        max_side: Côté maximal
+        resample: Filtre de rééchantillonnage final
+        
+    Returns:
+        Nouvelle image (copie si aucun redimensionnement n'est nécessaire)
+    """
+    if max(image.size) <= max_side:
+        return image.copy()
+    ratio = max_side / float(max(image.size))
+    target = (max(1, round(image.size[0] * ratio)), max(1, round(image.size[1] * ratio)))
+    return image.resize(target, resample, reducing_gap=2.0)
+
+
+def get_content_key(file_path: str) -> str:
+    """
+    Calcule l'empreinte de contenu d'un fichier (clé du cache de vignettes).
+    Les fichiers de plus de 2 Mo ne sont lus qu'au début et à la fin (avec la taille),
+    pour ne pas relire des vidéos entières.
+    
+    Args:
+        file_path: Chemin vers le fichier
+        
+    Returns:
+        Empreinte hexadécimale (40 caractères)
+    """
+    size = os.path.getsize(file_path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(CONTENT_SAMPLE_BYTES))
+        if size > 2 * CONTENT_SAMPLE_BYTES:
+            f.seek(-CONTENT_SAMPLE_BYTES, os.SEEK_END)
+        digest.update(f.read(CONTENT_SAMPLE_BYTES))
+    return digest.hexdigest()[:40]
+
+
+class ThumbnailStore:
+    """
+    Cache disque des vignettes adressé par contenu, borné en octets.
+    Un fichier d'index (index.json) associe chaque média (chemin, taille, mtime) à son
+    empreinte de contenu, ce qui évite de relire le fichier à chaque requête, et garde
+    la taille et la date de dernier accès de chaque vignette pour l'éviction LRU.
+    Un média déplacé ou dupliqué retrouve donc ses vignettes existantes.
+    Chaque processus garde sa vue de l'index et la fusionne avec celle du disque à chaque
+    sauvegarde (sous verrou de fichier) ; gc() remet l'index et le disque d'accord.
+    Les sauvegardes déclenchées par les requêtes sont faites par un thread d'arrière-plan.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+        """
+        Initialise le cache et charge son index.
+        
+        Args:
+            cache_dir: Dossier de cache
+            max_bytes: Budget disque total (octets)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.current_bytes = 0
+        # chemin absolu -> [taille, mtime_ns, empreinte]
+        self._sources: Dict[str, List] = {}
+        # nom de vignette -> [octets, dernier accès], du moins au plus récemment utilisé
+        self._entries: "OrderedDict[str, List]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self._last_save = time.monotonic()
+        self._save_requested = threading.Event()
+        self._flusher = None
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+        atexit.register(self.save)
+
+    def _read_index(self) -> Optional[Dict]:
+        if not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️  Index du cache de vignettes illisible ({self.index_path}): {e}")
+            return None
+        if data.get("version") != THUMBNAIL_INDEX_VERSION:
+            return None
+        return data
+
+    def _load(self):
+        data = self._read_index()
+        if data is None:
+            return
+        self._sources = data.get("sources", {})
+        for name, entry in sorted(data.get("entries", {}).items(), key=lambda item: item[1][1]):
+            self._entries[name] = entry
+            self.current_bytes += entry[0]
+
+    def _merge(self, data: Dict):
+        """
+        Fusionne l'index lu sur disque (écrit par d'autres processus) dans la vue mémoire.
+        Appelé sous verrou. Les vignettes inconnues ne sont reprises que si leur fichier
+        existe encore (une vignette évincée ici n'est pas ressuscitée).
+        """
+        for abs_path, source in data.get("sources", {}).items():
+            self._sources.setdefault(abs_path, source)
+        for name, entry in data.get("entries", {}).items():
+            current = self._entries.get(name)
+            if current is not None:
+                current[1] = max(current[1], entry[1])
+            elif os.path.exists(os.path.join(self.cache_dir, name)):
+                self._entries[name] = list(entry)
+                self.current_bytes += entry[0]
+        self._entries = OrderedDict(sorted(self._entries.items(), key=lambda item: item[1][1]))
+
+    def _file_lock(self):
+        """Ouvre et verrouille le fichier de verrou de l'index (None sans fcntl)."""
+        if not FCNTL_AVAILABLE:
+            return None
+        lock_file = open(self.index_path + ".lock", 'a')
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        return lock_file
+
+    def save(self, merge: bool = True):
+        """
+        Écrit l'index sur disque (écriture atomique), après fusion avec l'index du disque.
+
+        Args:
+            merge: Si False, la vue mémoire remplace celle du disque (fin de gc())
+        """
+        lock_file = None
+        try:
+            lock_file = self._file_lock()
+            disk_data = self._read_index() if merge else None
+            with self._lock:
+                if disk_data is not None:
+                    self._merge(disk_data)
+                data = {
+                    "version": THUMBNAIL_INDEX_VERSION,
+                    "sources": dict(self._sources),
+                    "entries": dict(self._entries)
+                }
+                self._dirty = 0
+                self._last_save = time.monotonic()
+            # Nom propre au thread : deux sauvegardes simultanées n'écrivent pas le même fichier
+            tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            print(f"⚠️  Erreur lors de l'écriture de l'index des vignettes: {e}")
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                lock_file.close()
+
+    def _mark_dirty(self):
+        # Appelé sous verrou : sauvegarde groupée (toutes les 100 modifications ou 30 s)
+        self._dirty += 1
+        return self._dirty >= 100 or time.monotonic() - self._last_save > 30
+
+    def _schedule_save(self):
+        """Demande une sauvegarde au thread d'arrière-plan (jamais sur le thread de la requête)."""
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="thumbnail-index", daemon=True)
+                self._flusher.start()
+        self._save_requested.set()
+
+    def _flush_loop(self):
+        while True:
+            self._save_requested.wait()
+            self._save_requested.clear()
+            self.save()
+
+    def content_key(self, file_path: str) -> str:
+        """
+        Empreinte de contenu d'un média, en O(1) tant que sa taille et son mtime n'ont pas changé.
+        
+        Args:
+            file_path: Chemin vers le média
+            
+        Returns:
+            Empreinte de contenu (ou empreinte du chemin si le fichier est illisible)
+        """
+        abs_path = os.path.abspath(file_path)
+        try:
+            stat = os.stat(abs_path)
+        except OSError:
+            return hashlib.md5(abs_path.encode()).hexdigest()
+        with self._lock:
+            source = self._sources.get(abs_path)
+        if source is not None and source[0] == stat.st_size and source[1] == stat.st_mtime_ns:
+            return source[2]
+
+        try:
+            key = get_content_key(abs_path)
+        except OSError:
+            return hashlib.md5(abs_path.encode()).hexdigest()
+        with self._lock:
+            self._sources[abs_path] = [stat.st_size, stat.st_mtime_ns, key]
+            should_save = self._mark_dirty()
+        if should_save:
+            self._schedule_save()
+        return key
+
+    def path_for(self, file_path: str, size: int, kind: str = "image") -> str:
+        """Chemin de la vignette d'un média dans le cache (kind: "image", "video" ou "sprite")."""
+        suffix = "" if kind == "image" else f"_{kind}"
+        return os.path.join(self.cache_dir, f"{self.content_key(file_path)}{suffix}_{size}.jpg")
+
+    def touch(self, cache_path: str):
+        """Marque une vignette comme récemment utilisée."""
+        name = os.path.basename(cache_path)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return
+            entry[1] = time.time()
+            self._entries.move_to_end(name)
+            should_save = self._mark_dirty()
+        if should_save:
+            self._schedule_save()
+
+    def record(self, cache_path: str):
+        """
+        Enregistre une vignette qui vient d'être écrite et évince les moins récemment
+        utilisées si le budget est dépassé.
+        
+        Args:
+            cache_path: Chemin de la vignette écrite
+        """
+        name = os.path.basename(cache_path)
+        try:
+            nbytes = os.path.getsize(cache_path)
+        except OSError:
+            return
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(name, None)
+            if previous is not None:
+                self.current_bytes -= previous[0]
+            self._entries[name] = [nbytes, time.time()]
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                old_name, (old_bytes, _) = self._entries.popitem(last=False)
+                self.current_bytes -= old_bytes
+                evicted.append(old_name)
+            should_save = self._mark_dirty()
+        for old_name in evicted:
+            try:
+                os.remove(os.path.join(self.cache_dir, old_name))
+            except OSError:
+                pass
+        if should_save:
+            self._schedule_save()
+
+    def gc(self) -> Dict[str, int]:
+        """
+        Nettoie le cache : oublie les médias supprimés ou modifiés, supprime les vignettes
+        qui ne correspondent plus à aucun média (et les fichiers inconnus de l'index, dont
+        l'ancien nommage par chemin), puis applique le budget disque.
+        
+        Returns:
+            Statistiques {"sources_removed", "files_removed", "bytes_freed", "bytes_used"}
+        """
+        # Reprendre d'abord les médias et vignettes enregistrés par les autres processus :
+        # leurs vignettes ne doivent pas être supprimées comme inconnues
+        disk_data = self._read_index()
+        sources_removed = 0
+        with self._lock:
+            if disk_data is not None:
+                self._merge(disk_data)
+            for abs_path, (st_size, st_mtime_ns, _) in list(self._sources.items()):
+                try:
+                    stat = os.stat(abs_path)
+                    if stat.st_size == st_size and stat.st_mtime_ns == st_mtime_ns:
+                        continue
+                except OSError:
+                    pass
+                del self._sources[abs_path]
+                sources_removed += 1
+            live_keys = {source[2] for source in self._sources.values()}
+
+        files_removed = 0
+        bytes_freed = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.jpg'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                nbytes = os.path.getsize(path)
+            except OSError:
+                continue
+            with self._lock:
+                if name.split('_', 1)[0] in live_keys:
+                    # Vignette valide absente de l'index (ex: écrite par un autre processus)
+                    if name not in self._entries:
+                        self._entries[name] = [nbytes, os.path.getmtime(path)]
+                        self.current_bytes += nbytes
+                    continue
+                entry = self._entries.pop(name, None)
+                if entry is not None:
+                    self.current_bytes -= entry[0]
+            try:
+                os.remove(path)
+                files_removed += 1
+                bytes_freed += nbytes
+            except OSError:
+                pass
+
+        with self._lock:
+            # Entrées dont le fichier a disparu
+            for name in [n for n in self._entries if not os.path.exists(os.path.join(self.cache_dir, n))]:
+                self.current_bytes -= self._entries.pop(name)[0]
+            self._entries = OrderedDict(sorted(self._entries.items(), key=lambda item: item[1][1]))
+            evicted = []
+            while self.current_bytes > self.max_bytes and self._entries:
+                old_name, (old_bytes, _) = self._entries.popitem(last=False)
+                self.current_bytes -= old_bytes
+                evicted.append((old_name, old_bytes))
+        for old_name, old_bytes in evicted:
+            try:
+                os.remove(os.path.join(self.cache_dir, old_name))
+                files_removed += 1
+                bytes_freed += old_bytes
+            except OSError:
+                pass
+
+        self.save(merge=False)
+        return {
+            "sources_removed": sources_removed,
+            "files_removed": files_removed,
+            "bytes_freed": bytes_freed,
+            "bytes_used": self.current_bytes
+        }
+
+
+_thumbnail_stores: Dict[str, ThumbnailStore] = {}
+_thumbnail_stores_lock = threading.Lock()
+
+
+def get_thumbnail_store(cache_dir: str = DEFAULT_CACHE_DIR) -> ThumbnailStore:
+    """
+    Retourne le cache de vignettes d'un dossier (singleton par dossier).
+    
+    Args:
+        cache_dir: Dossier de cache
+        
+    Returns:
+        Instance de ThumbnailStore
+    """
+    key = os.path.abspath(cache_dir)
+    with _thumbnail_stores_lock:
+        store = _thumbnail_stores.get(key)
+        if store is None:
+            store = ThumbnailStore(cache_dir)
+            _thumbnail_stores[key] = store
+        return store
+
+
+def thumbnail_path(file_path: str, size: int = DEFAULT_THUMBNAIL_SIZE,
+                   cache_dir: str = DEFAULT_CACHE_DIR, kind: str = "image") -> str:
+    """
+    Chemin de la vignette en cache pour un média (adressé par contenu).
+
+    Args:
+        file_path: Chemin du média source
+        size: Côté maximal de la vignette
+        cache_dir: Dossier de cache
+        kind: "image", "video" ou "sprite" (planche de frames vidéo)
+
+    Returns:
+        Chemin du fichier JPEG de la vignette
+    """
+    return get_thumbnail_store(cache_dir).path_for(file_path, size, kind)
+
+
+def render_thumbnails(image: Image.Image, file_path: str,
+                      sizes: Iterable[int] = THUMBNAIL_SIZES,
+                      cache_dir: str = DEFAULT_CACHE_DIR,
+                      kind: str = "image") -> Dict[int, Image.Image]:
+    """
+    Génère et enregistre les vignettes d'un média à partir d'une image déjà décodée.
+    Les tailles sont produites de la plus grande à la plus petite, chacune à partir
+    de la précédente, pour ne redimensionner l'image source qu'une seule fois.
+
+    Args:
+        image: Image PIL déjà décodée (n'est pas modifiée)
+        file_path: Chemin du média source (clé du cache)
+        sizes: Tailles à générer
+        cache_dir: Dossier de cache
+        kind: "image" ou "video"
+
+    Returns:
+        Dictionnaire {taille: vignette PIL}
+    """
+    store = get_thumbnail_store(cache_dir)
+
+    current = image if image.mode == 'RGB' else image.convert('RGB')
+    thumbnails = {}
+    for size in sorted(set(sizes), reverse=True):
+        thumb = fit_image(current, size)
+        thumbnails[size] = thumb
+        current = thumb
+
+        cache_path = thumbnail_path(file_path, size, cache_dir, kind)
+        if not os.path.exists(cache_path):
+            _write_jpeg(thumb, cache_path, store)
+
+    return thumbnails
+
+
+def _write_jpeg(image: Image.Image, cache_path: str, store: ThumbnailStore):
+    # Écriture atomique : jamais de vignette tronquée servie par l'API. Le pid distingue
+    # les workers gunicorn (identifiants de thread identiques après le fork)
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        image.save(tmp_path, 'JPEG', quality=JPEG_QUALITY)
+        os.replace(tmp_path, cache_path)
+        store.record(cache_path)
+    except Exception as e:
+        print(f"⚠️  Erreur lors de l'écriture de la vignette {cache_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def sprite_tiles(frames: List[Tuple[int, Image.Image]],
+                 max_frames: int = SPRITE_MAX_FRAMES) -> List[Image.Image]:
+    """
+    Prépare les vignettes d'une planche vidéo à partir des frames indexées.
+    Garde au plus max_frames frames, réparties sur la vidéo, dans l'ordre chronologique.
+    
+    Args:
+        frames: Liste de tuples (numéro de frame, image PIL)
+        max_frames: Nombre maximal de vignettes
+        
+    Returns:
+        Liste d'images réduites à SPRITE_TILE_SIZE
+    """
+    ordered = sorted(frames, key=lambda item: item[0])
+    if len(ordered) > max_frames:
+        step = len(ordered) / float(max_frames)
+        ordered = [ordered[int(i * step)] for i in range(max_frames)]
+    return [fit_image(image if image.mode == 'RGB' else image.convert('RGB'), SPRITE_TILE_SIZE)
+            for _, image in ordered]
+
+
+def render_sprite_sheet(tiles: List[Image.Image], file_path: str,
+                        cache_dir: str = DEFAULT_CACHE_DIR) -> Optional[Image.Image]:
+    """
+    Assemble une planche horizontale de vignettes carrées (SPRITE_TILE_SIZE, bandes noires
+    si besoin) et l'enregistre dans le cache. Le nombre de frames vaut largeur / hauteur.
+    
+    Args:
+        tiles: Vignettes produites par sprite_tiles
+        file_path: Chemin de la vidéo source (clé du cache)
+        cache_dir: Dossier de cache
+        
+    Returns:
+        Planche PIL, ou None si aucune frame
+    """
+    if not tiles:
+        return None
+    sheet = Image.new('RGB', (SPRITE_TILE_SIZE * len(tiles), SPRITE_TILE_SIZE))
+    for i, tile in enumerate(tiles):
+        offset = (i * SPRITE_TILE_SIZE + (SPRITE_TILE_SIZE - tile.size[0]) // 2,
+                  (SPRITE_TILE_SIZE - tile.size[1]) // 2)
+        sheet.paste(tile, offset)
+    _write_jpeg(sheet, thumbnail_path(file_path, SPRITE_TILE_SIZE, cache_dir, kind="sprite"),
+                get_thumbnail_store(cache_dir))
+    return sheet
+
+
+class ThumbnailPipeline:
+    """
+    Étape de génération des vignettes de l'indexation.
+    Reçoit les images déjà décodées par l'indexeur et les traite dans un pool de threads
+    (PIL libère le GIL pendant le redimensionnement et l'encodage JPEG).
+    """
+
+    def __init__(self, max_workers: int = 4, sizes: Iterable[int] = THUMBNAIL_SIZES,
+                 cache_dir: str = DEFAULT_CACHE_DIR):
+        """
+        Initialise le pool de workers.
+
+        Args:
+            max_workers: Nombre de threads de génération
+            sizes: Tailles de vignettes à générer
+            cache_dir: Dossier de cache
+        """
+        self.sizes = tuple(sorted(set(sizes)))
+        self.cache_dir = cache_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnails")
+        self._lock = threading.Lock()
+        self.generated = 0
+        self.errors = 0
+
+    def submit(self, image: Image.Image, file_path: str, kind: str = "image") -> Optional[Future]:
+        """
+        Planifie la génération des vignettes d'un média.
+        L'image est d'abord réduite à la plus grande taille dans le thread appelant,
+        ce qui permet ensuite à l'indexeur de fermer l'image pleine résolution.
+
+        Args:
+            image: Image PIL décodée (image ou frame vidéo)
+            file_path: Chemin absolu du média source
+            kind: "image" ou "video"
+
+        Returns:
+            Future de la tâche, ou None si les vignettes existent déjà
+        """
+        largest = self.sizes[-1]
+        if all(os.path.exists(thumbnail_path(file_path, size, self.cache_dir, kind)) for size in self.sizes):
+            return None
+
+        base = fit_image(image if image.mode == 'RGB' else image.convert('RGB'), largest)
+
+        future = self._executor.submit(render_thumbnails, base, file_path, self.sizes, self.cache_dir, kind)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def submit_video(self, frames: List[Tuple[int, Image.Image]], file_path: str) -> Optional[Future]:
+        """
+        Planifie la preview d'une vidéo à partir des frames sélectionnées par l'indexeur :
+        la meilleure frame (première de la liste) devient l'affiche, et les frames triées
+        par position forment la planche de survol.
+        
+        Args:
+            frames: Liste de tuples (numéro de frame, image PIL), la meilleure en premier
+            file_path: Chemin absolu de la vidéo
+            
+        Returns:
+            Future de la tâche, ou None si la preview existe déjà
+        """
+        if not frames:
+            return None
+        sprite_path = thumbnail_path(file_path, SPRITE_TILE_SIZE, self.cache_dir, kind="sprite")
+        poster_done = all(os.path.exists(thumbnail_path(file_path, size, self.cache_dir, "video"))
+                          for size in self.sizes)
+        if poster_done and os.path.exists(sprite_path):
+            return None
+
+        # Réductions dans le thread appelant : l'indexeur peut ensuite libérer les frames
+        poster = fit_image(frames[0][1] if frames[0][1].mode == 'RGB' else frames[0][1].convert('RGB'),
+                           self.sizes[-1])
+        tiles = sprite_tiles(frames)
+
+        future = self._executor.submit(self._render_video, poster, tiles, file_path)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _render_video(self, poster: Image.Image, tiles: List[Image.Image], file_path: str):
+        render_thumbnails(poster, file_path, self.sizes, self.cache_dir, kind="video")
+        render_sprite_sheet(tiles, file_path, self.cache_dir)
+
+    def _on_done(self, future: Future):
+        with self._lock:
+            if future.exception() is not None:
+                self.errors += 1
+            else:
+                self.generated += 1
+
+    def close(self):
+        """Attend la fin de toutes les générations en cours et libère les workers."""
+        self._executor.shutdown(wait=True)
+        print(f"🖼️  Vignettes générées: {self.generated} média(s)" + (f", {self.errors} erreur(s)" if self.errors else ""))
+
+
+class ThumbnailBytesCache:
+    """
+    Cache LRU en mémoire des vignettes déjà encodées en JPEG, borné en octets.
+    La clé est le chemin de la vignette sur disque, nommée d'après l'empreinte de contenu
+    du média : un média modifié a une autre empreinte, donc une autre clé. Une entrée
+    n'est donc jamais périmée, elle finit simplement évincée.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialise le cache.
+
+        Args:
+            max_bytes: Budget mémoire total (octets)
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_path: str) -> Optional[Tuple[bytes, str]]:
+        """Retourne (octets JPEG, ETag) si la vignette est en mémoire."""
+        with self._lock:
+            entry = self._entries.get(cache_path)
+            if entry is not None:
+                self._entries.move_to_end(cache_path)
+            return entry
+
+    def load(self, cache_path: str) -> Optional[Tuple[bytes, str]]:
+        """
+        Lit une vignette depuis le disque, calcule son ETag fort et la garde en mémoire.
+
+        Args:
+            cache_path: Chemin de la vignette sur disque
+
+        Returns:
+            Tuple (octets JPEG, ETag), ou None si le fichier est illisible ou
+            dépasse le budget (à servir directement depuis le disque)
+        """
+        try:
+            if os.path.getsize(cache_path) > self.max_bytes:
+                return None
+            with open(cache_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        entry = (data, f'"{hashlib.md5(data).hexdigest()}"')
+        with self._lock:
+            previous = self._entries.pop(cache_path, None)
+            if previous is not None:
+                self.current_bytes -= len(previous[0])
+            self._entries[cache_path] = entry
+            self.current_bytes += len(data)
+            while self.current_bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+        return entry
@@ -4,21 +4,33 @@ Utilise SQLite en local, PostgreSQL en production.
 """
 
 import os
+import re
 import json
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import sqlite3
 from contextlib import contextmanager
 
+from pagination import encode_cursor, decode_cursor
+
 # Support PostgreSQL en production
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor
+    from psycopg2.extras import RealDictCursor, execute_values
     POSTGRES_AVAILABLE = True
 except ImportError:
     POSTGRES_AVAILABLE = False
 
+# Texte indexé pour la recherche plein texte PostgreSQL (config 'simple' :
+# pas de stemming, les légendes BLIP sont en anglais et les requêtes en français)
+_PG_CAPTION_TSV = "to_tsvector('simple', coalesce(caption, '') || ' ' || coalesce(file_name, ''))"
+
+
+def _caption_terms(query: str) -> List[str]:
+    """Découpe une requête en termes alphanumériques (sans syntaxe FTS)."""
+    return re.findall(r"\w+", query.lower())
+
 
 class MediaDatabase:
     """Gestionnaire de base de données pour les médias."""
@@ -54,6 +66,9 @@ class MediaDatabase:
         else:
             conn = sqlite3.connect(self.conn_string)
             conn.row_factory = sqlite3.Row
+            # INSERT OR REPLACE supprime l'ancienne ligne : les triggers FTS
+            # de suppression ne se déclenchent qu'avec recursive_triggers
+            conn.execute("PRAGMA recursive_triggers = ON")
         
         try:
             yield conn
@@ -99,6 +114,24 @@ class MediaDatabase:
                 # Index pour les recherches
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_media_type ON media(media_type)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_media_created ON media(created_at)")
+                # Pagination par curseur (keyset sur created_at, id)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_media_created_id ON media(created_at, id)")
+                
+                # Recherche plein texte sur les légendes (tsvector) + trigrammes (pg_trgm)
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_media_caption_tsv ON media USING GIN ({_PG_CAPTION_TSV})")
+                self.fts_available = True
+                
+                # L'extension peut être refusée (droits) : ne pas annuler toute la transaction
+                cursor.execute("SAVEPOINT pg_trgm")
+                try:
+                    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                    cursor.execute("CREATE INDEX IF NOT EXISTS idx_media_caption_trgm ON media USING GIN (caption gin_trgm_ops)")
+                    cursor.execute("RELEASE SAVEPOINT pg_trgm")
+                    self.trigram_available = True
+                except psycopg2.Error as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT pg_trgm")
+                    self.trigram_available = False
+                    print(f"⚠️  pg_trgm indisponible, recherche par trigrammes désactivée: {e}")
                 
             else:
                 # SQLite
@@ -130,6 +163,49 @@ class MediaDatabase:
                 # Index pour les recherches
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_media_type ON media(media_type)")
                 cursor.execute("CREATE INDEX IF NOT EXISTS idx_media_created ON media(created_at)")
+                # Pagination par curseur (keyset sur created_at, id)
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_media_created_id ON media(created_at, id)")
+                
+                # Recherche plein texte sur les légendes (FTS5, synchronisé par triggers)
+                self.trigram_available = False
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'media_fts'")
+                fts_existed = cursor.fetchone() is not None
+                try:
+                    cursor.execute("""
+                        CREATE VIRTUAL TABLE IF NOT EXISTS media_fts USING fts5(
+                            caption, file_name,
+                            content='media', content_rowid='id',
+                            tokenize='unicode61 remove_diacritics 2'
+                        )
+                    """)
+                    cursor.execute("""
+                        CREATE TRIGGER IF NOT EXISTS media_fts_ai AFTER INSERT ON media BEGIN
+                            INSERT INTO media_fts(rowid, caption, file_name)
+                            VALUES (new.id, new.caption, new.file_name);
+                        END
+                    """)
+                    cursor.execute("""
+                        CREATE TRIGGER IF NOT EXISTS media_fts_ad AFTER DELETE ON media BEGIN
+                            INSERT INTO media_fts(media_fts, rowid, caption, file_name)
+                            VALUES ('delete', old.id, old.caption, old.file_name);
+                        END
+                    """)
+                    cursor.execute("""
+                        CREATE TRIGGER IF NOT EXISTS media_fts_au AFTER UPDATE ON media BEGIN
+                            INSERT INTO media_fts(media_fts, rowid, caption, file_name)
+                            VALUES ('delete', old.id, old.caption, old.file_name);
+                            INSERT INTO media_fts(rowid, caption, file_name)
+                            VALUES (new.id, new.caption, new.file_name);
+                        END
+                    """)
+                    if not fts_existed:
+                        # Base existante : indexer les légendes déjà présentes
+                        cursor.execute("INSERT INTO media_fts(media_fts) VALUES ('rebuild')")
+                    self.fts_available = True
+                except sqlite3.OperationalError as e:
+                    # SQLite compilé sans FTS5
+                    self.fts_available = False
+                    print(f"⚠️  FTS5 indisponible, recherche par légende en LIKE: {e}")
             
             conn.commit()
     
@@ -165,7 +241,72 @@ class MediaDatabase:
             result = cursor.fetchone()
             media_id = result['id'] if isinstance(result, dict) else result[0]
             return media_id
-    
+
+    def add_media_many(self, media_rows: List[Dict], page_size: int = 500) -> List[int]:
+        """
+        Ajoute plusieurs médias en une seule transaction (import en masse).
+
+        Args:
+            media_rows: Liste de dictionnaires avec les mêmes clés que add_media
+                        (file_path, file_name, media_type, file_size, mime_type, caption)
+            page_size: Nombre de lignes envoyées par requête PostgreSQL
+
+        Returns:
+            Liste des IDs créés, dans l'ordre de media_rows
+        """
+        if not media_rows:
+            return []
+
+        # Un même chemin ne peut apparaître qu'une fois par requête (ON CONFLICT),
+        # on garde la dernière occurrence comme le ferait une suite d'add_media
+        unique_rows = {}
+        for row in media_rows:
+            unique_rows[row['file_path']] = (
+                row['file_path'],
+                row['file_name'],
+                row['media_type'],
+                row.get('file_size'),
+                row.get('mime_type'),
+                row.get('caption')
+            )
+        values = list(unique_rows.values())
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+
+            if self.use_postgres:
+                returned = execute_values(cursor, """
+                    INSERT INTO media (file_path, file_name, media_type, file_size, mime_type, caption)
+                    VALUES %s
+                    ON CONFLICT (file_path) DO UPDATE SET
+                        updated_at = CURRENT_TIMESTAMP,
+                        caption = EXCLUDED.caption
+                    RETURNING id, file_path
+                """, values, page_size=page_size, fetch=True)
+            else:
+                cursor.executemany("""
+                    INSERT OR REPLACE INTO media (file_path, file_name, media_type, file_size, mime_type, caption, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                """, values)
+
+                # executemany ne renvoie pas les IDs : les relire par chemin
+                paths = list(unique_rows.keys())
+                returned = []
+                for start in range(0, len(paths), page_size):
+                    chunk = paths[start:start + page_size]
+                    placeholders = ",".join("?" * len(chunk))
+                    cursor.execute(f"SELECT id, file_path FROM media WHERE file_path IN ({placeholders})", chunk)
+                    returned.extend(cursor.fetchall())
+
+            ids_by_path = {}
+            for row in returned:
+                if isinstance(row, dict):
+                    ids_by_path[row['file_path']] = row['id']
+                else:
+                    ids_by_path[row[1]] = row[0]
+
+            return [ids_by_path[row['file_path']] for row in media_rows]
+
     def get_media(self, media_id: Optional[int] = None, file_path: Optional[str] = None) -> Optional[Dict]:
         """Récupère un média par ID ou chemin."""
         with self.get_connection() as conn:
@@ -215,6 +356,137 @@ class MediaDatabase:
             
             return [dict(row) if isinstance(row, dict) else dict(zip([col[0] for col in cursor.description], row)) for row in rows]
     
+    def search_captions(self, query: str, limit: int = 50,
+                        media_type: Optional[str] = None, offset: int = 0) -> List[Dict]:
+        """
+        Recherche plein texte dans les légendes et noms de fichiers, triée par pertinence
+        (à pertinence égale, par id décroissant : l'ordre est stable d'une page à l'autre).
+        
+        Args:
+            query: Requête texte (mots-clés, la syntaxe FTS est ignorée)
+            limit: Nombre maximum de résultats
+            media_type: Type de média à filtrer ('image', 'video', ou None)
+            offset: Nombre de résultats à sauter (pagination)
+            
+        Returns:
+            Liste de médias avec un champ "rank" (plus élevé = plus pertinent)
+        """
+        terms = _caption_terms(query)
+        if not terms:
+            return []
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            if self.use_postgres:
+                # Préfixes en OR : ts_rank favorise les légendes qui contiennent tous les termes
+                tsquery = " | ".join(f"{term}:*" for term in terms)
+                sql = f"""
+                    SELECT media.*, ts_rank({_PG_CAPTION_TSV}, to_tsquery('simple', %s))
+                """
+                params = [tsquery]
+                if self.trigram_available:
+                    sql += " + similarity(coalesce(caption, ''), %s)"
+                    params.append(query)
+                sql += f" AS rank FROM media WHERE ({_PG_CAPTION_TSV} @@ to_tsquery('simple', %s)"
+                params.append(tsquery)
+                if self.trigram_available:
+                    # Tolère les fautes de frappe (opérateur % de pg_trgm)
+                    sql += " OR caption %% %s"
+                    params.append(query)
+                sql += ")"
+                if media_type:
+                    sql += " AND media_type = %s"
+                    params.append(media_type)
+                sql += " ORDER BY rank DESC, media.id DESC LIMIT %s OFFSET %s"
+                params.extend([limit, offset])
+            elif self.fts_available:
+                # bm25() renvoie un score négatif (plus petit = meilleur)
+                match = " OR ".join(f'"{term}"*' for term in terms)
+                sql = """
+                    SELECT media.*, -bm25(media_fts) AS rank
+                    FROM media_fts JOIN media ON media.id = media_fts.rowid
+                    WHERE media_fts MATCH ?
+                """
+                params = [match]
+                if media_type:
+                    sql += " AND media.media_type = ?"
+                    params.append(media_type)
+                sql += " ORDER BY rank DESC, media.id DESC LIMIT ? OFFSET ?"
+                params.extend([limit, offset])
+            else:
+                # Fallback sans FTS5 : nombre de termes présents dans la légende
+                score = " + ".join("(lower(coalesce(caption, '')) LIKE ?)" for _ in terms)
+                sql = f"SELECT media.*, ({score}) AS rank FROM media WHERE ({score}) > 0"
+                params = [f"%{term}%" for term in terms] * 2
+                if media_type:
+                    sql += " AND media_type = ?"
+                    params.append(media_type)
+                sql += " ORDER BY rank DESC, media.id DESC LIMIT ? OFFSET ?"
+                params.extend([limit, offset])
+            
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            
+            return [dict(row) if isinstance(row, dict) else dict(zip([col[0] for col in cursor.description], row)) for row in rows]
+    
+    def list_media_page(self, limit: int = 100, cursor: Optional[str] = None,
+                        media_type: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Liste les médias par pagination keyset (created_at DESC, id DESC).
+        Contrairement à LIMIT/OFFSET, le coût d'une page ne dépend pas de sa profondeur.
+        
+        Args:
+            limit: Taille de la page
+            cursor: Curseur renvoyé par l'appel précédent (None pour la première page)
+            media_type: Type de média à filtrer ('image', 'video', ou None)
+            
+        Returns:
+            Tuple (médias de la page, curseur suivant ou None si dernière page)
+            
+        Raises:
+            ValueError: Si le curseur est invalide
+        """
+        placeholder = "%s" if self.use_postgres else "?"
+        conditions = []
+        params = []
+        
+        if media_type:
+            conditions.append(f"media_type = {placeholder}")
+            params.append(media_type)
+        
+        if cursor:
+            position = decode_cursor(cursor)
+            if "created_at" not in position or "id" not in position:
+                raise ValueError("Curseur invalide")
+            conditions.append(f"(created_at, id) < ({placeholder}, {placeholder})")
+            params.extend([position["created_at"], position["id"]])
+        
+        query = "SELECT * FROM media"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        # Une ligne de plus pour savoir s'il reste une page
+        query += f" ORDER BY created_at DESC, id DESC LIMIT {placeholder}"
+        params.append(limit + 1)
+        
+        with self.get_connection() as conn:
+            db_cursor = conn.cursor()
+            db_cursor.execute(query, params)
+            rows = db_cursor.fetchall()
+            media_list = [dict(row) if isinstance(row, dict) else dict(zip([col[0] for col in db_cursor.description], row)) for row in rows]
+        
+        next_cursor = None
+        if len(media_list) > limit:
+            media_list = media_list[:limit]
+            last = media_list[-1]
+            created_at = last["created_at"]
+            next_cursor = encode_cursor({
+                "created_at": created_at.isoformat() if hasattr(created_at, 'isoformat') else created_at,
+                "id": last["id"]
+            })
+        
+        return media_list, next_cursor
+    
     def add_embedding(self, media_id: int, embedding: bytes, frame_index: Optional[int] = None) -> int:
         """Ajoute un embedding."""
         with self.get_connection() as conn:
@@ -236,7 +508,50 @@ class MediaDatabase:
             result = cursor.fetchone()
             embedding_id = result['id'] if isinstance(result, dict) else result[0]
             return embedding_id
-    
+
+    def add_embeddings_many(self, embedding_rows: List[Dict], page_size: int = 500) -> List[int]:
+        """
+        Ajoute plusieurs embeddings en une seule transaction (ex: toutes les frames d'une vidéo).
+
+        Args:
+            embedding_rows: Liste de dictionnaires avec media_id, embedding et frame_index (optionnel)
+            page_size: Nombre de lignes envoyées par requête PostgreSQL
+
+        Returns:
+            Liste des IDs créés, dans l'ordre de embedding_rows
+        """
+        if not embedding_rows:
+            return []
+
+        values = [
+            (row['media_id'], row['embedding'], row.get('frame_index'))
+            for row in embedding_rows
+        ]
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+
+            if self.use_postgres:
+                returned = execute_values(cursor, """
+                    INSERT INTO embeddings (media_id, embedding, frame_index)
+                    VALUES %s
+                    RETURNING id
+                """, values, page_size=page_size, fetch=True)
+                return [row['id'] if isinstance(row, dict) else row[0] for row in returned]
+
+            cursor.executemany("""
+                INSERT INTO embeddings (media_id, embedding, frame_index)
+                VALUES (?, ?, ?)
+            """, values)
+
+            # La transaction garde le verrou d'écriture : les IDs AUTOINCREMENT
+            # de ce lot sont donc contigus et se terminent au dernier rowid
+            cursor.execute("SELECT last_insert_rowid() as id")
+            result = cursor.fetchone()
+            last_id = result['id'] if isinstance(result, dict) else result[0]
+            first_id = last_id - len(values) + 1
+            return list(range(first_id, last_id + 1))
+
     def get_embeddings(self, media_id: int) -> List[Dict]:
         """Récupère les embeddings d'un média."""
         with self.get_connection() as conn:
@@ -0,0 +1,132 @@
+"""
+Exécuteurs bornés pour les étapes coûteuses de l'API (inférence, vignettes, indexation).
+Le nombre de tâches en cours et en attente est limité : au-delà, la requête est refusée
+tout de suite (503) au lieu d'occuper un thread du serveur, et une tâche trop longue
+rend la main au client (504). Les threads du serveur restent ainsi disponibles pour
+les requêtes légères (santé, listing, fichiers).
+Des threads plutôt que des processus : torch, FAISS et PIL libèrent le GIL, et les
+modèles ne sont pas dupliqués en mémoire.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from typing import Callable, Optional
+
+
+class ExecutorOverloaded(Exception):
+    """Trop de tâches en cours ou en attente (à renvoyer en 503)."""
+
+
+class ExecutorTimeout(Exception):
+    """La tâche n'a pas terminé dans le délai (à renvoyer en 504)."""
+
+
+class BoundedExecutor:
+    """Pool de threads avec file d'attente bornée et délai d'attente par tâche."""
+
+    def __init__(self, name: str, max_workers: int = 1, max_pending: int = 2, timeout: Optional[float] = 30.0):
+        """
+        Initialise le pool.
+
+        Args:
+            name: Nom du pool (préfixe des threads, messages d'erreur)
+            max_workers: Nombre de tâches exécutées en parallèle
+            max_pending: Nombre de tâches pouvant attendre un worker
+            timeout: Délai d'attente du résultat par défaut (secondes, None pour illimité)
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Planifie une tâche sans attendre son résultat.
+
+        Raises:
+            ExecutorOverloaded: Si le pool et sa file d'attente sont pleins
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorOverloaded(f"Serveur occupé ({self.name}), réessayez dans quelques secondes")
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_flight += 1
+        future.add_done_callback(self._on_done)
+        return future
+
+    def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        Exécute une tâche dans le pool et attend son résultat.
+        Une tâche expirée continue jusqu'au bout et garde sa place dans le pool :
+        la charge réelle reste donc bornée.
+
+        Args:
+            fn: Fonction à exécuter
+            timeout: Délai d'attente (défaut: celui du pool)
+
+        Returns:
+            Résultat de fn
+
+        Raises:
+            ExecutorOverloaded: Si le pool et sa file d'attente sont pleins
+            ExecutorTimeout: Si le résultat n'est pas disponible dans le délai
+        """
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=timeout if timeout is not None else self.timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise ExecutorTimeout(f"Délai dépassé ({self.name})")
+
+    def _on_done(self, future: Future):
+        self._slots.release()
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self) -> dict:
+        """Compteurs du pool (pour /api/health)."""
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "capacity": self.max_workers + self.max_pending,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts
+            }
+
+
+def executor_from_env(name: str, max_workers: int, max_pending: int, timeout: Optional[float]) -> BoundedExecutor:
+    """
+    Crée un BoundedExecutor configurable par variables d'environnement
+    (<NAME>_WORKERS, <NAME>_MAX_PENDING, <NAME>_TIMEOUT ; ex: SEARCH_WORKERS).
+
+    Args:
+        name: Nom du pool
+        max_workers: Nombre de workers par défaut
+        max_pending: Taille de la file d'attente par défaut
+        timeout: Délai par défaut (secondes, None pour illimité)
+
+    Returns:
+        Instance de BoundedExecutor
+    """
+    prefix = name.upper()
+    env_timeout = os.environ.get(f'{prefix}_TIMEOUT')
+    return BoundedExecutor(
+        name,
+        max_workers=int(os.environ.get(f'{prefix}_WORKERS', max_workers)),
+        max_pending=int(os.environ.get(f'{prefix}_MAX_PENDING', max_pending)),
+        timeout=float(env_timeout) if env_timeout else timeout
+    )
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+Détection des quasi-doublons (rafales, photos ré-uploadées) de toute la bibliothèque.
+Utilise les vecteurs CLIP déjà présents dans l'index FAISS (aucun ré-encodage) et écrit
+le rapport servi par /api/duplicates (metadata_duplicates.json).
+"""
+
+import os
+# Fix pour OpenMP sur macOS - DOIT être au tout début
+os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
+
+import argparse
+
+from core.duplicates import detect_duplicates, DEFAULT_DUPLICATE_THRESHOLD, DEFAULT_DUPLICATE_NEIGHBOURS
+
+
+def main():
+    """Fonction principale."""
+    parser = argparse.ArgumentParser(
+        description="Regrouper les médias quasi identiques de l'index"
+    )
+    parser.add_argument(
+        "--index",
+        type=str,
+        default="index.faiss",
+        help="Chemin vers l'index FAISS (défaut: index.faiss)"
+    )
+    parser.add_argument(
+        "--metadata",
+        type=str,
+        default="metadata.json",
+        help="Chemin vers les métadonnées (défaut: metadata.json)"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_DUPLICATE_THRESHOLD,
+        help=f"Similarité cosinus minimale (défaut: DUPLICATE_THRESHOLD ou {DEFAULT_DUPLICATE_THRESHOLD})"
+    )
+    parser.add_argument(
+        "--neighbours",
+        type=int,
+        default=DEFAULT_DUPLICATE_NEIGHBOURS,
+        help=f"Voisins examinés par média (défaut: DUPLICATE_NEIGHBOURS ou {DEFAULT_DUPLICATE_NEIGHBOURS})"
+    )
+    parser.add_argument(
+        "--show",
+        type=int,
+        default=10,
+        help="Nombre de groupes à afficher (défaut: 10)"
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.index) or not os.path.exists(args.metadata):
+        print(f"❌ {args.index} ou {args.metadata} introuvable")
+        return
+
+    report = detect_duplicates(args.index, args.metadata, threshold=args.threshold, neighbours=args.neighbours)
+    for group in report["groups"][:args.show]:
+        print(f"\n📎 {group['size']} {group['media_type']}(s), similarité {group['min_similarity']:.3f}-{group['max_similarity']:.3f}")
+        for file_path in group["files"]:
+            print(f"   - {file_path}")
+
+
+if __name__ == "__main__":
+    main()
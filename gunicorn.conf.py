@@ -0,0 +1,54 @@
+"""
+Configuration gunicorn pour l'API (voir wsgi.py).
+
+Variables d'environnement :
+    PORT               Port d'écoute (défaut: 5001)
+    WEB_CONCURRENCY    Nombre de workers (défaut: 2 ; caches mémoire par worker, voir plus bas)
+    GUNICORN_THREADS   Threads par worker (défaut: 4)
+    GUNICORN_TIMEOUT   Timeout d'une requête en secondes (défaut: 120)
+"""
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', os.environ.get('FLASK_PORT', 5001))}"
+
+# Chaque worker est un processus : le modèle n'est chargé qu'une fois grâce à preload_app,
+# les threads servent les requêtes I/O (listing, fichiers) pendant une inférence.
+#
+# État partagé entre workers (disque) : index FAISS et métadonnées (verrou fcntl pendant
+# les écritures), vignettes et leur index.json (fusionné à chaque sauvegarde), listes de
+# résultats paginées (SEARCH_CACHE_DIR), cache d'embeddings/légendes (SQLite).
+# État propre à chaque worker (mémoire, non partagé) :
+#   - ThumbnailBytesCache : THUMBNAIL_CACHE_BYTES par worker, réchauffé séparément ;
+#   - MediaFileInfoCache, cache des scores du Cross-Encoder, couche mémoire du cache de recherche ;
+#   - pools bornés (SEARCH_*, THUMBNAIL_*, INDEXING_*...) : capacité multipliée par le nombre de workers ;
+#   - télémétrie du rerank et compteurs de /api/health (ceux du worker qui répond) ;
+#   - UploadDuplicateChecker : les doublons au sein d'envois simultanés reçus par deux
+#     workers différents ne sont vus qu'après rechargement de l'index.
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = "gthread"
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Charger l'application (index + modèles) dans le maître, avant le fork
+preload_app = True
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    # Geler les objets déjà chargés : le ramasse-miettes des workers ne les touche plus,
+    # ce qui évite de dupliquer leurs pages mémoire partagées (copie sur écriture)
+    gc.freeze()
+    server.log.info(f"🚀 {workers} worker(s) x {threads} thread(s), modèles préchargés")
+
+
+def post_fork(server, worker):
+    # Passe à vide dans chaque worker, en arrière-plan (pas dans le maître : le pool
+    # de threads OpenMP de torch ne survit pas au fork). Readiness : /api/health/ready
+    from wsgi import start_warm_up
+    start_warm_up()
@@ -0,0 +1,271 @@
+"""
+Service des fichiers médias (images et vidéos) avec requêtes Range.
+Les métadonnées (taille, type MIME, ETag) sont calculées une fois par fichier, et le corps
+de la réponse passe par wsgi.file_wrapper : sous gunicorn, même une plage est envoyée
+avec sendfile (zéro copie). Avec nginx devant l'API, MEDIA_ACCEL_ROOT / MEDIA_ACCEL_PREFIX
+délèguent entièrement l'envoi à nginx (X-Accel-Redirect), sans occuper de worker Python.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from flask import Response, request
+
+MIME_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.mp4': 'video/mp4',
+    '.mov': 'video/quicktime',
+    '.avi': 'video/x-msvideo',
+    '.mkv': 'video/x-matroska',
+    '.webm': 'video/webm',
+}
+
+MEDIA_CACHE_CONTROL = "private, max-age=3600"
+# Taille des blocs quand le serveur WSGI n'envoie pas lui-même le fichier
+READ_CHUNK_SIZE = 256 * 1024
+
+# Délégation à nginx : dossier servi et location interne correspondante
+MEDIA_ACCEL_ROOT = os.environ.get('MEDIA_ACCEL_ROOT')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class MediaFileInfo:
+    """Métadonnées d'un fichier média nécessaires pour le servir."""
+
+    __slots__ = ("path", "size", "mtime_ns", "mime_type", "etag")
+
+    def __init__(self, path: str, size: int, mtime_ns: int, mime_type: str):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.mime_type = mime_type
+        self.etag = f'"{mtime_ns:x}-{size:x}"'
+
+
+class MediaFileInfoCache:
+    """
+    Cache LRU des métadonnées de fichiers (taille, mtime, MIME, ETag).
+    Peut être pré-rempli au chargement de l'index ; une entrée est recalculée
+    si le fichier a changé depuis.
+    """
+
+    def __init__(self, max_entries: int = 50000):
+        """
+        Initialise le cache.
+
+        Args:
+            max_entries: Nombre maximum de fichiers gardés en mémoire
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, MediaFileInfo]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _stat(self, file_path: str) -> Optional[MediaFileInfo]:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        ext = os.path.splitext(file_path)[1].lower()
+        return MediaFileInfo(file_path, stat.st_size, stat.st_mtime_ns,
+                             MIME_TYPES.get(ext, 'application/octet-stream'))
+
+    def _put(self, info: MediaFileInfo):
+        with self._lock:
+            self._entries[info.path] = info
+            self._entries.move_to_end(info.path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def prime(self, file_paths: Iterable[str]) -> int:
+        """
+        Pré-calcule les métadonnées d'une liste de fichiers (ex: médias de l'index).
+
+        Args:
+            file_paths: Chemins des fichiers
+
+        Returns:
+            Nombre de fichiers trouvés
+        """
+        count = 0
+        for file_path in file_paths:
+            info = self._stat(file_path)
+            if info is not None:
+                self._put(info)
+                count += 1
+        return count
+
+    def get(self, file_path: str) -> Optional[MediaFileInfo]:
+        """
+        Retourne les métadonnées d'un fichier, ou None s'il n'existe pas.
+
+        Args:
+            file_path: Chemin du fichier
+
+        Returns:
+            MediaFileInfo ou None
+        """
+        with self._lock:
+            info = self._entries.get(file_path)
+            if info is not None:
+                self._entries.move_to_end(file_path)
+        if info is not None:
+            try:
+                stat = os.stat(file_path)
+                if stat.st_size == info.size and stat.st_mtime_ns == info.mtime_ns:
+                    return info
+            except OSError:
+                with self._lock:
+                    self._entries.pop(file_path, None)
+                return None
+        info = self._stat(file_path)
+        if info is not None:
+            self._put(info)
+        return info
+
+    def clear(self):
+        """Vide le cache (ex: après réindexation)."""
+        with self._lock:
+            self._entries.clear()
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Interprète un en-tête Range à une seule plage.
+
+    Args:
+        range_header: Valeur de l'en-tête (ex: "bytes=0-1023", "bytes=-500")
+        size: Taille du fichier
+
+    Returns:
+        Tuple (début, fin incluse), None si l'en-tête est absent ou non géré
+        (plages multiples : tout le fichier est renvoyé)
+
+    Raises:
+        ValueError: Si la plage est hors du fichier (réponse 416)
+    """
+    if not range_header:
+        return None
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        return None
+    start_text, end_text = match.groups()
+    if not start_text and not end_text:
+        return None
+    if not start_text:
+        # Suffixe : les N derniers octets
+        length = int(end_text)
+        if length == 0:
+            raise ValueError("Plage vide")
+        return max(0, size - length), size - 1
+    start = int(start_text)
+    end = int(end_text) if end_text else size - 1
+    if start >= size or end < start:
+        raise ValueError("Plage hors du fichier")
+    return start, min(end, size - 1)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Indique si l'en-tête If-None-Match désigne cet ETag (réponse 304).
+    Comparaison faible : les préfixes W/ sont ignorés, "*" désigne toute version.
+
+    Args:
+        if_none_match: Valeur de l'en-tête (ex: '"a1-2f", W/"b2-30"')
+        etag: ETag de la ressource, entre guillemets
+
+    Returns:
+        True si l'un des ETags de la liste est égal à celui de la ressource
+    """
+    if not if_none_match:
+        return False
+    etag = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _read_range(f, start: int, length: int) -> Iterable[bytes]:
+    try:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def send_media_file(info: MediaFileInfo) -> Response:
+    """
+    Construit la réponse Flask pour un fichier média (200, 206, 304 ou 416).
+
+    Args:
+        info: Métadonnées du fichier (MediaFileInfoCache.get)
+
+    Returns:
+        Réponse Flask
+    """
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': info.etag,
+        'Cache-Control': MEDIA_CACHE_CONTROL,
+    }
+
+    if etag_matches(request.headers.get('If-None-Match'), info.etag):
+        return Response(status=304, headers=headers)
+
+    # nginx sert le fichier lui-même (plages, sendfile) : aucun worker Python occupé
+    if MEDIA_ACCEL_ROOT:
+        root = os.path.abspath(MEDIA_ACCEL_ROOT)
+        abs_path = os.path.abspath(info.path)
+        if abs_path.startswith(root + os.sep):
+            relative = os.path.relpath(abs_path, root).replace(os.sep, '/')
+            headers['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + relative
+            return Response(status=200, mimetype=info.mime_type, headers=headers)
+
+    # If-Range : une plage n'est valable que si le fichier n'a pas changé
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range == info.etag:
+        try:
+            byte_range = parse_range(request.headers.get('Range'), info.size)
+        except ValueError:
+            headers['Content-Range'] = f"bytes */{info.size}"
+            return Response(status=416, headers=headers)
+
+    start, end = byte_range if byte_range else (0, info.size - 1)
+    length = max(0, end - start + 1)
+    status = 206 if byte_range else 200
+    if byte_range:
+        headers['Content-Range'] = f"bytes {start}-{end}/{info.size}"
+    headers['Content-Length'] = str(length)
+
+    f = open(info.path, 'rb')
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    # gunicorn borne l'envoi à Content-Length depuis la position courante (sendfile) ;
+    # ailleurs, lecture par blocs bornée à la plage
+    if file_wrapper is not None and (not byte_range or request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn')):
+        f.seek(start)
+        body = file_wrapper(f, READ_CHUNK_SIZE)
+    else:
+        body = _read_range(f, start, length)
+
+    return Response(body, status=status, mimetype=info.mime_type, headers=headers, direct_passthrough=True)
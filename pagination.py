@@ -0,0 +1,194 @@
+"""
+Utilitaires de pagination par curseur (listing des médias et résultats de recherche).
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import base64
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+
+def encode_cursor(position: Dict) -> str:
+    """
+    Encode une position de pagination en curseur opaque (base64 URL-safe).
+
+    Args:
+        position: Dictionnaire sérialisable en JSON (ex: {"created_at": ..., "id": ...})
+
+    Returns:
+        Curseur opaque
+    """
+    raw = json.dumps(position, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Dict:
+    """
+    Décode un curseur produit par encode_cursor.
+
+    Args:
+        cursor: Curseur opaque
+
+    Returns:
+        Dictionnaire de position
+
+    Raises:
+        ValueError: Si le curseur est invalide
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception as e:
+        raise ValueError(f"Curseur invalide: {e}")
+    if not isinstance(position, dict):
+        raise ValueError("Curseur invalide")
+    return position
+
+
+class SearchResultCache:
+    """
+    Cache LRU (avec expiration) des listes de résultats classés, pour paginer une recherche.
+    Avec cache_dir, chaque liste est aussi écrite sur disque (un fichier JSON par recherche) :
+    sous gunicorn, la page suivante peut arriver dans un autre worker, qui la relit du disque.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl_seconds: float = 600.0, cache_dir: Optional[str] = None):
+        """
+        Initialise le cache.
+
+        Args:
+            max_entries: Nombre maximum de recherches gardées (en mémoire et sur disque)
+            ttl_seconds: Durée de vie d'une recherche en cache (secondes)
+            cache_dir: Dossier partagé entre processus (None : mémoire du processus seulement)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = cache_dir
+        self._entries: "OrderedDict[str, Tuple[float, Optional[str], List[Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, search_id: str) -> Optional[str]:
+        # L'identifiant vient d'un curseur fourni par le client : uniquement des hexadécimaux
+        if not self.cache_dir or not re.fullmatch(r"[0-9a-f]{32}", search_id):
+            return None
+        return os.path.join(self.cache_dir, f"{search_id}.json")
+
+    def put(self, results: List[Dict], version: Optional[str] = None) -> str:
+        """
+        Stocke une liste de résultats classés et retourne son identifiant.
+
+        Args:
+            results: Liste de résultats (sérialisable en JSON si cache_dir est défini)
+            version: Version de l'index qui a produit les résultats (voir get)
+        """
+        search_id = uuid.uuid4().hex
+        created = time.time()
+        with self._lock:
+            self._entries[search_id] = (created, version, results)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        entry_path = self._entry_path(search_id)
+        if entry_path:
+            try:
+                tmp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({"created": created, "version": version, "results": results}, f,
+                              ensure_ascii=False, default=str)
+                os.replace(tmp_path, entry_path)
+                self._prune_disk()
+            except OSError as e:
+                print(f"⚠️  Erreur lors de l'écriture du cache de recherche: {e}")
+        return search_id
+
+    def get(self, search_id: str, version: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        Retourne la liste de résultats, ou None si inconnue, expirée ou produite par
+        une autre version de l'index.
+        """
+        with self._lock:
+            entry = self._entries.get(search_id)
+            if entry is not None:
+                self._entries.move_to_end(search_id)
+        if entry is None:
+            entry = self._read_disk(search_id)
+            if entry is None:
+                return None
+            with self._lock:
+                self._entries[search_id] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        created, entry_version, results = entry
+        if time.time() - created > self.ttl_seconds or entry_version != version:
+            with self._lock:
+                self._entries.pop(search_id, None)
+            return None
+        return results
+
+    def _read_disk(self, search_id: str) -> Optional[Tuple[float, Optional[str], List[Dict]]]:
+        entry_path = self._entry_path(search_id)
+        if not entry_path:
+            return None
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return float(data["created"]), data.get("version"), data["results"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _prune_disk(self):
+        """Supprime les recherches expirées et les plus anciennes au-delà de max_entries."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        entries.sort(reverse=True)
+        now = time.time()
+        for rank, (mtime, path) in enumerate(entries):
+            # Fichiers temporaires d'une écriture en cours : laissés tant qu'ils sont récents
+            if rank >= self.max_entries or now - mtime > self.ttl_seconds:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        """Vide le cache (mémoire et disque)."""
+        with self._lock:
+            self._entries.clear()
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+
+def paginate_cached(results: List[Dict], search_id: str, offset: int, limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Découpe une page d'une liste en cache et calcule le curseur suivant.
+
+    Args:
+        results: Liste complète de résultats classés
+        search_id: Identifiant de la recherche dans le cache
+        offset: Position de début de la page
+        limit: Taille de la page
+
+    Returns:
+        Tuple (page de résultats, curseur suivant ou None si dernière page)
+    """
+    page = results[offset:offset + limit]
+    next_offset = offset + len(page)
+    next_cursor = None
+    if next_offset < len(results):
+        next_cursor = encode_cursor({"search_id": search_id, "offset": next_offset})
+    return page, next_cursor
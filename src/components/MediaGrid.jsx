@@ -1,14 +1,56 @@
-import React, { useState } from 'react'
+import React, { useState, useEffect, useRef } from 'react'
 import { motion } from 'framer-motion'
 import { Play } from 'lucide-react'
 
-const MediaGrid = ({ media = [], onMediaClick }) => {
+const MediaGrid = ({ media = [], onMediaClick, onLoadMore, hasMore = false }) => {
   const [loadedImages, setLoadedImages] = useState(new Set())
+  // Survol d'une vidéo : { index, frames, frame } (planche chargée à la demande)
+  const [scrub, setScrub] = useState(null)
+  const sentinelRef = useRef(null)
+
+  // Scroll infini : charger la page suivante quand le bas de la grille devient visible
+  useEffect(() => {
+    if (!onLoadMore || !hasMore || !sentinelRef.current) {
+      return
+    }
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting) {
+        onLoadMore()
+      }
+    }, { rootMargin: '400px' })
+    observer.observe(sentinelRef.current)
+    return () => observer.disconnect()
+  }, [onLoadMore, hasMore, media.length])
 
   const handleImageLoad = (index) => {
     setLoadedImages(prev => new Set([...prev, index]))
   }
 
+  const handleVideoHover = (event, item, index) => {
+    if (!item.sprite) {
+      return
+    }
+    const rect = event.currentTarget.getBoundingClientRect()
+    const ratio = Math.min(0.999, Math.max(0, (event.clientX - rect.left) / rect.width))
+    if (scrub && scrub.index === index) {
+      if (scrub.frames > 0) {
+        const frame = Math.floor(ratio * scrub.frames)
+        if (frame !== scrub.frame) {
+          setScrub({ ...scrub, frame })
+        }
+      }
+      return
+    }
+    // Charger la planche : nombre de frames = largeur / hauteur (vignettes carrées)
+    setScrub({ index, frames: 0, frame: 0 })
+    const sprite = new Image()
+    sprite.onload = () => {
+      const frames = Math.max(1, Math.round(sprite.naturalWidth / sprite.naturalHeight))
+      setScrub(prev => (prev && prev.index === index ? { index, frames, frame: Math.floor(ratio * frames) } : prev))
+    }
+    sprite.src = item.sprite
+  }
+
   const handleClick = (item, index) => {
     if (onMediaClick) {
       // Passer l'item et la liste complète de médias
@@ -30,13 +72,15 @@ const MediaGrid = ({ media = [], onMediaClick }) => {
               animate={{ opacity: 1, scale: 1 }}
               transition={{ 
                 duration: 0.3, 
-                delay: index * 0.02,
+                delay: Math.min(index, 30) * 0.02,
                 ease: [0.4, 0, 0.2, 1]
               }}
               whileHover={{ scale: 1.02 }}
               whileTap={{ scale: 0.98 }}
               className="relative aspect-square bg-gray-200 rounded-none overflow-hidden cursor-pointer group"
               onClick={() => handleClick(item, index)}
+              onMouseMove={isVideo ? (event) => handleVideoHover(event, item, index) : undefined}
+              onMouseLeave={isVideo ? () => setScrub(null) : undefined}
             >
               {item.thumbnail ? (
                 <>
@@ -59,6 +103,17 @@ const MediaGrid = ({ media = [], onMediaClick }) => {
                 </div>
               )}
               
+              {isVideo && scrub && scrub.index === index && scrub.frames > 0 && (
+                <div
+                  className="absolute inset-0 bg-black bg-no-repeat"
+                  style={{
+                    backgroundImage: `url(${item.sprite})`,
+                    backgroundSize: `${scrub.frames * 100}% 100%`,
+                    backgroundPosition: `${scrub.frames > 1 ? (scrub.frame / (scrub.frames - 1)) * 100 : 0}% 0`
+                  }}
+                />
+              )}
+              
               {isVideo && (
                 <div className="absolute inset-0 flex items-center justify-center bg-black/20 group-hover:bg-black/30 transition-colors">
                   <div className="w-12 h-12 rounded-full bg-white/80 flex items-center justify-center backdrop-blur-sm">
@@ -70,6 +125,7 @@ const MediaGrid = ({ media = [], onMediaClick }) => {
           )
         })}
       </div>
+      {hasMore && <div ref={sentinelRef} className="h-px" />}
     </div>
   )
 }
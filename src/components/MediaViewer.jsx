@@ -145,7 +145,7 @@ const MediaViewer = ({ media, currentIndex, onClose, onNext, onPrevious }) => {
               animate={{ opacity: 1, scale: 1 }}
               exit={{ opacity: 0, scale: 0.9 }}
               transition={{ duration: 0.3, ease: [0.4, 0, 0.2, 1] }}
-              src={mediaService.getMediaFileUrl(currentMedia.path)}
+              src={mediaService.getMediaFileUrl(currentMedia.path, currentMedia.timestamp)}
               poster={currentMedia.thumbnail}
               controls
               className="max-w-full max-h-full object-contain"
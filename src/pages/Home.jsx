@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useCallback, useRef } from 'react'
 import { motion } from 'framer-motion'
 import MediaGrid from '../components/MediaGrid'
 import SearchBar from '../components/SearchBar'
@@ -7,6 +7,8 @@ import PhotoPicker from '../components/PhotoPicker'
 const Home = ({ onSearch, onMediaClick, mediaService, onMediaListUpdate }) => {
   const [media, setMedia] = useState([])
   const [loading, setLoading] = useState(true)
+  const [nextCursor, setNextCursor] = useState(null)
+  const loadingMore = useRef(false)
 
   useEffect(() => {
     loadInitialMedia()
@@ -21,8 +23,9 @@ const Home = ({ onSearch, onMediaClick, mediaService, onMediaListUpdate }) => {
   const loadInitialMedia = async () => {
     try {
       setLoading(true)
-      const initialMedia = await mediaService.getInitialMedia(9)
-      setMedia(initialMedia)
+      const page = await mediaService.getMediaPage(30)
+      setMedia(page.media)
+      setNextCursor(page.nextCursor)
     } catch (error) {
       console.error('Erreur lors du chargement des médias:', error)
     } finally {
@@ -30,6 +33,20 @@ const Home = ({ onSearch, onMediaClick, mediaService, onMediaListUpdate }) => {
     }
   }
 
+  const loadMoreMedia = useCallback(async () => {
+    if (!nextCursor || loadingMore.current) {
+      return
+    }
+    loadingMore.current = true
+    try {
+      const page = await mediaService.getMediaPage(30, nextCursor)
+      setMedia(prev => [...prev, ...page.media])
+      setNextCursor(page.nextCursor)
+    } finally {
+      loadingMore.current = false
+    }
+  }, [nextCursor, mediaService])
+
   const handleSearch = async (query) => {
     if (onSearch) {
       onSearch(query)
@@ -56,7 +73,12 @@ const Home = ({ onSearch, onMediaClick, mediaService, onMediaListUpdate }) => {
           />
         </div>
       ) : (
-        <MediaGrid media={media} onMediaClick={onMediaClick} />
+        <MediaGrid
+          media={media}
+          onMediaClick={onMediaClick}
+          onLoadMore={loadMoreMedia}
+          hasMore={Boolean(nextCursor)}
+        />
       )}
 
       <PhotoPicker onUploadComplete={handleUploadComplete} />
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useCallback, useRef } from 'react'
 import { motion } from 'framer-motion'
 import { Search as SearchIcon } from 'lucide-react'
 import MediaGrid from '../components/MediaGrid'
@@ -8,6 +8,9 @@ const Search = ({ onSearch, onMediaClick, mediaService, searchQuery, onMediaList
   const [results, setResults] = useState([])
   const [loading, setLoading] = useState(false)
   const [hasSearched, setHasSearched] = useState(false)
+  const [nextCursor, setNextCursor] = useState(null)
+  const [total, setTotal] = useState(0)
+  const loadingMore = useRef(false)
 
   useEffect(() => {
     if (searchQuery) {
@@ -24,6 +27,7 @@ const Search = ({ onSearch, onMediaClick, mediaService, searchQuery, onMediaList
   const performSearch = async (query) => {
     if (!query || !query.trim()) {
       setResults([])
+      setNextCursor(null)
       setHasSearched(false)
       return
     }
@@ -31,16 +35,33 @@ const Search = ({ onSearch, onMediaClick, mediaService, searchQuery, onMediaList
     try {
       setLoading(true)
       setHasSearched(true)
-      const searchResults = await mediaService.searchMedia(query)
-      setResults(searchResults)
+      const page = await mediaService.searchMediaPage(query)
+      setResults(page.results)
+      setNextCursor(page.nextCursor)
+      setTotal(page.total)
     } catch (error) {
       console.error('Erreur lors de la recherche:', error)
       setResults([])
+      setNextCursor(null)
     } finally {
       setLoading(false)
     }
   }
 
+  const loadMoreResults = useCallback(async () => {
+    if (!nextCursor || loadingMore.current) {
+      return
+    }
+    loadingMore.current = true
+    try {
+      const page = await mediaService.searchMediaPage(searchQuery, {}, nextCursor)
+      setResults(prev => [...prev, ...page.results])
+      setNextCursor(page.nextCursor)
+    } finally {
+      loadingMore.current = false
+    }
+  }, [nextCursor, searchQuery, mediaService])
+
   const handleSearch = (query) => {
     performSearch(query)
     if (onSearch) {
@@ -75,9 +96,14 @@ const Search = ({ onSearch, onMediaClick, mediaService, searchQuery, onMediaList
       ) : results.length > 0 ? (
         <div className="mt-2">
           <p className="text-gray-600 text-sm px-3 mb-2">
-            {results.length} résultat{results.length > 1 ? 's' : ''} trouvé{results.length > 1 ? 's' : ''}
+            {total} résultat{total > 1 ? 's' : ''} trouvé{total > 1 ? 's' : ''}
           </p>
-          <MediaGrid media={results} onMediaClick={onMediaClick} />
+          <MediaGrid
+            media={results}
+            onMediaClick={onMediaClick}
+            onLoadMore={loadMoreResults}
+            hasMore={Boolean(nextCursor)}
+          />
         </div>
       ) : (
         <div className="flex flex-col items-center justify-center py-20 px-4">
@@ -23,6 +23,30 @@ export const mediaService = {
     }
   },
 
+  /**
+   * Récupère une page de médias (pagination par curseur pour le scroll infini)
+   */
+  async getMediaPage(limit = 30, cursor = null) {
+    try {
+      const params = new URLSearchParams({ limit })
+      if (cursor) {
+        params.set('cursor', cursor)
+      }
+      const response = await fetch(`${API_BASE_URL}/media/initial?${params}`)
+      if (!response.ok) {
+        throw new Error('Erreur lors du chargement des médias')
+      }
+      const data = await response.json()
+      return {
+        media: this.formatMedia(data.media || []),
+        nextCursor: data.next_cursor || null
+      }
+    } catch (error) {
+      console.error('Erreur getMediaPage:', error)
+      return { media: [], nextCursor: null }
+    }
+  },
+
   /**
    * Recherche des médias par requête texte
    */
@@ -53,6 +77,41 @@ export const mediaService = {
     }
   },
 
+  /**
+   * Recherche paginée : première page (sans curseur) puis pages suivantes via nextCursor
+   */
+  async searchMediaPage(query, options = {}, cursor = null) {
+    try {
+      const response = await fetch(`${API_BASE_URL}/search`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          query,
+          top_k: options.top_k || 24,
+          use_query_expansion: options.use_query_expansion !== false,
+          ...options,
+          cursor
+        }),
+      })
+
+      if (!response.ok) {
+        throw new Error('Erreur lors de la recherche')
+      }
+
+      const data = await response.json()
+      return {
+        results: this.formatMedia(data.results || []),
+        nextCursor: data.next_cursor || null,
+        total: data.total ?? (data.results || []).length
+      }
+    } catch (error) {
+      console.error('Erreur searchMediaPage:', error)
+      return { results: [], nextCursor: null, total: 0 }
+    }
+  },
+
   /**
    * Formate les médias pour l'affichage
    */
@@ -65,6 +124,9 @@ export const mediaService = {
         type: isVideo ? 'video' : 'image',
         caption: item.caption || '',
         thumbnail: this.getThumbnailUrl(item.file_path || item.path, isVideo),
+        sprite: isVideo ? this.getSpriteUrl(item.file_path || item.path) : null,
+        // Résultat de recherche vidéo : moment de la frame trouvée (secondes)
+        timestamp: isVideo && item.meta ? (item.meta.timestamp ?? null) : null,
         score: item.score || 0,
         meta: item
       }
@@ -82,12 +144,22 @@ export const mediaService = {
     return `${baseUrl}/api/thumbnail?path=${encodeURIComponent(filePath)}&type=image`
   },
 
+  /**
+   * Génère l'URL de la planche de survol d'une vidéo (frames côte à côte)
+   */
+  getSpriteUrl(filePath) {
+    const baseUrl = API_BASE_URL.replace('/api', '') || ''
+    return `${baseUrl}/api/thumbnail?path=${encodeURIComponent(filePath)}&type=video&variant=sprite`
+  },
+
   /**
    * Génère l'URL du fichier média (pour lecture vidéo)
    */
-  getMediaFileUrl(filePath) {
+  getMediaFileUrl(filePath, timestamp = null) {
     const baseUrl = API_BASE_URL.replace('/api', '') || ''
-    return `${baseUrl}/api/media/file?path=${encodeURIComponent(filePath)}`
+    const url = `${baseUrl}/api/media/file?path=${encodeURIComponent(filePath)}`
+    // Fragment média (#t=) : le lecteur démarre directement au moment trouvé
+    return timestamp != null ? `${url}#t=${timestamp}` : url
   },
 
   /**
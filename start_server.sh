@@ -4,4 +4,5 @@ LIBSTDCPP_PATH=$(dirname $(find /nix/store -name 'libstdc++.so.6' | head -n 1 ||
 if [ -n "${LIBSTDCPP_PATH}" ]; then
   export LD_LIBRARY_PATH="${LIBSTDCPP_PATH}:${LD_LIBRARY_PATH:-}"
 fi
-python api_server_cloud.py
+# Production : gunicorn multi-workers, modèles préchargés avant le fork (gunicorn.conf.py)
+exec gunicorn -c gunicorn.conf.py wsgi:app
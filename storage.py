@@ -5,6 +5,8 @@ Support pour stockage local, S3, et Cloudinary.
 
 import os
 import io
+import hashlib
+import tempfile
 from pathlib import Path
 from typing import Optional, BinaryIO, Tuple
 from datetime import datetime
@@ -13,6 +15,7 @@ import uuid
 # Support S3
 try:
     import boto3
+    from boto3.s3.transfer import TransferConfig
     from botocore.exceptions import ClientError
     S3_AVAILABLE = True
 except ImportError:
@@ -27,6 +30,41 @@ try:
 except ImportError:
     CLOUDINARY_AVAILABLE = False
 
+# Taille des blocs lus depuis l'upload : la mémoire par upload reste bornée
+CHUNK_SIZE = 1024 * 1024  # 1 Mo
+
+# Au-delà, le fichier tampon d'un upload Cloudinary passe de la mémoire au disque
+CLOUDINARY_SPOOL_MAX_SIZE = 8 * 1024 * 1024  # 8 Mo
+
+# Multipart S3 : parts envoyées en parallèle, au plus max_concurrency parts en mémoire
+S3_MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024  # 8 Mo
+S3_MAX_CONCURRENCY = 4
+
+
+class _HashingReader:
+    """
+    Enveloppe un flux en lecture et calcule la taille et le SHA-256 au fil de l'eau.
+    N'expose volontairement ni seek ni tell : boto3 lit alors le flux séquentiellement,
+    bloc par bloc. Cloudinary exige un fichier positionnable (with, tell, seek) :
+    voir _save_cloudinary.
+    """
+    
+    def __init__(self, file_data: BinaryIO):
+        self._file_data = file_data
+        self._hash = hashlib.sha256()
+        self.size = 0
+    
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._file_data.read(size)
+        if chunk:
+            self._hash.update(chunk)
+            self.size += len(chunk)
+        return chunk
+    
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
 
 class MediaStorage:
     """Gestionnaire de stockage pour les médias."""
@@ -88,44 +126,93 @@ class MediaStorage:
         Returns:
             Chemin/URL du fichier sauvegardé
         """
+        file_path, _, _ = self.save_upload(file_data, filename, content_type)
+        return file_path
+    
+    def save_upload(self, file_data: BinaryIO, filename: str,
+                    content_type: Optional[str] = None) -> Tuple[str, int, str]:
+        """
+        Sauvegarde un fichier en streaming, sans jamais le charger entièrement en mémoire.
+        
+        Args:
+            file_data: Données du fichier (file-like object, lu séquentiellement)
+            filename: Nom du fichier
+            content_type: Type MIME
+            
+        Returns:
+            Tuple (chemin/URL du fichier sauvegardé, taille en octets, SHA-256 hexadécimal)
+        """
         # Générer un nom unique
         ext = Path(filename).suffix
         unique_name = f"{uuid.uuid4()}{ext}"
         
+        reader = _HashingReader(file_data)
         if self.storage_type == 's3':
-            return self._save_s3(file_data, unique_name, content_type)
+            file_path = self._save_s3(reader, unique_name, content_type)
         elif self.storage_type == 'cloudinary':
-            return self._save_cloudinary(file_data, unique_name, content_type)
+            file_path = self._save_cloudinary(reader, unique_name, content_type)
         else:
-            return self._save_local(file_data, unique_name)
+            file_path = self._save_local(reader, unique_name)
+        
+        return file_path, reader.size, reader.sha256
     
     def _save_local(self, file_data: BinaryIO, filename: str) -> str:
-        """Sauvegarde localement."""
+        """Sauvegarde localement (écriture par blocs dans un fichier temporaire puis renommage)."""
         file_path = self.storage_dir / filename
-        # Lire le contenu
-        content = file_data.read()
-        with open(file_path, 'wb') as f:
-            f.write(content)
+        tmp_path = self.storage_dir / f".{filename}.part"
+        try:
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    chunk = file_data.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+            # Le fichier n'apparaît sous son nom final qu'une fois complet
+            os.replace(tmp_path, file_path)
+        except Exception:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            raise
         return str(file_path)
     
     def _save_s3(self, file_data: BinaryIO, filename: str, content_type: Optional[str]) -> str:
-        """Sauvegarde sur S3."""
+        """Sauvegarde sur S3 (upload multipart, parts envoyées en parallèle)."""
         key = f"media/{filename}"
+        transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=S3_MULTIPART_CHUNK_SIZE,
+            max_concurrency=S3_MAX_CONCURRENCY,
+            use_threads=True
+        )
         self.s3_client.upload_fileobj(
             file_data,
             self.s3_bucket,
             key,
-            ExtraArgs={'ContentType': content_type} if content_type else {}
+            ExtraArgs={'ContentType': content_type} if content_type else {},
+            Config=transfer_config
         )
         return f"s3://{self.s3_bucket}/{key}"
     
     def _save_cloudinary(self, file_data: BinaryIO, filename: str, content_type: Optional[str]) -> str:
-        """Sauvegarde sur Cloudinary."""
-        result = cloudinary.uploader.upload(
-            file_data,
-            public_id=Path(filename).stem,
-            resource_type="auto"
-        )
+        """
+        Sauvegarde sur Cloudinary (upload découpé en blocs).
+        upload_large utilise le fichier comme gestionnaire de contexte et mesure sa taille
+        avec tell/seek : le flux est d'abord recopié (et haché) dans un fichier tampon,
+        en mémoire pour les petits fichiers, sur disque au-delà de CLOUDINARY_SPOOL_MAX_SIZE.
+        """
+        with tempfile.SpooledTemporaryFile(max_size=CLOUDINARY_SPOOL_MAX_SIZE) as spool:
+            while True:
+                chunk = file_data.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                spool.write(chunk)
+            spool.seek(0)
+            result = cloudinary.uploader.upload_large(
+                spool,
+                public_id=Path(filename).stem,
+                resource_type="auto",
+                chunk_size=S3_MULTIPART_CHUNK_SIZE
+            )
         return result['secure_url']
     
     def get_file_url(self, file_path: str) -> str:
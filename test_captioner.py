@@ -0,0 +1,163 @@
+"""
+Tests du captioner BLIP sans modèle (core/captioner.py).
+"""
+
+import threading
+
+import pytest
+
+torch = pytest.importorskip("torch")
+# core/__init__ charge CLIP, BLIP et le Cross-Encoder
+captioner = pytest.importorskip("core.captioner")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge monotone contrôlée par le test."""
+    now = [100.0]
+    monkeypatch.setattr(captioner.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_caption_deadline_stops_after_timeout(clock):
+    deadline = captioner.CaptionDeadline(timeout=2.0)
+    input_ids = torch.zeros((3, 5), dtype=torch.long)
+
+    before = deadline(input_ids, None)
+    clock[0] += 2.5
+    after = deadline(input_ids, None)
+
+    assert before.shape == after.shape == (3,)
+    assert before.dtype == torch.bool
+    assert not before.any()
+    assert after.all()
+
+
+def test_caption_deadline_stays_stopped(clock):
+    deadline = captioner.CaptionDeadline(timeout=1.0)
+    input_ids = torch.zeros((2, 1), dtype=torch.long)
+    clock[0] += 1.0
+    assert deadline(input_ids, None).all()
+
+    clock[0] -= 10.0
+    assert deadline(input_ids, None).all()
+
+
+def test_caption_deadline_cancel_event(clock):
+    cancel_event = threading.Event()
+    deadline = captioner.CaptionDeadline(timeout=None, cancel_event=cancel_event)
+    input_ids = torch.zeros((4, 2), dtype=torch.long)
+
+    clock[0] += 1e6
+    assert not deadline(input_ids, None).any()
+
+    cancel_event.set()
+    stopped = deadline(input_ids, None)
+    assert stopped.shape == (4,)
+    assert stopped.all()
+
+
+class StubInputs(dict):
+    def to(self, device):
+        return self
+
+
+class StubProcessor:
+    """Processor factice : chaque image devient son niveau de rouge."""
+
+    def __call__(self, images=None, return_tensors=None):
+        images = images if isinstance(images, list) else [images]
+        return StubInputs(pixel_values=torch.tensor([image.getpixel((0, 0))[0] for image in images]))
+
+    def batch_decode(self, out, skip_special_tokens=True):
+        return [f"color {int(value)}" for value in out]
+
+    def decode(self, out, skip_special_tokens=True):
+        return f"color {int(out)}"
+
+
+class StubModel:
+    """Modèle factice : renvoie ses entrées, et échoue sur les batchs si fail_batches."""
+
+    def __init__(self, fail_batches=False):
+        self.fail_batches = fail_batches
+        self.calls = []
+
+    def generate(self, pixel_values, stopping_criteria=None, **kwargs):
+        self.calls.append((len(pixel_values), kwargs))
+        if self.fail_batches and len(pixel_values) > 1:
+            raise RuntimeError("batch en échec")
+        return pixel_values
+
+
+def stub_captioner(model):
+    blip = captioner.BLIPCaptioner(device="cpu", profile="fast")
+    blip._processor = StubProcessor()
+    blip._model = model
+    return blip
+
+
+def color_images():
+    Image = captioner.Image
+    return [
+        Image.new('RGB', (8, 8), (10, 0, 0)),
+        Image.new('L', (8, 8), 40),
+        None,
+        Image.new('RGB', (0, 8)),
+        Image.new('RGB', (8, 8), (30, 0, 0)),
+    ]
+
+
+def test_generate_captions_batch_keeps_input_order():
+    model = StubModel()
+
+    captions = stub_captioner(model).generate_captions_batch(color_images(), batch_size=2)
+
+    assert captions == ["color 10", "color 40", "unknown", "unknown", "color 30"]
+    # Images invalides exclues des passes du modèle
+    assert [size for size, _ in model.calls] == [2, 1]
+    assert model.calls[0][1]["num_beams"] == captioner.CAPTION_PROFILES["fast"]["num_beams"]
+
+
+def test_generate_captions_batch_falls_back_to_single_images():
+    model = StubModel(fail_batches=True)
+
+    captions = stub_captioner(model).generate_captions_batch(color_images(), batch_size=5)
+
+    assert captions == ["color 10", "color 40", "unknown", "unknown", "color 30"]
+    assert [size for size, _ in model.calls] == [3, 1, 1, 1]
+
+
+def test_generate_captions_batch_cancelled():
+    model = StubModel()
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    captions = stub_captioner(model).generate_captions_batch(color_images(), cancel_event=cancel_event)
+
+    assert captions == ["unknown"] * 5
+    assert model.calls == []
+
+
+def test_caption_profiles():
+    with pytest.raises(ValueError):
+        captioner.BLIPCaptioner(device="cpu", profile="turbo")
+
+    model = StubModel()
+    blip = stub_captioner(model)
+    blip.generate_captions_batch(color_images()[:1], profile="quality")
+
+    assert model.calls[0][1] == captioner.CAPTION_PROFILES["quality"]
+    with pytest.raises(ValueError):
+        blip.generate_captions_batch(color_images()[:1], profile="turbo")
+
+
+@pytest.mark.parametrize("name, size", [("large.jpg", (3000, 2000)), ("small.png", (100, 50))])
+def test_load_caption_image_matches_blip_input(tmp_path, name, size):
+    path = str(tmp_path / name)
+    captioner.Image.new('RGB', size, (0, 120, 0)).save(path)
+
+    image = captioner.load_caption_image(path)
+
+    assert image.size == (captioner.BLIP_INPUT_SIZE, captioner.BLIP_INPUT_SIZE)
+    assert image.mode == 'RGB'
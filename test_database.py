@@ -0,0 +1,136 @@
+"""
+Tests de MediaDatabase sur SQLite (base media.db créée dans un dossier temporaire).
+"""
+
+import pytest
+
+from database import MediaDatabase
+from pagination import encode_cursor
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Base SQLite vide dans un dossier temporaire."""
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.chdir(tmp_path)
+    return MediaDatabase()
+
+
+def media_row(file_path, caption="", media_type="image"):
+    """Ligne de média minimale pour add_media_many."""
+    return {
+        "file_path": file_path,
+        "file_name": file_path.rsplit("/", 1)[-1],
+        "media_type": media_type,
+        "file_size": 100,
+        "mime_type": "image/jpeg",
+        "caption": caption,
+    }
+
+
+def test_add_media_many_returns_ids_in_input_order(db):
+    ids = db.add_media_many([media_row("a/1.jpg"), media_row("a/2.jpg"), media_row("a/3.jpg")])
+
+    assert len(set(ids)) == 3
+    assert [db.get_media(media_id=media_id)["file_path"] for media_id in ids] == ["a/1.jpg", "a/2.jpg", "a/3.jpg"]
+
+
+def test_add_media_many_keeps_last_duplicate_path(db):
+    ids = db.add_media_many([media_row("a/1.jpg", caption="old"), media_row("a/1.jpg", caption="new")])
+
+    assert ids[0] == ids[1]
+    assert db.get_media(file_path="a/1.jpg")["caption"] == "new"
+    assert len(db.list_media()) == 1
+
+
+def test_add_media_many_empty(db):
+    assert db.add_media_many([]) == []
+
+
+def test_add_media_many_pages_id_lookup(db):
+    rows = [media_row(f"a/{i}.jpg") for i in range(7)]
+
+    ids = db.add_media_many(rows, page_size=3)
+
+    assert [db.get_media(media_id=media_id)["file_path"] for media_id in ids] == [row["file_path"] for row in rows]
+
+
+@pytest.fixture(params=["fts5", "like"])
+def caption_db(request, db):
+    """Base avec légendes, interrogée par FTS5 puis par le repli LIKE."""
+    if request.param == "fts5" and not db.fts_available:
+        pytest.skip("SQLite compilé sans FTS5")
+    db.fts_available = request.param == "fts5"
+    db.add_media_many([
+        media_row("a/beach.jpg", caption="a dog running on the beach"),
+        media_row("a/park.jpg", caption="a dog in a park"),
+        media_row("a/city.jpg", caption="a city street at night"),
+        media_row("a/clip.mp4", caption="a dog on the beach", media_type="video"),
+    ])
+    return db
+
+
+def test_search_captions_ranks_media_matching_more_terms_first(caption_db):
+    results = caption_db.search_captions("dog beach")
+
+    assert {media["file_path"] for media in results} == {"a/beach.jpg", "a/park.jpg", "a/clip.mp4"}
+    assert results[-1]["file_path"] == "a/park.jpg"
+    assert all("rank" in media for media in results)
+
+
+def test_search_captions_filters_media_type(caption_db):
+    results = caption_db.search_captions("dog", media_type="video")
+
+    assert [media["file_path"] for media in results] == ["a/clip.mp4"]
+
+
+def test_search_captions_ignores_fts_syntax(caption_db):
+    assert caption_db.search_captions('"') == []
+    assert [media["file_path"] for media in caption_db.search_captions('city" OR "*')] == ["a/city.jpg"]
+
+
+def test_search_captions_sees_updated_captions(caption_db):
+    caption_db.add_media_many([media_row("a/city.jpg", caption="a cat on a roof")])
+
+    assert caption_db.search_captions("street") == []
+    assert [media["file_path"] for media in caption_db.search_captions("cat")] == ["a/city.jpg"]
+
+
+def test_list_media_page_walks_all_media_without_overlap(db):
+    ids = db.add_media_many([media_row(f"a/{i}.jpg") for i in range(5)])
+
+    pages = []
+    page, cursor = db.list_media_page(limit=2)
+    pages.append(page)
+    while cursor:
+        page, cursor = db.list_media_page(limit=2, cursor=cursor)
+        pages.append(page)
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    # Même created_at (précision à la seconde) : départagés par id décroissant
+    assert [media["id"] for page in pages for media in page] == sorted(ids, reverse=True)
+
+
+def test_list_media_page_filters_media_type(db):
+    db.add_media_many([media_row("a/1.jpg"), media_row("a/2.mp4", media_type="video")])
+
+    page, cursor = db.list_media_page(limit=10, media_type="video")
+
+    assert [media["file_path"] for media in page] == ["a/2.mp4"]
+    assert cursor is None
+
+
+def test_list_media_page_rejects_invalid_cursor(db):
+    with pytest.raises(ValueError):
+        db.list_media_page(cursor="pas un curseur!")
+    with pytest.raises(ValueError):
+        db.list_media_page(cursor=encode_cursor({"id": 1}))
+
+
+def test_search_captions_offset_pages_are_stable(caption_db):
+    caption_db.add_media_many([media_row(f"a/dog_{i}.jpg", caption="a dog") for i in range(5)])
+    everything = [media["id"] for media in caption_db.search_captions("dog", limit=100)]
+
+    pages = [caption_db.search_captions("dog", limit=3, offset=offset) for offset in range(0, len(everything), 3)]
+
+    assert [media["id"] for page in pages for media in page] == everything
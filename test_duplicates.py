@@ -0,0 +1,82 @@
+"""
+Tests de la détection des quasi-doublons (core/duplicates.py) sur un petit IndexFlatIP.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+Image = pytest.importorskip("PIL.Image")
+# core/__init__ charge CLIP, BLIP et le Cross-Encoder
+duplicates = pytest.importorskip("core.duplicates")
+
+
+def gradient(width, height, reverse=False):
+    """Image en niveaux de gris dont la luminosité croît (ou décroît) de gauche à droite."""
+    row = np.linspace(0, 255, width)
+    if reverse:
+        row = row[::-1]
+    return Image.fromarray(np.tile(row, (height, 1)).astype('uint8')).convert('RGB')
+
+
+def build_index(rows):
+    """Index FAISS et métadonnées à partir de (chemin, type, vecteur)."""
+    vectors = np.array([vector for _, _, vector in rows], dtype='float32')
+    faiss.normalize_L2(vectors)
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    metadata = [{"file_path": path, "media_type": media_type} for path, media_type, _ in rows]
+    return index, metadata
+
+
+def test_dhash_follows_horizontal_gradient():
+    assert duplicates.dhash(gradient(64, 64)) == "f" * 16
+    assert duplicates.dhash(gradient(64, 64, reverse=True)) == "0" * 16
+    assert len(duplicates.dhash(gradient(64, 64), hash_size=16)) == 64
+
+
+def test_dhash_ignores_size_and_brightness():
+    image = gradient(64, 64)
+    # Moins contrastée et plus claire : mêmes signes de gradient
+    faded = Image.eval(image, lambda value: value // 2 + 40)
+
+    assert duplicates.dhash(gradient(640, 480)) == duplicates.dhash(image)
+    assert duplicates.dhash(faded) == duplicates.dhash(image)
+
+
+def test_hamming_distance():
+    assert duplicates.hamming_distance("ff", "0f") == 4
+    assert duplicates.hamming_distance("f" * 16, "f" * 16) == 0
+    assert duplicates.hamming_distance("f" * 16, "0" * 16) == 64
+
+
+def test_find_duplicate_groups_chains_bursts_and_separates_media_types():
+    index, metadata = build_index([
+        ("burst_1.jpg", "image", [1.0, 0.0, 0.0, 0.0]),
+        ("burst_2.jpg", "image", [1.0, 0.15, 0.0, 0.0]),
+        ("burst_3.jpg", "image", [1.0, 0.3, 0.0, 0.0]),
+        ("other.jpg", "image", [0.0, 0.0, 1.0, 0.0]),
+        # Vidéo à deux frames : représentée par la moyenne
+        ("clip.mp4", "video", [1.0, 0.0, 0.0, 0.0]),
+        ("clip.mp4", "video", [1.0, 0.1, 0.0, 0.0]),
+        ("clip_copy.mp4", "video", [1.0, 0.05, 0.0, 0.0]),
+    ])
+
+    groups = duplicates.find_duplicate_groups(index, metadata, threshold=0.98, neighbours=5)
+
+    assert [(group["files"], group["media_type"]) for group in groups] == [
+        (["burst_1.jpg", "burst_2.jpg", "burst_3.jpg"], "image"),
+        (["clip.mp4", "clip_copy.mp4"], "video"),
+    ]
+    # burst_1 et burst_3 (0.958) ne sont reliés que par burst_2
+    assert 0.98 <= groups[0]["min_similarity"] <= groups[0]["max_similarity"] < 0.99
+
+
+def test_find_duplicate_groups_without_duplicates():
+    index, metadata = build_index([
+        ("a.jpg", "image", [1.0, 0.0, 0.0, 0.0]),
+        ("b.jpg", "image", [0.0, 1.0, 0.0, 0.0]),
+    ])
+
+    assert duplicates.find_duplicate_groups(index, metadata, threshold=0.95) == []
+    assert duplicates.find_duplicate_groups(*build_index([("a.jpg", "image", [1.0, 0.0])])) == []
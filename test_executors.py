@@ -0,0 +1,78 @@
+"""
+Tests des exécuteurs bornés (executors.py).
+"""
+
+import time
+import threading
+
+import pytest
+
+from executors import BoundedExecutor, ExecutorOverloaded, ExecutorTimeout, executor_from_env
+
+
+def wait_idle(executor, timeout=2.0):
+    """Attend que les callbacks de fin de tâche aient libéré toutes les places."""
+    deadline = time.monotonic() + timeout
+    while executor.stats()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert executor.stats()["in_flight"] == 0
+
+
+@pytest.fixture
+def release():
+    """Événement qui débloque les tâches de test (toujours posé en fin de test)."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_run_returns_result_and_propagates_errors():
+    executor = BoundedExecutor("test", max_workers=1, max_pending=0)
+
+    assert executor.run(lambda a, b=0: a + b, 2, b=3) == 5
+    wait_idle(executor)
+    with pytest.raises(ZeroDivisionError):
+        executor.run(lambda: 1 / 0)
+    wait_idle(executor)
+
+
+def test_submit_rejects_when_pool_and_queue_are_full(release):
+    executor = BoundedExecutor("test", max_workers=1, max_pending=1)
+    running = executor.submit(release.wait)
+    queued = executor.submit(release.wait)
+
+    with pytest.raises(ExecutorOverloaded):
+        executor.submit(release.wait)
+    assert executor.stats() == {"in_flight": 2, "capacity": 2, "rejected": 1, "timeouts": 0}
+
+    release.set()
+    running.result(timeout=2.0)
+    queued.result(timeout=2.0)
+    wait_idle(executor)
+    assert executor.run(lambda: "ok") == "ok"
+
+
+def test_timed_out_task_keeps_its_slot(release):
+    executor = BoundedExecutor("test", max_workers=1, max_pending=0, timeout=0.05)
+
+    with pytest.raises(ExecutorTimeout):
+        executor.run(release.wait)
+    assert executor.stats()["timeouts"] == 1
+    # La tâche expirée tourne encore : la charge reste bornée
+    with pytest.raises(ExecutorOverloaded):
+        executor.submit(release.wait)
+
+    release.set()
+    wait_idle(executor)
+    assert executor.run(lambda: "ok", timeout=2.0) == "ok"
+
+
+def test_executor_from_env(monkeypatch):
+    monkeypatch.setenv("THUMBS_WORKERS", "3")
+    monkeypatch.setenv("THUMBS_MAX_PENDING", "5")
+    monkeypatch.setenv("THUMBS_TIMEOUT", "1.5")
+
+    executor = executor_from_env("thumbs", max_workers=1, max_pending=0, timeout=None)
+
+    assert (executor.max_workers, executor.max_pending, executor.timeout) == (3, 5, 1.5)
+    assert executor_from_env("other", max_workers=2, max_pending=4, timeout=None).timeout is None
@@ -0,0 +1,92 @@
+"""
+Tests du cache de features adressé par contenu (core/feature_cache.py).
+"""
+
+import shutil
+
+import pytest
+
+np = pytest.importorskip("numpy")
+# core/__init__ charge CLIP, BLIP et le Cross-Encoder
+feature_cache = pytest.importorskip("core.feature_cache")
+
+CLIP = "openai/clip-vit-large-patch14|adaptive"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return feature_cache.FeatureCache(str(tmp_path / "features.db"), thumbnail_cache_dir=str(tmp_path / "thumbnails"))
+
+
+@pytest.fixture
+def media(tmp_path):
+    """Fichier média factice (le cache ne lit que ses octets)."""
+    path = tmp_path / "library" / "photo.jpg"
+    path.parent.mkdir()
+    path.write_bytes(b"\xff\xd8" + bytes(range(256)) * 64)
+    return path
+
+
+def test_embeddings_round_trip_in_frame_order(cache, media):
+    frames = [(30, np.array([0.3, 0.4], dtype=np.float64)), (10, np.array([0.1, 0.2], dtype=np.float64))]
+
+    cache.put_embeddings(str(media), CLIP, frames)
+    cached = cache.get_embeddings(str(media), CLIP)
+
+    assert [frame_number for frame_number, _ in cached] == [10, 30]
+    assert all(embedding.dtype == np.float32 for _, embedding in cached)
+    np.testing.assert_allclose(cached[0][1], [0.1, 0.2], rtol=1e-6)
+    np.testing.assert_allclose(cached[1][1], [0.3, 0.4], rtol=1e-6)
+
+
+def test_put_embeddings_replaces_previous_frames(cache, media):
+    cache.put_embeddings(str(media), CLIP, [(0, np.ones(2)), (1, np.ones(2))])
+    cache.put_embeddings(str(media), CLIP, [(feature_cache.IMAGE_FRAME_NUMBER, np.zeros(2))])
+
+    assert [frame_number for frame_number, _ in cache.get_embeddings(str(media), CLIP)] == [feature_cache.IMAGE_FRAME_NUMBER]
+
+
+def test_captions_and_phash_round_trip(cache, media):
+    cache.put_caption(str(media), "blip|balanced", "a dog on the beach")
+    cache.put_phash(str(media), "f0f0f0f0f0f0f0f0")
+
+    assert cache.get_caption(str(media), "blip|balanced") == "a dog on the beach"
+    assert cache.get_phash(str(media)) == "f0f0f0f0f0f0f0f0"
+
+
+def test_models_and_versions_are_isolated(cache, media, monkeypatch):
+    cache.put_embeddings(str(media), CLIP, [(feature_cache.IMAGE_FRAME_NUMBER, np.ones(2))])
+    cache.put_caption(str(media), "blip|fast", "a dog")
+
+    assert cache.get_embeddings(str(media), "openai/clip-vit-base-patch32|adaptive") == []
+    assert cache.get_caption(str(media), "blip|quality") is None
+
+    # Changement du calcul des embeddings : les anciennes entrées sont ignorées
+    monkeypatch.setattr(feature_cache, "FEATURE_CACHE_VERSION", feature_cache.FEATURE_CACHE_VERSION + 1)
+    assert cache.get_embeddings(str(media), CLIP) == []
+    assert cache.get_caption(str(media), "blip|fast") is None
+
+
+def test_copied_file_hits_the_cache(cache, media, tmp_path):
+    cache.put_embeddings(str(media), CLIP, [(feature_cache.IMAGE_FRAME_NUMBER, np.array([1.0, 2.0]))])
+    cache.put_caption(str(media), "blip|balanced", "a dog")
+    # Copie ailleurs (autre chemin, autre mtime) : même contenu, aucun recalcul
+    copy = tmp_path / "backup" / "IMG_0001.jpg"
+    copy.parent.mkdir()
+    shutil.copyfile(media, copy)
+
+    cached = cache.get_embeddings(str(copy), CLIP)
+
+    assert len(cached) == 1
+    np.testing.assert_allclose(cached[0][1], [1.0, 2.0])
+    assert cache.get_caption(str(copy), "blip|balanced") == "a dog"
+    assert cache.stats()["hits"] == 1
+
+
+def test_modified_file_misses_the_cache(cache, media):
+    cache.put_embeddings(str(media), CLIP, [(feature_cache.IMAGE_FRAME_NUMBER, np.ones(2))])
+
+    media.write_bytes(media.read_bytes() + b"edited")
+
+    assert cache.get_embeddings(str(media), CLIP) == []
+    assert cache.stats() == {"media": 1, "captions": 0, "hits": 0, "misses": 1}
@@ -0,0 +1,107 @@
+"""
+Tests des métadonnées de l'indexeur (core/indexer.py), sans modèle.
+"""
+
+import os
+import json
+
+import pytest
+
+# core/__init__ charge CLIP, BLIP et le Cross-Encoder
+indexer = pytest.importorskip("core.indexer")
+
+
+@pytest.mark.parametrize("frame_number, fps, expected", [
+    (90, 30.0, 3.0),
+    (1000, 29.97, 33.367),
+    (0, 25.0, 0.0),
+    (90, 0.0, None),
+])
+def test_video_frame_metadata_timestamp(frame_number, fps, expected):
+    meta = indexer.video_frame_metadata("videos/vacances_plage-2023.mp4", 2, frame_number, fps)
+
+    assert meta["timestamp"] == expected
+    assert meta["frame_number"] == frame_number
+    assert meta["frame_index"] == 2
+
+
+def test_video_frame_metadata_entry():
+    meta = indexer.video_frame_metadata("videos/vacances_plage-2023.mp4", 0, 0, 30.0)
+
+    assert meta["file_path"] == os.path.abspath("videos/vacances_plage-2023.mp4")
+    assert meta["media_type"] == "video"
+    assert meta["caption"] == "video: vacances plage 2023"
+
+
+class ColorCaptioner:
+    """Captioner factice : légende selon la couleur de l'image, "unknown" pour le bleu."""
+
+    def generate_captions_batch(self, images, batch_size=8, timeout=60.0, **kwargs):
+        captions = []
+        for image in images:
+            red, _, blue = image.getpixel((0, 0))
+            captions.append("a red square" if red > blue else "unknown")
+        return captions
+
+
+def write_metadata(path, metadata):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f)
+
+
+def read_captions(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return {os.path.basename(meta["file_path"]): (meta["caption"], meta.get("caption_pending", False))
+                for meta in json.load(f)}
+
+
+@pytest.fixture
+def pending_metadata(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    Image.new('RGB', (64, 48), (255, 0, 0)).save(tmp_path / "red.jpg")
+    Image.new('RGB', (64, 48), (0, 0, 255)).save(tmp_path / "blue.jpg")
+    metadata_path = str(tmp_path / "metadata.json")
+    write_metadata(metadata_path, [
+        {"file_path": str(tmp_path / "red.jpg"), "caption": "red", "caption_pending": True},
+        {"file_path": str(tmp_path / "blue.jpg"), "caption": "blue", "caption_pending": True},
+        {"file_path": str(tmp_path / "missing.jpg"), "caption": "missing", "caption_pending": True},
+        {"file_path": str(tmp_path / "done.jpg"), "caption": "a cat"},
+    ])
+    return metadata_path
+
+
+def test_fill_pending_captions_keeps_failures_pending(pending_metadata):
+    written = indexer.fill_pending_captions(pending_metadata, captioner=ColorCaptioner(),
+                                            use_feature_cache=False)
+
+    assert written == 1
+    assert read_captions(pending_metadata) == {
+        "red.jpg": ("a red square", False),
+        # "unknown" ou image illisible : légende de repli, reprise au prochain passage
+        "blue.jpg": ("blue", True),
+        "missing.jpg": ("missing", True),
+        "done.jpg": ("a cat", False),
+    }
+
+
+def test_fill_pending_captions_without_pending_entries(tmp_path):
+    metadata_path = str(tmp_path / "metadata.json")
+    assert indexer.fill_pending_captions(metadata_path, captioner=object()) == 0
+
+    write_metadata(metadata_path, [{"file_path": str(tmp_path / "done.jpg"), "caption": "a cat"}])
+    # Rien en attente : le captioner n'est pas appelé
+    assert indexer.fill_pending_captions(metadata_path, captioner=object()) == 0
+
+
+def test_merge_captions_only_updates_pending_entries(pending_metadata, tmp_path):
+    captions = {
+        str(tmp_path / "red.jpg"): "a red square",
+        str(tmp_path / "done.jpg"): "a dog",
+        str(tmp_path / "unknown.jpg"): "a tree",
+    }
+
+    assert indexer._merge_captions(pending_metadata, captions) == 1
+    captions_on_disk = read_captions(pending_metadata)
+    assert captions_on_disk["red.jpg"] == ("a red square", False)
+    assert captions_on_disk["done.jpg"] == ("a cat", False)
+    assert "unknown.jpg" not in captions_on_disk
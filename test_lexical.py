@@ -0,0 +1,78 @@
+"""
+Tests de la recherche lexicale BM25 et de la fusion RRF (core/lexical.py).
+"""
+
+import pytest
+
+# core/__init__ charge CLIP, BLIP et le Cross-Encoder
+lexical = pytest.importorskip("core.lexical")
+
+METADATA = [
+    {"file_path": "data/plage_ete.jpg", "caption": "a dog running on the beach"},
+    {"file_path": "data/IMG_0001.jpg", "caption": "a dog sleeping on a sofa in the living room"},
+    {"file_path": "data/ville.jpg", "caption": "a city street at night"},
+    {"file_path": "data/IMG_0002.jpg", "caption": "unknown"},
+]
+
+
+@pytest.fixture
+def lexical_index():
+    return lexical.build_lexical_index(METADATA)
+
+
+def test_tokenize_strips_accents_stopwords_and_separators():
+    assert lexical.tokenize("Été à la Plage_2023-IMG.jpg") == ["ete", "plage", "2023"]
+    assert lexical.tokenize("") == []
+
+
+def test_document_text_ignores_unknown_captions():
+    assert lexical.tokenize(lexical.document_text(METADATA[3])) == ["0002"]
+
+
+def test_build_lexical_index_counts_documents(lexical_index):
+    assert lexical_index["n_docs"] == 4
+    assert lexical_index["postings"]["dog"] == [[0, 1], [1, 1]]
+    assert lexical_index["avgdl"] == sum(lexical_index["doc_lengths"]) / 4
+
+
+def test_lexical_search_prefers_documents_matching_more_terms(lexical_index):
+    results = lexical.lexical_search("dog beach", lexical_index)
+
+    assert [idx for idx, _ in results] == [0, 1]
+    assert results[0][1] > results[1][1] > 0
+
+
+def test_lexical_search_matches_file_names(lexical_index):
+    assert [idx for idx, _ in lexical.lexical_search("plage", lexical_index)] == [0]
+
+
+def test_lexical_search_normalizes_by_document_length(lexical_index):
+    # "dog" apparaît une fois dans les deux légendes : la plus courte l'emporte
+    scores = dict(lexical.lexical_search("dog", lexical_index))
+
+    assert scores[0] > scores[1]
+
+
+def test_lexical_search_filters_and_limits(lexical_index):
+    assert [idx for idx, _ in lexical.lexical_search("dog", lexical_index, filtered_indices=[1, 2])] == [1]
+    assert len(lexical.lexical_search("dog", lexical_index, top_k=1)) == 1
+
+
+def test_lexical_search_without_terms(lexical_index):
+    assert lexical.lexical_search("the of", lexical_index) == []
+    assert lexical.lexical_search("dog", lexical.build_lexical_index([])) == []
+
+
+def test_query_coverage():
+    terms = lexical.tokenize("dog beach night")
+
+    assert lexical.query_coverage(terms, METADATA[0]) == pytest.approx(2 / 3)
+    assert lexical.query_coverage(terms, METADATA[2]) == pytest.approx(1 / 3)
+    assert lexical.query_coverage([], METADATA[0]) == 0.0
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = lexical.reciprocal_rank_fusion([[1, 2, 3], [2, 4, 1]], k=60)
+
+    assert [idx for idx, _ in fused] == [2, 1, 4, 3]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
@@ -0,0 +1,126 @@
+"""
+Tests du service des fichiers médias avec requêtes Range (media_files.py).
+"""
+
+import pytest
+
+flask = pytest.importorskip("flask")
+
+from media_files import MediaFileInfoCache, etag_matches, parse_range, send_media_file
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def media_info(tmp_path):
+    file_path = tmp_path / "clip.mp4"
+    file_path.write_bytes(CONTENT)
+    return MediaFileInfoCache().get(str(file_path))
+
+
+def serve(info, headers=None):
+    """Réponse de send_media_file pour une requête GET avec ces en-têtes (hors gunicorn)."""
+    app = flask.Flask(__name__)
+    with app.test_request_context("/api/media", headers=headers or {}):
+        response = send_media_file(info)
+        response.direct_passthrough = False
+        return response.status_code, response.headers, response.get_data()
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    ("bytes=-100", (924, 1023)),
+    ("bytes=-5000", (0, 1023)),
+    ("bytes=-", None),
+    ("bytes=0-10,20-30", None),
+    ("items=0-10", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1024) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=2000-3000", "bytes=50-10", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1024)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("", False),
+    ('"a1-2f"', True),
+    ('W/"a1-2f"', True),
+    ('"b2-30", W/"a1-2f"', True),
+    ("*", True),
+    ('"a1-2f0"', False),
+    ('"xa1-2f"', False),
+    ('"a1-2f0", "b2-30"', False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"a1-2f"') is expected
+
+
+def test_media_file_info_cache_refreshes_changed_files(media_info, tmp_path):
+    cache = MediaFileInfoCache()
+    file_path = str(tmp_path / "clip.mp4")
+    first = cache.get(file_path)
+
+    (tmp_path / "clip.mp4").write_bytes(CONTENT * 2)
+
+    assert cache.get(file_path).size == 2 * first.size
+    assert cache.get(str(tmp_path / "absent.mp4")) is None
+
+
+def test_send_media_file_whole_file(media_info):
+    status, headers, body = serve(media_info)
+
+    assert status == 200
+    assert body == CONTENT
+    assert headers["Accept-Ranges"] == "bytes"
+    assert headers["Content-Length"] == str(len(CONTENT))
+
+
+def test_send_media_file_suffix_range(media_info):
+    status, headers, body = serve(media_info, {"Range": "bytes=-10"})
+
+    assert status == 206
+    assert body == CONTENT[-10:]
+    assert headers["Content-Range"] == f"bytes {len(CONTENT) - 10}-{len(CONTENT) - 1}/{len(CONTENT)}"
+
+
+def test_send_media_file_unsatisfiable_range(media_info):
+    status, headers, _ = serve(media_info, {"Range": f"bytes={len(CONTENT)}-"})
+
+    assert status == 416
+    assert headers["Content-Range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_send_media_file_if_range(media_info):
+    status, _, body = serve(media_info, {"Range": "bytes=0-9", "If-Range": media_info.etag})
+    assert (status, body) == (206, CONTENT[:10])
+
+    # ETag périmé : tout le fichier, pas la plage
+    status, _, body = serve(media_info, {"Range": "bytes=0-9", "If-Range": '"perime"'})
+    assert (status, body) == (200, CONTENT)
+
+
+def test_send_media_file_not_modified(media_info):
+    status, _, body = serve(media_info, {"If-None-Match": media_info.etag})
+
+    assert status == 304
+    assert body == b""
+
+
+def test_send_media_file_not_modified_etag_lists(media_info):
+    status, _, body = serve(media_info, {"If-None-Match": '"perime", "autre"'})
+    assert (status, body) == (200, CONTENT)
+
+    status, _, _ = serve(media_info, {"If-None-Match": f'"perime", W/{media_info.etag}'})
+    assert status == 304
+
+    status, _, _ = serve(media_info, {"If-None-Match": "*"})
+    assert status == 304
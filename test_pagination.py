@@ -0,0 +1,100 @@
+"""
+Tests des curseurs de pagination et du cache des résultats de recherche (pagination.py).
+"""
+
+import pytest
+
+from pagination import encode_cursor, decode_cursor, SearchResultCache, paginate_cached
+
+
+def test_cursor_round_trip():
+    position = {"created_at": "2024-05-01 10:00:00", "id": 42, "note": "été"}
+
+    cursor = encode_cursor(position)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == position
+
+
+# "bm90IGpzb24" : base64 valide de "not json"
+@pytest.mark.parametrize("cursor", ["pas un curseur!", "bm90IGpzb24"])
+def test_decode_cursor_rejects_invalid_cursors(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_decode_cursor_rejects_non_dict_positions():
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor([1, 2]))
+
+
+def test_paginate_cached_walks_all_pages():
+    results = [{"path": f"{i}.jpg"} for i in range(5)]
+    cache = SearchResultCache()
+    search_id = cache.put(results)
+
+    seen = []
+    page, next_cursor = paginate_cached(results, search_id, 0, 2)
+    seen.extend(page)
+    while next_cursor:
+        position = decode_cursor(next_cursor)
+        assert position["search_id"] == search_id
+        page, next_cursor = paginate_cached(cache.get(search_id), search_id, position["offset"], 2)
+        seen.extend(page)
+
+    assert seen == results
+
+
+def test_search_result_cache_evicts_least_recently_used():
+    cache = SearchResultCache(max_entries=2)
+    first = cache.put([{"path": "a"}])
+    second = cache.put([{"path": "b"}])
+
+    assert cache.get(first) is not None
+    cache.put([{"path": "c"}])
+
+    assert cache.get(first) is not None
+    assert cache.get(second) is None
+
+
+def test_search_result_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("pagination.time.time", lambda: now[0])
+    cache = SearchResultCache(ttl_seconds=10.0)
+    search_id = cache.put([{"path": "a"}])
+
+    now[0] += 5.0
+    assert cache.get(search_id) == [{"path": "a"}]
+    now[0] += 10.0
+    assert cache.get(search_id) is None
+
+
+def test_next_page_served_by_another_process(tmp_path):
+    # Deux workers gunicorn : même dossier, caches mémoire distincts
+    results = [{"path": f"{i}.jpg", "score": 1.0 - i / 10} for i in range(5)]
+    search_id = SearchResultCache(cache_dir=str(tmp_path)).put(results, version="v1")
+    _, next_cursor = paginate_cached(results, search_id, 0, 2)
+
+    position = decode_cursor(next_cursor)
+    other_worker = SearchResultCache(cache_dir=str(tmp_path))
+    page, _ = paginate_cached(other_worker.get(position["search_id"], version="v1"),
+                              search_id, position["offset"], 2)
+
+    assert page == results[2:4]
+
+
+def test_search_result_cache_rejects_other_index_versions(tmp_path):
+    cache = SearchResultCache(cache_dir=str(tmp_path))
+    search_id = cache.put([{"path": "a"}], version="v1")
+
+    assert cache.get(search_id, version="v2") is None
+    assert SearchResultCache(cache_dir=str(tmp_path)).get(search_id, version="v2") is None
+
+
+def test_search_result_cache_disk_is_bounded(tmp_path):
+    cache = SearchResultCache(max_entries=2, cache_dir=str(tmp_path))
+    for i in range(5):
+        cache.put([{"path": str(i)}])
+
+    assert len(list(tmp_path.iterdir())) == 2
+    assert cache.get("../../etc/passwd") is None
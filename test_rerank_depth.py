@@ -0,0 +1,53 @@
+"""
+Tests du choix de la profondeur de rerank adaptative (core/searcher.choose_rerank_depth).
+"""
+
+import pytest
+
+# core/__init__ charge CLIP, BLIP et le Cross-Encoder
+searcher = pytest.importorskip("core.searcher")
+
+
+def depth(scores, **kwargs):
+    """Profondeur avec des seuils explicites (indépendants de l'environnement)."""
+    options = dict(max_depth=10, min_depth=3, confident_margin=0.03, ambiguity_band=0.03)
+    options.update(kwargs)
+    return searcher.choose_rerank_depth(scores, **options)
+
+
+def test_confident_first_result_skips_rerank():
+    assert depth([0.40, 0.30, 0.29, 0.28]) == 0
+
+
+def test_forced_rerank_keeps_min_depth():
+    assert depth([0.40, 0.30, 0.29, 0.28], allow_skip=False) == 3
+
+
+def test_depth_covers_ambiguous_band():
+    scores = [0.30, 0.29, 0.29, 0.28, 0.275, 0.20, 0.19]
+
+    assert depth(scores) == 5
+
+
+def test_depth_is_bounded():
+    assert depth([0.30] * 20) == 10
+    assert depth([0.30, 0.29]) == 2
+    assert depth([0.30, 0.29, 0.10, 0.05]) == 3
+
+
+def test_single_and_empty_candidates():
+    assert depth([]) == 0
+    assert depth([0.30]) == 0
+    assert depth([0.30], allow_skip=False) == 1
+
+
+def test_hybrid_order_reaches_ambiguous_candidates_ranked_lower():
+    # Classement RRF : le meilleur cosinus est en 3e position, un candidat proche en 6e
+    scores = [0.25, 0.20, 0.31, 0.18, 0.17, 0.30, 0.10]
+
+    assert depth(scores) == 6
+
+
+def test_lower_cosine_at_rank_one_is_not_confident():
+    # Le premier du classement n'a pas le meilleur cosinus : pas de saut du rerank
+    assert depth([0.25, 0.31, 0.10]) == 3
@@ -0,0 +1,133 @@
+"""
+Tests du cache de scores et du regroupement des appels au Cross-Encoder (core/reranker.py),
+avec une fonction de prédiction factice.
+"""
+
+import time
+import threading
+
+import pytest
+
+# core/__init__ charge CLIP, BLIP et le Cross-Encoder
+reranker = pytest.importorskip("core.reranker")
+
+
+def fake_score(pair):
+    query, context = pair
+    return float(len(query) * 100 + len(context))
+
+
+class GatedPredict:
+    """
+    predict_fn factice : le premier appel bloque jusqu'à release, pour empiler des requêtes ;
+    avec fail_second, le deuxième appel (le lot regroupé) échoue.
+    """
+
+    def __init__(self, fail_second=False):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.fail_second = fail_second
+
+    def __call__(self, pairs):
+        self.calls.append([tuple(pair) for pair in pairs])
+        if len(self.calls) == 1:
+            self.started.set()
+            self.release.wait(5.0)
+        elif self.fail_second and len(self.calls) == 2:
+            raise RuntimeError("modèle indisponible")
+        return [fake_score(pair) for pair in pairs]
+
+
+def run_in_threads(batcher, predict_fn, requests):
+    """Lance requests pendant que le premier lot est bloqué ; retourne résultats ou exceptions."""
+    outcomes = [None] * len(requests)
+
+    def call(i, pairs):
+        try:
+            outcomes[i] = batcher.predict(pairs)
+        except Exception as e:
+            outcomes[i] = e
+
+    blocker = threading.Thread(target=call, args=(0, requests[0]))
+    blocker.start()
+    assert predict_fn.started.wait(5.0)
+    threads = [threading.Thread(target=call, args=(i, pairs)) for i, pairs in enumerate(requests) if i > 0]
+    for thread in threads:
+        thread.start()
+    # Attendre que toutes les requêtes soient en file avant de débloquer le premier lot
+    deadline = time.monotonic() + 5.0
+    while len(batcher._pending) < len(threads) and time.monotonic() < deadline:
+        time.sleep(0.005)
+    predict_fn.release.set()
+    for thread in [blocker] + threads:
+        thread.join(5.0)
+    return outcomes
+
+
+def test_pair_score_cache_lru_and_counters():
+    cache = reranker.PairScoreCache(max_entries=2)
+    cache.put(("dog", "a dog"), 1.0)
+    cache.put(("dog", "a cat"), 2.0)
+
+    assert cache.get(("dog", "a dog")) == 1.0
+    cache.put(("cat", "a cat"), 3.0)
+
+    assert cache.get(("dog", "a cat")) is None
+    assert cache.get(("dog", "a dog")) == 1.0
+    assert cache.stats() == {"entries": 2, "hits": 2, "misses": 1}
+
+
+def test_pair_score_cache_disabled():
+    cache = reranker.PairScoreCache(max_entries=0)
+    cache.put(("dog", "a dog"), 1.0)
+
+    assert cache.get(("dog", "a dog")) is None
+
+
+def test_predict_returns_scores_in_input_order():
+    batcher = reranker.PredictBatcher(lambda pairs: [fake_score(pair) for pair in pairs])
+    pairs = [["b", "1"], ["a", "22"], ["b", "1"]]
+
+    assert batcher.predict(pairs) == [fake_score(pair) for pair in pairs]
+    assert batcher.predict([]) == []
+
+
+def test_concurrent_requests_share_one_batch():
+    predict_fn = GatedPredict()
+    batcher = reranker.PredictBatcher(predict_fn)
+    requests = [
+        [["warm", "up"]],
+        [["dog", "beach"], ["dog", "park"]],
+        [["dog", "park"], ["cat", "sofa"]],
+    ]
+
+    outcomes = run_in_threads(batcher, predict_fn, requests)
+
+    assert outcomes == [[fake_score(pair) for pair in pairs] for pairs in requests]
+    assert len(predict_fn.calls) == 2
+    # Paire commune aux deux requêtes : calculée une seule fois
+    assert sorted(predict_fn.calls[1]) == [("cat", "sofa"), ("dog", "beach"), ("dog", "park")]
+    assert batcher.stats() == {"batches": 2, "batched_requests": 3}
+
+
+def test_batch_error_reaches_every_waiting_request():
+    predict_fn = GatedPredict(fail_second=True)
+    batcher = reranker.PredictBatcher(predict_fn)
+
+    outcomes = run_in_threads(batcher, predict_fn, [[["warm", "up"]], [["dog", "beach"]], [["cat", "sofa"]]])
+
+    assert outcomes[0] == [fake_score(("warm", "up"))]
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes[1:])
+    # Le thread du batcher survit à l'erreur
+    assert batcher.predict([["dog", "park"]]) == [fake_score(("dog", "park"))]
+
+
+def test_batches_respect_max_batch():
+    predict_fn = GatedPredict()
+    batcher = reranker.PredictBatcher(predict_fn, max_batch=2)
+
+    outcomes = run_in_threads(batcher, predict_fn, [[["warm", "up"]], [["a", "1"], ["a", "2"]], [["b", "1"], ["b", "2"]]])
+
+    assert outcomes[1:] == [[fake_score(("a", "1")), fake_score(("a", "2"))], [fake_score(("b", "1")), fake_score(("b", "2"))]]
+    assert [len(call) for call in predict_fn.calls] == [1, 2, 2]
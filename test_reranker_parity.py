@@ -0,0 +1,39 @@
+"""
+Parité des scores du Cross-Encoder entre les backends torch (float32) et ONNX (int8).
+Voir aussi check_reranker_parity.py (mêmes mesures sur les légendes de l'index, avec latences).
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("onnxruntime")
+# core/__init__ charge CLIP, BLIP et le Cross-Encoder
+reranker_module = pytest.importorskip("core.reranker")
+
+from check_reranker_parity import spearman, DEFAULT_QUERIES, DEFAULT_CONTEXTS
+
+
+@pytest.fixture(scope="module")
+def backend_scores():
+    """Scores de chaque requête contre tous les contextes, par backend."""
+    scores = {}
+    for backend in ("torch", "onnx"):
+        reranker = reranker_module.create_reranker(backend=backend)
+        try:
+            reranker.warm_up()
+        except (RuntimeError, OSError) as e:
+            pytest.skip(f"Cross-Encoder indisponible (téléchargement ou export impossible): {e}")
+        scores[backend] = [np.array(reranker.score_pairs([[query, context] for context in DEFAULT_CONTEXTS]))
+                           for query in DEFAULT_QUERIES]
+    return scores
+
+
+def test_onnx_scores_rank_like_torch(backend_scores):
+    correlations = [spearman(t, o) for t, o in zip(backend_scores["torch"], backend_scores["onnx"])]
+
+    assert float(np.mean(correlations)) >= 0.95
+
+
+def test_onnx_keeps_top1(backend_scores):
+    for query, t, o in zip(DEFAULT_QUERIES, backend_scores["torch"], backend_scores["onnx"]):
+        assert int(np.argmax(o)) == int(np.argmax(t)), query
@@ -0,0 +1,107 @@
+"""
+Tests de la recherche de médias similaires (core/searcher.search_similar) sur un petit IndexFlatIP.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+# core/__init__ charge CLIP, BLIP et le Cross-Encoder
+searcher = pytest.importorskip("core.searcher")
+
+from pagination import SearchResultCache
+
+ROWS = [
+    ("a.jpg", "image", [1.0, 0.0, 0.0, 0.0]),
+    ("a.jpg", "image", [0.95, 0.05, 0.0, 0.0]),
+    ("b.jpg", "image", [0.9, 0.1, 0.0, 0.0]),
+    # Vidéo à deux frames : requête = moyenne des frames
+    ("clip.mp4", "video", [0.0, 1.0, 0.0, 0.0]),
+    ("clip.mp4", "video", [0.8, 0.2, 0.0, 0.0]),
+    ("c.jpg", "image", [0.0, 0.0, 1.0, 0.0]),
+    ("d.jpg", "image", [0.5, 0.5, 0.0, 0.0]),
+]
+
+
+@pytest.fixture
+def library():
+    """Index FAISS (vecteurs normalisés) et métadonnées alignées."""
+    vectors = np.array([vector for _, _, vector in ROWS], dtype='float32')
+    faiss.normalize_L2(vectors)
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    metadata = [{"file_path": path, "media_type": media_type} for path, media_type, _ in ROWS]
+    return index, metadata
+
+
+def test_build_index_rows(library):
+    _, metadata = library
+
+    rows = searcher.build_index_rows(metadata)
+
+    assert rows["a.jpg"] == [0, 1]
+    assert rows["clip.mp4"] == [3, 4]
+    assert rows["clip.mp4"] == searcher.find_index_rows(metadata, "clip.mp4")
+
+
+def test_source_media_is_excluded_and_results_are_unique(library):
+    index, metadata = library
+
+    results = searcher.search_similar(index, metadata, file_path="b.jpg", top_k=10)
+    paths = [result["path"] for result in results]
+
+    assert "b.jpg" not in paths
+    assert paths[0] == "a.jpg"
+    assert len(paths) == len(set(paths)) == 4
+    assert [result["score"] for result in results] == sorted((result["score"] for result in results), reverse=True)
+
+
+def test_video_query_uses_mean_of_frames(library):
+    index, metadata = library
+    frames = np.vstack([index.reconstruct(3), index.reconstruct(4)])
+    query = frames.mean(axis=0)
+    query /= np.linalg.norm(query)
+
+    results = searcher.search_similar(index, metadata, file_path="clip.mp4", top_k=3,
+                                      index_rows=searcher.build_index_rows(metadata))
+
+    assert results[0]["path"] == "d.jpg"
+    assert results[0]["score"] == pytest.approx(float(query @ index.reconstruct(6)), abs=1e-5)
+
+
+def test_filters_and_top_k(library):
+    index, metadata = library
+
+    results = searcher.search_similar(index, metadata, file_path="a.jpg", top_k=10, media_type="video")
+
+    assert [result["path"] for result in results] == ["clip.mp4"]
+    assert len(searcher.search_similar(index, metadata, file_path="a.jpg", top_k=1)) == 1
+
+
+def test_unknown_media_raises_lookup_error(library):
+    index, metadata = library
+
+    with pytest.raises(LookupError):
+        searcher.search_similar(index, metadata, file_path="absent.jpg")
+    with pytest.raises(LookupError):
+        searcher.search_similar(index, metadata, file_path="absent.jpg", index_rows={})
+    with pytest.raises(ValueError):
+        searcher.search_similar(index, metadata)
+
+
+def test_api_maps_unknown_media_to_404(library, monkeypatch, tmp_path):
+    pytest.importorskip("flask")
+    api_server = pytest.importorskip("api_server")
+    index, metadata = library
+    monkeypatch.setattr(api_server, "load_index_if_needed", lambda: None)
+    monkeypatch.setattr(api_server, "_index", index)
+    monkeypatch.setattr(api_server, "_metadata", metadata)
+    monkeypatch.setattr(api_server, "_index_rows", searcher.build_index_rows(metadata))
+    monkeypatch.setattr(api_server, "_index_loaded", True)
+    monkeypatch.setattr(api_server, "_search_cache", SearchResultCache(cache_dir=str(tmp_path)))
+    client = api_server.app.test_client()
+
+    assert client.get("/api/similar?path=absent.jpg").status_code == 404
+    response = client.get("/api/similar?path=b.jpg&top_k=2")
+    assert response.status_code == 200
+    assert [result["path"] for result in response.get_json()["results"]] == ["a.jpg", "clip.mp4"]
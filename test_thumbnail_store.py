@@ -0,0 +1,134 @@
+"""
+Tests du cache de vignettes adressé par contenu (core/thumbnails.ThumbnailStore).
+Le cache supprime des fichiers : chaque test travaille dans un dossier temporaire.
+"""
+
+import os
+import json
+
+import pytest
+
+# core/__init__ charge CLIP, BLIP et le Cross-Encoder
+thumbnails = pytest.importorskip("core.thumbnails")
+
+
+@pytest.fixture
+def media_dir(tmp_path):
+    directory = tmp_path / "library"
+    directory.mkdir()
+    return directory
+
+
+def make_media(directory, name, content):
+    path = directory / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def write_thumbnail(store, media_path, size=256, nbytes=100):
+    """Écrit une fausse vignette de nbytes octets et l'enregistre dans le store."""
+    cache_path = store.path_for(media_path, size)
+    with open(cache_path, 'wb') as f:
+        f.write(b"\xff" * nbytes)
+    store.record(cache_path)
+    return cache_path
+
+
+def test_moved_file_keeps_its_content_key(tmp_path, media_dir):
+    store = thumbnails.ThumbnailStore(str(tmp_path / "cache"))
+    original = make_media(media_dir, "photo.jpg", b"photo" * 100)
+    cache_path = write_thumbnail(store, original)
+
+    moved = str(media_dir / "renamed.jpg")
+    os.rename(original, moved)
+
+    assert store.path_for(moved, 256) == cache_path
+    assert store.content_key(make_media(media_dir, "other.jpg", b"other" * 100)) != store.content_key(moved)
+
+
+def test_modified_file_gets_a_new_key(tmp_path, media_dir):
+    store = thumbnails.ThumbnailStore(str(tmp_path / "cache"))
+    path = make_media(media_dir, "photo.jpg", b"photo" * 100)
+    key = store.content_key(path)
+
+    with open(path, 'ab') as f:
+        f.write(b"edited")
+
+    assert store.content_key(path) != key
+
+
+def test_record_evicts_least_recently_used(tmp_path, media_dir):
+    store = thumbnails.ThumbnailStore(str(tmp_path / "cache"), max_bytes=250)
+    first, second, third = (make_media(media_dir, f"{i}.jpg", bytes([i]) * 50) for i in range(3))
+    first_thumb = write_thumbnail(store, first)
+    second_thumb = write_thumbnail(store, second)
+    store.touch(first_thumb)
+
+    third_thumb = write_thumbnail(store, third)
+
+    assert os.path.exists(first_thumb)
+    assert not os.path.exists(second_thumb)
+    assert os.path.exists(third_thumb)
+    assert store.current_bytes == 200
+
+
+def test_gc_removes_orphans_and_applies_budget(tmp_path, media_dir):
+    store = thumbnails.ThumbnailStore(str(tmp_path / "cache"))
+    kept = make_media(media_dir, "kept.jpg", b"kept" * 100)
+    deleted = make_media(media_dir, "deleted.jpg", b"deleted" * 100)
+    kept_thumb = write_thumbnail(store, kept)
+    deleted_thumb = write_thumbnail(store, deleted)
+    # Ancien nommage par chemin : inconnu de l'index
+    legacy = os.path.join(store.cache_dir, "0123abcd.jpg")
+    with open(legacy, 'wb') as f:
+        f.write(b"\xff" * 100)
+    os.remove(deleted)
+
+    stats = store.gc()
+
+    assert os.path.exists(kept_thumb)
+    assert not os.path.exists(deleted_thumb)
+    assert not os.path.exists(legacy)
+    assert stats["sources_removed"] == 1
+    assert stats["files_removed"] == 2
+    assert stats["bytes_used"] == 100
+
+    store.max_bytes = 50
+    assert store.gc()["bytes_used"] == 0
+    assert not os.path.exists(kept_thumb)
+
+
+def test_save_merges_indexes_of_other_processes(tmp_path, media_dir):
+    cache_dir = str(tmp_path / "cache")
+    # Deux workers : deux vues du même dossier
+    worker_a = thumbnails.ThumbnailStore(cache_dir)
+    worker_b = thumbnails.ThumbnailStore(cache_dir)
+    thumb_a = write_thumbnail(worker_a, make_media(media_dir, "a.jpg", b"a" * 100))
+    thumb_b = write_thumbnail(worker_b, make_media(media_dir, "b.jpg", b"b" * 100))
+
+    worker_a.save()
+    worker_b.save()
+
+    with open(os.path.join(cache_dir, "index.json"), 'r', encoding='utf-8') as f:
+        entries = json.load(f)["entries"]
+    assert set(entries) == {os.path.basename(thumb_a), os.path.basename(thumb_b)}
+    assert thumbnails.ThumbnailStore(cache_dir).current_bytes == 200
+    assert not [name for name in os.listdir(cache_dir) if name.endswith(".tmp")]
+
+
+def test_save_does_not_resurrect_evicted_thumbnails(tmp_path, media_dir):
+    cache_dir = str(tmp_path / "cache")
+    worker_a = thumbnails.ThumbnailStore(cache_dir)
+    worker_b = thumbnails.ThumbnailStore(cache_dir)
+    thumb_b = write_thumbnail(worker_b, make_media(media_dir, "b.jpg", b"b" * 100))
+    worker_b.save()
+    # Vignette évincée (fichier supprimé) avant que worker_a ne fusionne l'index
+    os.remove(thumb_b)
+    thumb_a = write_thumbnail(worker_a, make_media(media_dir, "a.jpg", b"a" * 100))
+
+    worker_a.save()
+
+    with open(os.path.join(cache_dir, "index.json"), 'r', encoding='utf-8') as f:
+        entries = json.load(f)["entries"]
+    assert set(entries) == {os.path.basename(thumb_a)}
+    assert worker_a.current_bytes == 100
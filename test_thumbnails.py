@@ -0,0 +1,113 @@
+"""
+Tests de la génération des vignettes à l'indexation (core/thumbnails.py).
+"""
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+# core/__init__ charge CLIP, BLIP et le Cross-Encoder
+thumbnails = pytest.importorskip("core.thumbnails")
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+
+def make_jpeg(path, size=(1200, 900), color=(200, 40, 40)):
+    Image.new('RGB', size, color).save(path, 'JPEG')
+    return str(path)
+
+
+def cached_size(file_path, size, cache_dir, kind="image"):
+    with Image.open(thumbnails.thumbnail_path(file_path, size, cache_dir, kind)) as thumb:
+        return thumb.size
+
+
+def test_render_thumbnails_writes_every_size(tmp_path, cache_dir):
+    source = make_jpeg(tmp_path / "photo.jpg")
+    with Image.open(source) as image:
+        rendered = thumbnails.render_thumbnails(image, source, cache_dir=cache_dir)
+
+    assert {size: thumb.size for size, thumb in rendered.items()} == {512: (512, 384), 256: (256, 192)}
+    assert cached_size(source, 512, cache_dir) == (512, 384)
+    assert cached_size(source, 256, cache_dir) == (256, 192)
+
+
+def test_pipeline_skips_media_already_cached(tmp_path, cache_dir):
+    source = make_jpeg(tmp_path / "photo.jpg")
+    image = Image.open(source)
+
+    pipeline = thumbnails.ThumbnailPipeline(max_workers=2, cache_dir=cache_dir)
+    future = pipeline.submit(image, source)
+    future.result()
+    pipeline.close()
+
+    assert pipeline.generated == 1
+    assert cached_size(source, 256, cache_dir) == (256, 192)
+    second = thumbnails.ThumbnailPipeline(max_workers=1, cache_dir=cache_dir)
+    assert second.submit(image, source) is None
+    second.close()
+
+
+def test_pipeline_video_poster_and_sprite(tmp_path, cache_dir):
+    source = str(tmp_path / "clip.mp4")
+    with open(source, 'wb') as f:
+        f.write(b"\x00" * 4096)
+    # Meilleure frame en premier, puis frames dans le désordre
+    frames = [(30, Image.new('RGB', (640, 360), (0, 0, 255)))]
+    frames += [(number, Image.new('RGB', (640, 360), (number, 0, 0))) for number in range(120, 0, -10)]
+
+    pipeline = thumbnails.ThumbnailPipeline(max_workers=1, cache_dir=cache_dir)
+    pipeline.submit_video(frames, source).result()
+    pipeline.close()
+
+    assert cached_size(source, 512, cache_dir, "video") == (512, 288)
+    sprite_size = cached_size(source, thumbnails.SPRITE_TILE_SIZE, cache_dir, "sprite")
+    assert sprite_size == (thumbnails.SPRITE_TILE_SIZE * thumbnails.SPRITE_MAX_FRAMES, thumbnails.SPRITE_TILE_SIZE)
+    assert pipeline.submit_video(frames, source) is None
+
+
+def test_sprite_tiles_keep_chronological_order():
+    frames = [(number, Image.new('RGB', (400, 200), (number, 0, 0))) for number in (50, 10, 30, 20, 40)]
+
+    tiles = thumbnails.sprite_tiles(frames, max_frames=3)
+
+    assert [tile.getpixel((0, 0))[0] for tile in tiles] == [10, 20, 40]
+    assert all(tile.size == (thumbnails.SPRITE_TILE_SIZE, thumbnails.SPRITE_TILE_SIZE // 2) for tile in tiles)
+
+
+def test_open_image_reduced_decodes_jpeg_at_a_smaller_scale(tmp_path):
+    source = make_jpeg(tmp_path / "large.jpg", size=(4000, 3000))
+
+    with thumbnails.open_image_reduced(source, 512) as image:
+        # Échelle 1/4 : la plus forte qui garde au moins 512 px de côté (1/8 donnerait 500x375)
+        assert image.size == (1000, 750)
+        assert image.mode == 'RGB'
+
+
+def test_open_image_reduced_converts_and_keeps_other_formats(tmp_path):
+    gray = tmp_path / "gray.jpg"
+    Image.new('L', (800, 600), 128).save(gray, 'JPEG')
+    png = tmp_path / "photo.png"
+    Image.new('RGBA', (800, 600), (0, 0, 0, 0)).save(png)
+
+    with thumbnails.open_image_reduced(str(gray), 512) as image:
+        assert image.mode == 'RGB'
+    with thumbnails.open_image_reduced(str(png), 256) as image:
+        assert (image.size, image.mode) == ((800, 600), 'RGB')
+
+
+@pytest.mark.parametrize("size, max_side, expected", [
+    ((4000, 3000), 512, (512, 384)),
+    ((3000, 4000), 512, (384, 512)),
+    ((5000, 10), 256, (256, 1)),
+    ((300, 200), 512, (300, 200)),
+])
+def test_fit_image_sizes(size, max_side, expected):
+    image = Image.new('RGB', size)
+
+    fitted = thumbnails.fit_image(image, max_side)
+
+    assert fitted.size == expected
+    assert fitted is not image
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+"""
+Nettoyage du cache de vignettes.
+Supprime les vignettes des médias supprimés ou modifiés et ramène le cache
+sous son budget disque (éviction des moins récemment utilisées).
+"""
+
+import argparse
+
+from core.thumbnails import ThumbnailStore, DEFAULT_CACHE_DIR, DEFAULT_MAX_CACHE_BYTES
+
+
+def main():
+    """Fonction principale."""
+    parser = argparse.ArgumentParser(
+        description="Nettoyer le cache de vignettes et appliquer son budget disque"
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help=f"Dossier du cache de vignettes (défaut: {DEFAULT_CACHE_DIR})"
+    )
+    parser.add_argument(
+        "--max-mb",
+        type=int,
+        default=DEFAULT_MAX_CACHE_BYTES // (1024 * 1024),
+        help="Budget disque en Mo (défaut: THUMBNAIL_DISK_BYTES ou 1024)"
+    )
+    args = parser.parse_args()
+
+    store = ThumbnailStore(args.cache_dir, max_bytes=args.max_mb * 1024 * 1024)
+    print(f"🧹 Nettoyage du cache {args.cache_dir} (budget: {args.max_mb} Mo)...")
+    stats = store.gc()
+    print(f"   - Médias oubliés: {stats['sources_removed']}")
+    print(f"   - Vignettes supprimées: {stats['files_removed']} ({stats['bytes_freed'] / (1024 * 1024):.1f} Mo libérés)")
+    print(f"✅ Cache: {stats['bytes_used'] / (1024 * 1024):.1f} Mo utilisés")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,15 @@ Fonctions utilitaires pour l'interface Streamlit.
 
 import os
 import subprocess
-import hashlib
 from pathlib import Path
-from typing import Optional
+from typing import Optional, List, Tuple
 from PIL import Image
 
+from core.thumbnails import (
+    get_file_hash, thumbnail_path, render_thumbnails, open_image_reduced, get_thumbnail_store,
+    sprite_tiles, render_sprite_sheet, THUMBNAIL_SIZES, DEFAULT_CACHE_DIR, SPRITE_TILE_SIZE
+)
+
 try:
     import streamlit as st
 except ImportError:
@@ -129,29 +133,11 @@ def pick_directory_osascript() -> Optional[str]:
         return None
 
 
-def get_file_hash(file_path: str) -> str:
-    """
-    Calcule un hash du fichier basé sur le chemin et le mtime.
-    
-    Args:
-        file_path: Chemin vers le fichier
-        
-    Returns:
-        Hash du fichier
-    """
-    try:
-        stat = os.stat(file_path)
-        # Combiner chemin et mtime pour le hash
-        content = f"{file_path}:{stat.st_mtime}"
-        return hashlib.md5(content.encode()).hexdigest()
-    except Exception:
-        # Fallback: utiliser juste le chemin
-        return hashlib.md5(file_path.encode()).hexdigest()
-
-
-def make_thumbnail(image_path: str, max_size: int = 512, cache_dir: str = ".cache/thumbnails") -> Optional[Image.Image]:
+def make_thumbnail(image_path: str, max_size: int = 512, cache_dir: str = DEFAULT_CACHE_DIR) -> Optional[Image.Image]:
     """
     Crée ou charge une vignette depuis le cache.
+    Les vignettes sont normalement pré-générées à l'indexation ; sinon toutes les
+    tailles sont générées ici en un seul décodage.
     
     Args:
         image_path: Chemin vers l'image
@@ -162,16 +148,11 @@ def make_thumbnail(image_path: str, max_size: int = 512, cache_dir: str = ".cach
         Image PIL (vignette) ou None en cas d'erreur
     """
     try:
-        # Créer le dossier de cache si nécessaire
-        os.makedirs(cache_dir, exist_ok=True)
-        
-        # Générer le nom de fichier de cache
-        file_hash = get_file_hash(image_path)
-        cache_path = os.path.join(cache_dir, f"{file_hash}.jpg")
-        
         # Vérifier si la vignette existe déjà dans le cache
+        cache_path = thumbnail_path(image_path, max_size, cache_dir)
         if os.path.exists(cache_path):
             try:
+                get_thumbnail_store(cache_dir).touch(cache_path)
                 return Image.open(cache_path)
             except Exception:
                 # Si le fichier est corrompu, le recréer
@@ -181,82 +162,163 @@ def make_thumbnail(image_path: str, max_size: int = 512, cache_dir: str = ".cach
         if not os.path.exists(image_path):
             return None
         
-        image = Image.open(image_path)
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+        sizes = set(THUMBNAIL_SIZES) | {max_size}
+        # Décodage JPEG réduit : jamais de décodage pleine résolution pour une vignette
+        with open_image_reduced(image_path, max(sizes)) as image:
+            thumbnails = render_thumbnails(image, image_path, sizes, cache_dir)
         
-        # Redimensionner en gardant le ratio
-        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-        
-        # Sauvegarder dans le cache
-        try:
-            image.save(cache_path, 'JPEG', quality=85)
-        except Exception:
-            pass  # Si la sauvegarde échoue, continuer quand même
-        
-        return image
+        return thumbnails[max_size]
         
     except Exception as e:
         # En cas d'erreur, retourner None
         return None
 
 
-def get_video_preview(video_path: str, cache_dir: str = ".cache/thumbnails") -> Optional[Image.Image]:
+def _sample_video_frames(video_path: str, n_frames: int = 8) -> List[Tuple[int, float, Image.Image]]:
+    """
+    Échantillonne des frames réparties entre 5% et 95% de la vidéo (jamais la frame 0,
+    souvent noire ou en fondu) et mesure leur netteté (variance Laplacienne).
+    
+    Returns:
+        Liste de tuples (numéro de frame, netteté, image PIL)
+    """
+    import cv2
+    
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return []
+    samples = []
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total_frames > 1:
+            positions = sorted({int(total_frames * (0.05 + 0.9 * i / max(1, n_frames - 1))) for i in range(n_frames)})
+        else:
+            positions = [0]
+        for position in positions:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+            ret, frame = cap.read()
+            if not ret:
+                continue
+            sharpness = cv2.Laplacian(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), cv2.CV_64F).var()
+            samples.append((position, sharpness, Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))))
+    finally:
+        cap.release()
+    return samples
+
+
+def _render_video_preview(video_path: str, cache_dir: str, max_size: int) -> Optional[Image.Image]:
+    # Génération à la demande (vidéo non indexée) : affiche = frame la plus nette, planche = échantillons
+    samples = _sample_video_frames(video_path)
+    if not samples:
+        return None
+    best = max(samples, key=lambda sample: sample[1])
+    thumbnails = render_thumbnails(best[2], video_path, set(THUMBNAIL_SIZES) | {max_size}, cache_dir, kind="video")
+    render_sprite_sheet(sprite_tiles([(position, image) for position, _, image in samples]), video_path, cache_dir)
+    return thumbnails[max_size]
+
+
+def get_video_preview(video_path: str, cache_dir: str = DEFAULT_CACHE_DIR, max_size: int = 512) -> Optional[Image.Image]:
     """
-    Extrait une frame de prévisualisation d'une vidéo.
+    Retourne l'image de prévisualisation d'une vidéo.
+    Normalement pré-générée à l'indexation à partir de la meilleure frame indexée ;
+    sinon la frame la plus nette parmi quelques positions échantillonnées.
     
     Args:
         video_path: Chemin vers la vidéo
         cache_dir: Dossier de cache pour les previews
+        max_size: Taille maximale de la preview (défaut: 512)
         
     Returns:
-        Image PIL (première frame) ou None en cas d'erreur
+        Image PIL ou None en cas d'erreur
     """
     try:
-        import cv2
-        
-        # Créer le dossier de cache si nécessaire
-        os.makedirs(cache_dir, exist_ok=True)
-        
-        # Générer le nom de fichier de cache
-        file_hash = get_file_hash(video_path)
-        cache_path = os.path.join(cache_dir, f"{file_hash}_video.jpg")
-        
-        # Vérifier si la preview existe déjà dans le cache
+        # Vérifier si la preview existe déjà dans le cache (pré-générée à l'indexation)
+        cache_path = thumbnail_path(video_path, max_size, cache_dir, kind="video")
         if os.path.exists(cache_path):
             try:
                 return Image.open(cache_path)
             except Exception:
                 pass
         
-        # Extraire la première frame
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            return None
-        
-        ret, frame = cap.read()
-        cap.release()
+        return _render_video_preview(video_path, cache_dir, max_size)
         
-        if not ret:
-            return None
-        
-        # Convertir en RGB pour PIL
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image = Image.fromarray(frame_rgb)
-        
-        # Redimensionner pour la preview
-        image.thumbnail((512, 512), Image.Resampling.LANCZOS)
-        
-        # Sauvegarder dans le cache
-        try:
-            image.save(cache_path, 'JPEG', quality=85)
-        except Exception:
-            pass
-        
-        return image
+    except Exception as e:
+        return None
+
+
+def get_video_sprite_path(video_path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> Optional[str]:
+    """
+    Retourne le chemin de la planche de survol d'une vidéo (frames côte à côte,
+    SPRITE_TILE_SIZE px chacune, ordre chronologique), en la générant si nécessaire.
+    
+    Args:
+        video_path: Chemin vers la vidéo
+        cache_dir: Dossier de cache
         
+    Returns:
+        Chemin de la planche, ou None si elle n'a pas pu être générée
+    """
+    cache_path = thumbnail_path(video_path, SPRITE_TILE_SIZE, cache_dir, kind="sprite")
+    if os.path.exists(cache_path):
+        get_thumbnail_store(cache_dir).touch(cache_path)
+        return cache_path
+    try:
+        _render_video_preview(video_path, cache_dir, max(THUMBNAIL_SIZES))
     except Exception as e:
+        print(f"⚠️  Erreur lors de la génération de la planche {video_path}: {e}")
+    return cache_path if os.path.exists(cache_path) else None
+
+
+def find_cached_thumbnail(file_path: str, media_type: str = "image", max_size: int = 512,
+                          variant: Optional[str] = None, cache_dir: str = DEFAULT_CACHE_DIR) -> Optional[str]:
+    """
+    Retourne le chemin de la vignette si elle est déjà en cache, sans jamais la générer.
+    
+    Args:
+        file_path: Chemin vers le média
+        media_type: "image" ou "video"
+        max_size: Taille maximale de la vignette
+        variant: "sprite" pour la planche de survol d'une vidéo
+        cache_dir: Dossier de cache
+        
+    Returns:
+        Chemin de la vignette, ou None si elle reste à générer
+    """
+    if media_type == "video" and variant == "sprite":
+        cache_path = thumbnail_path(file_path, SPRITE_TILE_SIZE, cache_dir, kind="sprite")
+    else:
+        cache_path = thumbnail_path(file_path, max_size, cache_dir, "video" if media_type == "video" else "image")
+    if not os.path.exists(cache_path):
         return None
+    get_thumbnail_store(cache_dir).touch(cache_path)
+    return cache_path
+
+
+def get_thumbnail_path(file_path: str, media_type: str = "image", max_size: int = 512,
+                       cache_dir: str = DEFAULT_CACHE_DIR) -> Optional[str]:
+    """
+    Retourne le chemin de la vignette JPEG en cache, en la générant si nécessaire.
+    Contrairement à make_thumbnail, ne décode pas la vignette quand elle existe déjà.
+    
+    Args:
+        file_path: Chemin vers le média
+        media_type: "image" ou "video"
+        max_size: Taille maximale de la vignette
+        cache_dir: Dossier de cache
+        
+    Returns:
+        Chemin de la vignette, ou None si elle n'a pas pu être générée
+    """
+    kind = "video" if media_type == "video" else "image"
+    cache_path = thumbnail_path(file_path, max_size, cache_dir, kind)
+    if os.path.exists(cache_path):
+        get_thumbnail_store(cache_dir).touch(cache_path)
+        return cache_path
+    if kind == "video":
+        get_video_preview(file_path, cache_dir=cache_dir, max_size=max_size)
+    else:
+        make_thumbnail(file_path, max_size=max_size, cache_dir=cache_dir)
+    return cache_path if os.path.exists(cache_path) else None
 
 
 def open_in_finder(file_path: str) -> bool:
@@ -0,0 +1,24 @@
+"""
+Point d'entrée WSGI de production (gunicorn).
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+API_SERVER=local sert api_server.py (index FAISS local), sinon api_server_cloud.py.
+Avec preload_app (gunicorn.conf.py), ce module est importé une seule fois dans le
+processus maître : l'index (et, pour api_server.py, les modèles CLIP et cross-encoder)
+est chargé avant le fork des workers. La version cloud ne charge aucun modèle.
+Chaque worker lance ensuite start_warm_up (passe à vide, readiness) après le fork.
+Avec API_SERVER=local et plusieurs workers, les réindexations et les écritures de
+métadonnées (légendes) des différents workers sont sérialisées par un verrou de fichier
+(metadata.lock, voir core.indexer.index_write_lock).
+"""
+
+import os
+
+if os.environ.get('API_SERVER', 'cloud') == 'local':
+    from api_server import app, preload, start_warm_up
+else:
+    from api_server_cloud import app, preload, start_warm_up
+
+if os.environ.get('PRELOAD_MODELS', '1') != '0':
+    preload()